@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+ブラウザ操作のベンチマーク
+
+ローカルのYouTube代替サイト（mock_youtube_site）に対して、実際の削除・保存・ログイン確認の処理を実行し、
+ステップごとの待機時間・動画1件あたりの所要時間・スループットをJSONで出力する。
+タブ数を変えて、逐次実行と複数タブでの実行を比較できる。
+
+AgentQLの問い合わせはネットワークを使うため、代替サイトのセレクタを書いたロケーターキャッシュのファイルを使い、
+タブのページは agentql.wrap の代わりに OfflineQueryPage でラップして、キャッシュに無い問い合わせは
+「見つからなかった」としてオフラインで応答する（回数は agentql_queries に記録する）。
+Notionへの書き込みは行わない。
+
+    python -m benchmarks.browser_benchmarks --videos 20 --tabs 1 3 --load-delay 300
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import page_waits  # noqa: E402
+import delete_WL_from_youtube  # noqa: E402
+import youtube_save_handler  # noqa: E402
+from locator_cache import LocatorCache, set_locator_cache  # noqa: E402
+from metrics import metrics  # noqa: E402
+from notion_writer import NotionWriteBehind  # noqa: E402
+
+from benchmarks import mock_youtube_site as site  # noqa: E402
+
+SCENARIOS = ("login_check", "delete_tabs", "delete_playlist", "save_tabs")
+
+# check_login_status の中のクエリ（ロケーターキャッシュのキーに使う）
+LIBRARY_QUERY = "{ library_link(ライブラリ) }"
+PLAYLIST_TITLE_QUERY = "{ playlist_title(後で見る) }"
+
+
+class _EmptyResponse:
+    """AgentQLが何も見つけられなかった応答"""
+
+    def __getattr__(self, name):
+        return None
+
+
+class OfflineQueryPage:
+    """query_elements をネットワークを使わずに「見つからなかった」と応答するページ"""
+
+    queries = 0
+
+    def __init__(self, page):
+        self._page = page
+
+    def __getattr__(self, name):
+        return getattr(self._page, name)
+
+    def query_elements(self, query):
+        OfflineQueryPage.queries += 1
+        return _EmptyResponse()
+
+
+def seed_locator_cache(path):
+    """代替サイトのセレクタを書いたロケーターキャッシュのファイルを作り、共有キャッシュとして使う"""
+    selectors = {
+        LocatorCache.make_key(delete_WL_from_youtube.SAVE_MENU_QUERY, ("menu_items", 0, "watch_later")):
+            site.WATCH_LATER_MENU_ITEM_SELECTOR,
+        LocatorCache.make_key(youtube_save_handler.SAVE_MENU_QUERY, ("menu_items", 0, "save_option")):
+            site.SAVE_MENU_ITEM_SELECTOR,
+        LocatorCache.make_key(youtube_save_handler.SAVE_MENU_QUERY, ("menu_items", 0, "watch_later")):
+            site.PLAYLIST_WATCH_LATER_SELECTOR,
+        LocatorCache.make_key(LIBRARY_QUERY, ("library_link",)): site.LIBRARY_LINK_SELECTOR,
+        LocatorCache.make_key(PLAYLIST_TITLE_QUERY, ("playlist_title",)): site.PLAYLIST_TITLE_SELECTOR,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(selectors, f, ensure_ascii=False, indent=2)
+    cache = LocatorCache(path)
+    set_locator_cache(cache)
+    return cache
+
+
+def find_histogram(summary, name):
+    """ラベルの違うヒストグラムをまとめて、件数・平均・最大・合計を返す"""
+    matched = [histogram for histogram in summary["histograms"] if histogram["name"] == name]
+    if not matched:
+        return None
+    count = sum(histogram["count"] for histogram in matched)
+    total = sum(histogram["sum"] for histogram in matched)
+    return {
+        "count": count,
+        "mean": round(total / count, 4) if count else None,
+        "max": round(max(histogram["max"] for histogram in matched), 4),
+        "sum": round(total, 4),
+    }
+
+
+def run_login_check(context, videos, tabs):
+    page = OfflineQueryPage(context.new_page())
+    checks = max(1, min(videos, 5))
+    passed = 0
+    for _ in range(checks):
+        start = time.monotonic()
+        ok = delete_WL_from_youtube.check_login_status(page)
+        metrics.observe("login_check_seconds", time.monotonic() - start)
+        passed += int(ok)
+    return {"items": checks, "statuses": {"passed": passed, "failed": checks - passed}}
+
+
+def run_delete_tabs(context, videos, tabs):
+    items = [{"page_id": f"page-{i}", "video_id": video_id(i), "title": f"Video {i}"} for i in range(videos)]
+    writer = NotionWriteBehind(lambda item: True)
+    results = delete_WL_from_youtube.delete_items_in_tabs(context, items, tabs, journal=None, writer=writer,
+                                                          wrap=OfflineQueryPage)
+    delete_WL_from_youtube.apply_writer_results(results, writer.flush())
+    return {"items": len(items), "statuses": count_statuses(results)}
+
+
+def run_delete_playlist(context, videos, tabs):
+    items = [{"page_id": f"page-{i}", "video_id": video_id(i), "title": f"Video {i}"} for i in range(videos)]
+    writer = NotionWriteBehind(lambda item: True)
+    page = context.new_page()
+    results = delete_WL_from_youtube.bulk_delete_from_playlist(page, items, journal=None, writer=writer)
+    delete_WL_from_youtube.apply_writer_results(results, writer.flush())
+    return {"items": len(items), "statuses": count_statuses(results)}
+
+
+def run_save_tabs(context, videos, tabs):
+    urls = [f"https://www.youtube.com/watch?v={video_id(i)}" for i in range(videos)]
+    results = youtube_save_handler.save_videos_in_tabs(context, urls, tabs, wrap=OfflineQueryPage)
+    return {"items": len(urls), "statuses": count_statuses(results)}
+
+
+RUNNERS = {
+    "login_check": run_login_check,
+    "delete_tabs": run_delete_tabs,
+    "delete_playlist": run_delete_playlist,
+    "save_tabs": run_save_tabs,
+}
+
+# 動画1件あたりの所要時間として報告するヒストグラム
+ITEM_HISTOGRAMS = {
+    "login_check": "login_check_seconds",
+    "delete_tabs": "delete_item_seconds",
+    "delete_playlist": "delete_item_seconds",
+    "save_tabs": "save_item_seconds",
+}
+
+
+def video_id(i):
+    return f"mock{i:07d}"
+
+
+def count_statuses(results):
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return counts
+
+
+def run_scenario(playwright, name, videos, tabs, args, cache_dir):
+    metrics.reset()
+    page_waits.recorder = page_waits.WaitRecorder()
+    OfflineQueryPage.queries = 0
+    cache = seed_locator_cache(os.path.join(cache_dir, f"{name}-{tabs}.json"))
+
+    watch_later = [video_id(i) for i in range(videos)] if name != "save_tabs" else []
+    mock = site.MockYouTubeSite(
+        watch_later, load_delay=args.load_delay, menu_delay=args.menu_delay,
+        dialog_delay=args.dialog_delay, toast_delay=args.toast_delay, remove_delay=args.remove_delay
+    )
+
+    browser = playwright.chromium.launch(headless=not args.headed)
+    try:
+        context = browser.new_context()
+        mock.attach(context)
+
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            outcome = RUNNERS[name](context, videos, tabs)
+        elapsed = time.perf_counter() - start
+    finally:
+        browser.close()
+
+    summary = metrics.to_dict()
+    return dict(outcome, **{
+        "scenario": name,
+        "tabs": tabs,
+        "seconds": round(elapsed, 4),
+        "throughput_per_sec": round(outcome["items"] / elapsed, 2) if elapsed else None,
+        "per_item": find_histogram(summary, ITEM_HISTOGRAMS[name]),
+        "page_goto": find_histogram(summary, "page_goto_seconds"),
+        "steps": page_waits.recorder.summary(),
+        "locator_cache": cache.stats(),
+        "agentql_queries": OfflineQueryPage.queries,
+        "site": mock.stats(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカルのYouTube代替サイトに対するブラウザ操作のベンチマーク")
+    parser.add_argument("--videos", type=int, default=20, help="1シナリオあたりの動画数")
+    parser.add_argument("--tabs", type=int, nargs="+", default=[1, 3], help="比較するタブ数（1は逐次実行）")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--load-delay", type=int, default=300, help="ページの主要な要素が描画されるまでの時間（ミリ秒）")
+    parser.add_argument("--menu-delay", type=int, default=50, help="メニューが描画されるまでの時間（ミリ秒）")
+    parser.add_argument("--dialog-delay", type=int, default=50, help="保存ダイアログが描画されるまでの時間（ミリ秒）")
+    parser.add_argument("--toast-delay", type=int, default=50, help="トーストが表示されるまでの時間（ミリ秒）")
+    parser.add_argument("--remove-delay", type=int, default=50, help="プレイリストの行が消えるまでの時間（ミリ秒）")
+    parser.add_argument("--headed", action="store_true", help="ブラウザの画面を表示する")
+    parser.add_argument("--output", help="結果のJSONを書き込むファイル（省略時は標準出力）")
+    args = parser.parse_args()
+
+    from playwright.sync_api import sync_playwright
+
+    # ベンチマーク中はスクリプトのログを抑える
+    logging.getLogger().setLevel(logging.ERROR)
+
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir, sync_playwright() as playwright:
+        for name in args.scenarios:
+            # ログイン確認とプレイリストでの一括削除はタブ数に依存しない
+            tab_counts = args.tabs if name in ("delete_tabs", "save_tabs") else [1]
+            for tabs in tab_counts:
+                results.append(run_scenario(playwright, name, args.videos, tabs, args, cache_dir))
+
+    report = {"config": vars(args), "results": results}
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
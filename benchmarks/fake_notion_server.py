@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク用のNotion APIのローカル代替サーバー
+
+ページの作成・更新、データベースのスキーマ取得とクエリ（ページネーション・filter_properties）に対応する。
+応答の遅延と、一定の割合での429（Retry-After付き）を設定できる。
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# データベースのスキーマ（プロパティ名 → ID・型）
+SCHEMA = {
+    "Name": {"id": "title", "type": "title"},
+    "Link": {"id": "lnk1", "type": "url"},
+    "delete": {"id": "del1", "type": "checkbox"},
+    "deleted": {"id": "dld1", "type": "checkbox"},
+}
+MAX_PAGE_SIZE = 100
+
+
+def now_iso():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def make_page(title, link, delete=False, deleted=False):
+    """Notionのページオブジェクトと同じ形のページを作る"""
+    return {
+        "id": str(uuid.uuid4()),
+        "object": "page",
+        "last_edited_time": now_iso(),
+        "properties": {
+            "Name": {"id": "title", "type": "title", "title": [
+                {"type": "text", "text": {"content": title}, "plain_text": title}
+            ]},
+            "Link": {"id": "lnk1", "type": "url", "url": link},
+            "delete": {"id": "del1", "type": "checkbox", "checkbox": delete},
+            "deleted": {"id": "dld1", "type": "checkbox", "checkbox": deleted},
+        }
+    }
+
+
+class FakeNotionState:
+    """サーバーが保持するページとリクエストの集計"""
+
+    def __init__(self, latency=0.0, error_rate=0.0, retry_after=0.1, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.pages = {}
+        self.request_counts = {}
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def seed_pages(self, pages):
+        with self._lock:
+            for page in pages:
+                self.pages[page["id"]] = page
+
+    def count(self, endpoint):
+        with self._lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def should_throttle(self):
+        with self._lock:
+            throttle = self._random.random() < self.error_rate
+            if throttle:
+                self.throttled += 1
+            return throttle
+
+    def reset_counts(self):
+        with self._lock:
+            self.request_counts = {}
+            self.throttled = 0
+
+
+def matches_filter(page, page_filter):
+    if not page_filter:
+        return True
+    if "and" in page_filter:
+        return all(matches_filter(page, sub) for sub in page_filter["and"])
+    if page_filter.get("timestamp") == "last_edited_time":
+        since = page_filter["last_edited_time"].get("on_or_after")
+        return since is None or page["last_edited_time"] >= since
+    prop = page["properties"].get(page_filter.get("property"), {})
+    if "checkbox" in page_filter:
+        return prop.get("checkbox") == page_filter["checkbox"].get("equals")
+    return True
+
+
+def project_properties(page, property_ids):
+    if not property_ids:
+        return page
+    properties = {name: prop for name, prop in page["properties"].items() if prop["id"] in property_ids}
+    return dict(page, properties=properties)
+
+
+class FakeNotionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state = None  # make_server() で設定する
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts and parts[0] == "v1":
+            parts = parts[1:]
+        body = self._read_json() if method in ("POST", "PATCH") else {}
+
+        endpoint = f"{method} /{'/'.join(parts[:1] + ['{id}'] * (len(parts) > 1) + parts[2:])}"
+        self.state.count(endpoint)
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if self.state.should_throttle():
+            self._send(429, {"object": "error", "code": "rate_limited"},
+                       {"Retry-After": str(self.state.retry_after)})
+            return
+
+        if method == "POST" and parts == ["pages"]:
+            props = body.get("properties", {})
+            title = props.get("Name", {}).get("title", [{}])[0].get("text", {}).get("content", "")
+            page = make_page(title, props.get("Link", {}).get("url"))
+            self.state.seed_pages([page])
+            self._send(200, page)
+        elif method == "PATCH" and len(parts) == 2 and parts[0] == "pages":
+            page = self.state.pages.get(parts[1])
+            if page is None:
+                self._send(404, {"object": "error", "code": "object_not_found"})
+                return
+            for name, value in body.get("properties", {}).items():
+                page["properties"].setdefault(name, {"id": SCHEMA.get(name, {}).get("id", name)}).update(value)
+            page["last_edited_time"] = now_iso()
+            self._send(200, page)
+        elif method == "GET" and len(parts) == 2 and parts[0] == "databases":
+            self._send(200, {"object": "database", "id": parts[1], "properties": SCHEMA})
+        elif method == "POST" and len(parts) == 3 and parts[0] == "databases" and parts[2] == "query":
+            self._query(body, parse_qs(url.query).get("filter_properties", []))
+        else:
+            self._send(404, {"object": "error", "code": "invalid_request_url"})
+
+    def _query(self, body, property_ids):
+        page_size = min(int(body.get("page_size", MAX_PAGE_SIZE)), MAX_PAGE_SIZE)
+        pages = [page for page in list(self.state.pages.values()) if matches_filter(page, body.get("filter"))]
+
+        start = 0
+        cursor = body.get("start_cursor")
+        if cursor:
+            ids = [page["id"] for page in pages]
+            start = ids.index(cursor) if cursor in ids else len(ids)
+
+        chunk = pages[start:start + page_size]
+        has_more = start + page_size < len(pages)
+        self._send(200, {
+            "object": "list",
+            "results": [project_properties(page, set(property_ids)) for page in chunk],
+            "has_more": has_more,
+            "next_cursor": pages[start + page_size]["id"] if has_more else None
+        })
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+
+def make_server(state, host="127.0.0.1", port=0):
+    """
+    代替サーバーを作成してバックグラウンドで起動する。
+    返り値: (server, base_url)  終了時は server.shutdown() を呼ぶ
+    """
+    handler = type("BoundFakeNotionHandler", (FakeNotionHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク用の YouTube Data API クライアントの代替
+
+youtube.videos().list(...).execute() と同じ呼び出し方に対応し、
+動画IDから決まったタイトルを返す。呼び出し回数と問い合わせたID数を記録する。
+"""
+import threading
+import time
+
+
+class FakeYouTube:
+    """videos().list() だけに対応した YouTube クライアントの代替"""
+
+    def __init__(self, latency=0.0, missing_ids=()):
+        self.latency = latency
+        self.missing_ids = set(missing_ids)
+        self.calls = 0
+        self.ids_requested = 0
+        self._lock = threading.Lock()
+
+    def videos(self):
+        return self
+
+    def list(self, part=None, id="", fields=None, **kwargs):
+        return _FakeRequest(self, [video_id for video_id in id.split(",") if video_id])
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls = 0
+            self.ids_requested = 0
+
+
+class _FakeRequest:
+    def __init__(self, client, video_ids):
+        self.client = client
+        self.video_ids = video_ids
+
+    def execute(self):
+        with self.client._lock:
+            self.client.calls += 1
+            self.client.ids_requested += len(self.video_ids)
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        return {"items": [
+            {"id": video_id, "snippet": {"title": f"Video {video_id}"}}
+            for video_id in self.video_ids if video_id not in self.client.missing_ids
+        ]}
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+ブラウザ操作のベンチマーク用のYouTubeのローカル代替サイト
+
+ブラウザのコンテキストで https://www.youtube.com/ へのリクエストをルーティングし、
+トップページ・動画ページ・後で見るプレイリストのページを返す。
+各ページはスクリプトで描画を遅らせ（読み込み・メニュー・ダイアログ・行の削除）、
+「その他の操作」メニュー、保存ダイアログの「後で見る」、プレイリストの行メニューを再現する。
+後で見るリストへの追加・削除は、YouTubeと同じく /youtubei/v1/browse/edit_playlist へのリクエストとして送られ、
+状態として記録される（削除の確認はこのリクエストの完了を待つため）。
+"""
+import json
+import threading
+from urllib.parse import parse_qs, urlparse
+
+YOUTUBE_URL_PATTERN = "https://www.youtube.com/**"
+EDIT_PLAYLIST_PATH = "/youtubei/v1/browse/edit_playlist"
+
+# 後で見るプレイリストで一度に描画する行数（残りはスクロールで読み込む）
+PLAYLIST_PAGE_SIZE = 100
+
+# ベンチマークで使うロケーターキャッシュのセレクタ
+WATCH_LATER_MENU_ITEM_SELECTOR = "#menu-watch-later"
+SAVE_MENU_ITEM_SELECTOR = "#menu-save"
+PLAYLIST_WATCH_LATER_SELECTOR = "#playlist-watch-later"
+LIBRARY_LINK_SELECTOR = "#library-link"
+PLAYLIST_TITLE_SELECTOR = "#playlist-title"
+
+STYLE = """
+<style>
+ytd-masthead, ytd-browse, ytd-watch-flexy, ytd-menu-popup-renderer, ytd-add-to-playlist-renderer,
+ytd-menu-service-item-renderer, tp-yt-paper-toast, tp-yt-paper-checkbox { display: block; }
+ytd-playlist-video-renderer { display: block; height: 90px; }
+</style>
+"""
+
+COMMON_SCRIPT = """
+const cfg = __CONFIG__;
+const el = html => { const t = document.createElement('template'); t.innerHTML = html.trim(); return t.content.firstElementChild; };
+const later = (ms, fn) => setTimeout(fn, ms);
+const notify = (action, videoId) => fetch(`/youtubei/v1/browse/edit_playlist?action=${action}&v=${videoId}`,
+    {method: 'POST', headers: {'Content-Type': 'application/json'}, body: '{}'});
+const closePopups = () => document.querySelectorAll('ytd-menu-popup-renderer, ytd-add-to-playlist-renderer')
+    .forEach(e => e.remove());
+const toast = text => later(cfg.toastDelay, () => document.body.appendChild(
+    el(`<tp-yt-paper-toast id="toast">${text}</tp-yt-paper-toast>`)));
+"""
+
+HOME_SCRIPT = """
+later(cfg.loadDelay, () => document.body.appendChild(el(`
+    <ytd-masthead>
+        <a id="library-link" href="/feed/library">ライブラリ</a>
+    </ytd-masthead>`)));
+"""
+
+WATCH_SCRIPT = """
+let saved = cfg.saved;
+function openMenu() {
+    later(cfg.menuDelay, () => {
+        closePopups();
+        const menu = el(`<ytd-menu-popup-renderer>
+            <ytd-menu-service-item-renderer id="menu-save">保存</ytd-menu-service-item-renderer>
+            ${saved ? '<ytd-menu-service-item-renderer id="menu-watch-later">「後で見る」から削除</ytd-menu-service-item-renderer>' : ''}
+        </ytd-menu-popup-renderer>`);
+        document.body.appendChild(menu);
+        menu.querySelector('#menu-save').onclick = openDialog;
+        const remove = menu.querySelector('#menu-watch-later');
+        if (remove) {
+            remove.onclick = () => { closePopups(); saved = false; notify('remove', cfg.videoId); toast('削除しました'); };
+        }
+    });
+}
+function openDialog() {
+    closePopups();
+    later(cfg.dialogDelay, () => {
+        const dialog = el(`<ytd-add-to-playlist-renderer>
+            <tp-yt-paper-checkbox id="playlist-watch-later" role="checkbox" aria-checked="${saved}">後で見る</tp-yt-paper-checkbox>
+        </ytd-add-to-playlist-renderer>`);
+        document.body.appendChild(dialog);
+        const checkbox = dialog.querySelector('#playlist-watch-later');
+        // YouTubeと同じく、チェックを切り替えてもダイアログは閉じない
+        checkbox.onclick = () => {
+            saved = !saved;
+            checkbox.setAttribute('aria-checked', String(saved));
+            notify(saved ? 'add' : 'remove', cfg.videoId);
+            toast(saved ? '追加しました' : '削除しました');
+        };
+    });
+}
+later(cfg.loadDelay, () => {
+    const page = el(`<ytd-watch-flexy>
+        <h1>Video ${cfg.videoId}</h1>
+        <div id="actions"><button aria-label="その他の操作">…</button></div>
+    </ytd-watch-flexy>`);
+    document.body.appendChild(page);
+    page.querySelector('button').onclick = openMenu;
+});
+"""
+
+PLAYLIST_SCRIPT = """
+let rendered = 0;
+let loading = false;
+function addRows() {
+    const list = document.querySelector('#contents');
+    for (const videoId of cfg.videoIds.slice(rendered, rendered + cfg.pageSize)) {
+        const row = el(`<ytd-playlist-video-renderer>
+            <a id="video-title" href="/watch?v=${videoId}&list=WL">Video ${videoId}</a>
+            <div id="menu"><button aria-label="操作メニュー">⋮</button></div>
+        </ytd-playlist-video-renderer>`);
+        row.querySelector('#menu button').onclick = () => openRowMenu(row, videoId);
+        list.appendChild(row);
+    }
+    rendered += cfg.pageSize;
+}
+function openRowMenu(row, videoId) {
+    later(cfg.menuDelay, () => {
+        closePopups();
+        const menu = el(`<ytd-menu-popup-renderer>
+            <ytd-menu-service-item-renderer>「後で見る」から削除</ytd-menu-service-item-renderer>
+        </ytd-menu-popup-renderer>`);
+        document.body.appendChild(menu);
+        menu.querySelector('ytd-menu-service-item-renderer').onclick = () => {
+            closePopups();
+            notify('remove', videoId);
+            later(cfg.removeDelay, () => row.remove());
+        };
+    });
+}
+window.addEventListener('scroll', () => {
+    const atBottom = window.innerHeight + window.scrollY >= document.documentElement.scrollHeight - 10;
+    if (atBottom && !loading && rendered < cfg.videoIds.length) {
+        loading = true;
+        later(cfg.loadDelay, () => { addRows(); loading = false; });
+    }
+});
+later(cfg.loadDelay, () => {
+    document.body.appendChild(el(`<ytd-browse>
+        <h1 id="playlist-title">後で見る</h1>
+        <div id="contents"></div>
+    </ytd-browse>`));
+    addRows();
+});
+"""
+
+
+class MockYouTubeSite:
+    """ルーティングで返すページの描画遅延と、後で見るリストの状態"""
+
+    def __init__(self, watch_later=(), load_delay=300, menu_delay=50, dialog_delay=50, toast_delay=50,
+                 remove_delay=50):
+        """
+        Args:
+            watch_later: 最初から後で見るリストに入っている動画ID
+            load_delay: ページの主要な要素が描画されるまでの時間（ミリ秒）
+            menu_delay / dialog_delay / toast_delay / remove_delay: メニュー・保存ダイアログ・トースト・行の削除の描画の遅延（ミリ秒）
+        """
+        self.watch_later = list(dict.fromkeys(watch_later))
+        self.delays = {
+            "loadDelay": load_delay,
+            "menuDelay": menu_delay,
+            "dialogDelay": dialog_delay,
+            "toastDelay": toast_delay,
+            "removeDelay": remove_delay,
+        }
+        self.added = []
+        self.removed = []
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def attach(self, context):
+        """ブラウザのコンテキストの youtube.com へのリクエストをこのサイトに向ける"""
+        context.route(YOUTUBE_URL_PATTERN, self.handle_route)
+
+    def _page(self, script, **config):
+        config = dict(self.delays, **config)
+        body = (
+            "<!DOCTYPE html><html><head><meta charset=\"utf-8\">" + STYLE + "</head><body><script>"
+            + COMMON_SCRIPT.replace("__CONFIG__", json.dumps(config)) + script
+            + "</script></body></html>"
+        )
+        return body
+
+    def handle_route(self, route):
+        url = urlparse(route.request.url)
+        query = parse_qs(url.query)
+        video_id = query.get("v", [""])[0]
+        with self._lock:
+            self.requests += 1
+
+        if url.path == EDIT_PLAYLIST_PATH:
+            action = query.get("action", [""])[0]
+            with self._lock:
+                if action == "add":
+                    self.added.append(video_id)
+                    self.watch_later.append(video_id)
+                elif action == "remove":
+                    self.removed.append(video_id)
+                    if video_id in self.watch_later:
+                        self.watch_later.remove(video_id)
+            route.fulfill(status=200, content_type="application/json", body="{}")
+            return
+
+        if url.path == "/watch":
+            with self._lock:
+                saved = video_id in self.watch_later
+            body = self._page(WATCH_SCRIPT, videoId=video_id, saved=saved)
+        elif url.path == "/playlist":
+            with self._lock:
+                video_ids = list(self.watch_later)
+            body = self._page(PLAYLIST_SCRIPT, videoIds=video_ids, pageSize=PLAYLIST_PAGE_SIZE)
+        elif url.path in ("", "/"):
+            body = self._page(HOME_SCRIPT)
+        else:
+            route.fulfill(status=404, body="")
+            return
+        route.fulfill(status=200, content_type="text/html; charset=utf-8", body=body)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "added": len(self.added),
+                "removed": len(self.removed),
+                "watch_later": len(self.watch_later),
+            }
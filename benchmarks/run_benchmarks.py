@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Notion / YouTube API を使う処理のオフラインベンチマーク
+
+ローカルの Notion API 代替サーバーと YouTube クライアントの代替に対して、
+取り込み（run_ingest）と削除対象のクエリ・フラグ更新を 100 / 1k / 10k 件で実行し、
+スループット・Notionリクエストのレイテンシ（p50 / p95）・リクエスト数をJSONで出力する。
+
+    python -m benchmarks.run_benchmarks --sizes 100 1000 --latency 0.02 --error-rate 0.05
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import delete_WL_from_youtube  # noqa: E402
+import get_WL_from_youtube  # noqa: E402
+from notion_api import NotionClient, TokenBucket, set_notion_client  # noqa: E402
+from notion_mirror import NotionMirror  # noqa: E402
+from title_cache import TitleCache  # noqa: E402
+
+from benchmarks.fake_notion_server import FakeNotionState, make_page, make_server  # noqa: E402
+from benchmarks.fake_youtube import FakeYouTube  # noqa: E402
+
+DATABASE_ID = "bench-database"
+SCENARIOS = ("ingest", "delete_query", "delete_flags")
+
+
+class TimedNotionClient(NotionClient):
+    """リクエストごとのレイテンシ（レート制限の待ちと再試行を含む）を記録するクライアント"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+        self._latency_lock = threading.Lock()
+
+    def request(self, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().request(method, path, **kwargs)
+        finally:
+            with self._latency_lock:
+                self.latencies.append(time.perf_counter() - start)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_ingest(size, youtube, concurrency):
+    rows = ({"row": i, "video_id": f"v{i:010d}", "timestamp": ""} for i in range(1, size + 1))
+    with NotionMirror(":memory:") as mirror, TitleCache(":memory:") as cache:
+        summary = get_WL_from_youtube.run_ingest(rows, youtube, mirror, cache, concurrency)
+    return {"items": size, "created": summary.counts["created"], "failed": summary.counts["failed"]}
+
+
+def seed_flagged_pages(state, size):
+    state.seed_pages(
+        make_page(f"Video {i}", f"https://www.youtube.com/watch?v=v{i:010d}", delete=True)
+        for i in range(size)
+    )
+
+
+def run_delete_query(size):
+    items = sum(1 for _ in delete_WL_from_youtube.query_notion_delete_items())
+    return {"items": items}
+
+
+def run_delete_flags(size):
+    writer = delete_WL_from_youtube.start_notion_writer()
+    queued = 0
+    for item in delete_WL_from_youtube.query_notion_delete_items():
+        writer.submit(item)
+        queued += 1
+    results = writer.flush()
+    return {"items": queued, "updated": sum(1 for result in results if result["ok"])}
+
+
+def run_scenario(name, size, args):
+    state = FakeNotionState(latency=args.latency, error_rate=args.error_rate, retry_after=args.retry_after)
+    server, base_url = make_server(state)
+    client = TimedNotionClient(
+        "benchmark-token", base_url=base_url,
+        rate_limiter=TokenBucket(args.notion_rate, max(1, int(args.notion_rate))),
+        pool_size=max(10, args.concurrency)
+    )
+    set_notion_client(client)
+    youtube = FakeYouTube(latency=args.youtube_latency)
+
+    try:
+        if name != "ingest":
+            seed_flagged_pages(state, size)
+
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            if name == "ingest":
+                outcome = run_ingest(size, youtube, args.concurrency)
+            elif name == "delete_query":
+                outcome = run_delete_query(size)
+            else:
+                outcome = run_delete_flags(size)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+        client.session.close()
+
+    return dict(outcome, **{
+        "scenario": name,
+        "size": size,
+        "seconds": round(elapsed, 4),
+        "throughput_per_sec": round(size / elapsed, 2) if elapsed else None,
+        "notion_latency_p50": percentile(client.latencies, 0.50),
+        "notion_latency_p95": percentile(client.latencies, 0.95),
+        "notion_requests": sum(state.request_counts.values()),
+        "notion_requests_by_endpoint": state.request_counts,
+        "notion_throttled": state.throttled,
+        "youtube_calls": youtube.calls,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notion / YouTube API を使う処理のオフラインベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.0, help="Notion代替サーバーの応答遅延（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429を返す割合（0〜1）")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="429に付けるRetry-After（秒）")
+    parser.add_argument("--notion-rate", type=float, default=1000.0, help="クライアントのレート制限（リクエスト/秒）")
+    parser.add_argument("--youtube-latency", type=float, default=0.0, help="videos.list の応答遅延（秒）")
+    parser.add_argument("--concurrency", type=int, default=get_WL_from_youtube.NOTION_CONCURRENCY)
+    parser.add_argument("--output", help="結果のJSONを書き込むファイル（省略時は標準出力）")
+    args = parser.parse_args()
+
+    # ベンチマーク中はスクリプトのログを抑える
+    logging.getLogger().setLevel(logging.ERROR)
+    get_WL_from_youtube.NOTION_DATABASE_ID = DATABASE_ID
+    delete_WL_from_youtube.NOTION_DATABASE_ID = DATABASE_ID
+
+    results = [
+        run_scenario(name, size, args)
+        for name in args.scenarios
+        for size in args.sizes
+    ]
+    report = {"config": vars(args), "results": results}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+ログイン済みのブラウザを起動したままにして、保存・削除のジョブを受け付けるデーモン
+
+ブラウザの起動とログイン確認は起動時に1回だけ行い、以降のジョブは同じコンテキストのページで処理する。
+ジョブはローカルのHTTPエンドポイントで受け付けてキューに積み、ブラウザを操作するスレッドが順に処理する
+（Playwrightの同期APIは1スレッドからしか操作できないため、ブラウザの操作はすべてメインスレッドで行う）。
+
+    python browser_daemon.py serve
+    python browser_daemon.py save https://www.youtube.com/watch?v=xxxx
+    python browser_daemon.py remove xxxx yyyy
+
+HTTPエンドポイント（127.0.0.1 のみ）:
+    起動ごとに生成するトークンを DAEMON_TOKEN_FILE（所有者だけが読める）に書き、すべてのリクエストで
+    X-Daemon-Token ヘッダーに同じ値を要求する。ブラウザから送られたリクエスト（Origin ヘッダーつき）は拒否し、
+    POST は Content-Type: application/json だけを受け付ける（ほかのサイトのページからのリクエストを防ぐため）。
+    POST /jobs      {"jobs": [{"action": "save" | "remove", "url": URLまたは動画ID, "page_id": 任意}]}
+                    → {"results": [{"action", "url", "video_id", "status"}, ...]}
+                    待ち時間（1件あたり DAEMON_JOB_TIMEOUT）までに処理が始まらなかったジョブは取り消され、
+                    実行されない（status: cancelled）。処理中に待ち時間を過ぎたジョブは status: timeout
+                    save は youtube_save_handler と同じく、保存済みの動画では削除になる（status: added / removed / failed）
+                    remove で page_id を指定した場合はNotionのフラグも更新する（status: deleted / notion_failed / removed / failed）
+    GET  /status    → キューの件数と処理済みの件数
+    POST /shutdown  → 処理中のジョブが終わったら停止する
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+import page_waits
+import session_check
+from lean_browsing import LEAN_BROWSING, watch_requests
+from locator_cache import get_locator_cache
+from metrics import metrics
+from notion_api import extract_video_id
+from youtube_save_handler import to_video_url
+
+# 環境変数の読み込み
+load_dotenv()
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = int(os.getenv("DAEMON_PORT", "8765"))
+DAEMON_QUEUE_SIZE = int(os.getenv("DAEMON_QUEUE_SIZE", "1000"))
+DAEMON_JOB_TIMEOUT = float(os.getenv("DAEMON_JOB_TIMEOUT", "120"))  # 秒（1件あたり）
+
+# 起動ごとのトークンを書くファイルと、トークンを送るヘッダー
+DAEMON_TOKEN_FILE = os.getenv("DAEMON_TOKEN_FILE", "./daemon_token")
+TOKEN_HEADER = "X-Daemon-Token"
+
+# ブラウザの永続プロファイル（delete_WL_from_youtube と共通）
+CHROME_PROFILE_DIR = os.getenv("CHROME_PROFILE_DIR", "./chrome_profile")
+
+JOB_ACTIONS = ("save", "remove")
+
+
+def write_token_file(path=DAEMON_TOKEN_FILE):
+    """新しいトークンを生成し、所有者だけが読み書きできるファイルに書いて返す"""
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        # 既にあったファイルは作成時のモードが適用されないため、書き込む前に権限を絞る
+        os.chmod(path, 0o600)
+        f.write(token)
+    return token
+
+
+def read_token_file(path=DAEMON_TOKEN_FILE):
+    """起動中のデーモンのトークンを読む"""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+class Job:
+    """キューに積むジョブと、その結果を待つためのイベント"""
+
+    def __init__(self, action, url, page_id=None, title=None):
+        self.action = action
+        self.url = to_video_url(url)
+        self.video_id = extract_video_id(self.url)
+        self.page_id = page_id
+        self.title = title
+        self.status = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """
+        ワーカーが処理を始める前に呼ぶ。
+        返り値: 処理してよい場合は True（待ち時間を過ぎて取り消されていた場合は False）
+        """
+        with self._lock:
+            if self.done.is_set():
+                return False
+            self._started = True
+            return True
+
+    def cancel(self):
+        """
+        まだ処理を始めていないジョブを取り消す（応答の待ち時間を過ぎた場合）。
+        返り値: 取り消せた場合は True（既に処理中・処理済みの場合は False）
+        """
+        with self._lock:
+            if self._started or self.done.is_set():
+                return False
+            self.status = "cancelled"
+            self.done.set()
+            return True
+
+    def finish(self, status):
+        with self._lock:
+            if self.done.is_set():
+                # 取り消したジョブの結果は上書きしない
+                return
+            self.status = status
+            self.done.set()
+
+    def to_dict(self):
+        return {"action": self.action, "url": self.url, "video_id": self.video_id,
+                "status": self.status or "timeout"}
+
+
+class BrowserDaemon:
+    """ブラウザを起動したままジョブを順に処理するデーモン"""
+
+    def __init__(self, host=DAEMON_HOST, port=DAEMON_PORT, user_data_dir=CHROME_PROFILE_DIR, lean=LEAN_BROWSING,
+                 token_file=DAEMON_TOKEN_FILE):
+        self.host = host
+        self.port = port
+        self.user_data_dir = os.path.abspath(user_data_dir)
+        self.lean = lean
+        self.token_file = token_file
+        self.token = None
+        self.jobs = queue.Queue(maxsize=DAEMON_QUEUE_SIZE)
+        self.processed = 0
+        self.started_at = None
+        self._stop = threading.Event()
+
+    def submit(self, job):
+        """ジョブをキューに積む（満杯の場合は queue.Full を送出する）"""
+        self.jobs.put_nowait(job)
+        return job
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        return {
+            "queued": self.jobs.qsize(),
+            "processed": self.processed,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else 0,
+        }
+
+    def _start_http_server(self):
+        self.token = write_token_file(self.token_file)
+        handler = type("BoundDaemonHandler", (DaemonHandler,), {"browser_daemon": self})
+        server = ThreadingHTTPServer((self.host, self.port), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="daemon-http", daemon=True).start()
+        logger.info(f"Listening on http://{self.host}:{server.server_address[1]} (token in {self.token_file})")
+        return server
+
+    def _stop_http_server(self, server):
+        server.shutdown()
+        server.server_close()
+        try:
+            os.remove(self.token_file)
+        except OSError:
+            pass
+
+    def serve_forever(self):
+        """ブラウザを起動してログインを確認し、停止されるまでジョブを処理する"""
+        # ブラウザ関連のライブラリは読み込みが重いため、デーモンを起動するときに読み込む
+        import agentql
+        from playwright.sync_api import sync_playwright
+        from delete_WL_from_youtube import ensure_logged_in
+        from youtube_save_handler import AGENTQL_API_KEY
+
+        agentql.configure(api_key=AGENTQL_API_KEY)
+        os.makedirs(self.user_data_dir, exist_ok=True)
+
+        with sync_playwright() as p:
+            # 保存ジョブはヘッドレスでは安定しないため、画面ありで起動する
+            browser = p.chromium.launch_persistent_context(
+                user_data_dir=self.user_data_dir,
+                headless=False,
+                args=[
+                    '--disable-blink-features=AutomationControlled',
+                    '--no-sandbox',
+                ]
+            )
+            request_stats = watch_requests(browser, block=self.lean)
+            page = agentql.wrap(browser.new_page())
+
+            if session_check.is_session_valid(self.user_data_dir):
+                logger.info("Already logged in (session cookies are valid)")
+            elif not ensure_logged_in(page, self.user_data_dir):
+                browser.close()
+                return
+
+            server = self._start_http_server()
+            self.started_at = time.time()
+            try:
+                while not self._stop.is_set():
+                    try:
+                        job = self.jobs.get(timeout=1.0)
+                    except queue.Empty:
+                        continue
+                    if not job.start():
+                        # 応答の待ち時間を過ぎて取り消されたジョブは実行しない
+                        logger.info(f"Skipping cancelled job {job.action} {job.video_id}")
+                        continue
+                    with metrics.span("daemon_job", action=job.action):
+                        job.finish(self._run_job(page, job))
+                    self.processed += 1
+                    metrics.inc("daemon_jobs_total", action=job.action, status=job.status)
+                    logger.info(f"Job {job.action} {job.video_id} -> {job.status}")
+            except KeyboardInterrupt:
+                logger.info("Interrupted")
+            finally:
+                self._stop_http_server(server)
+                # 残っているジョブは失敗として返す
+                while not self.jobs.empty():
+                    self.jobs.get_nowait().finish("failed")
+                page_waits.recorder.log_summary()
+                logger.info(f"Locator cache stats: {get_locator_cache().stats()}")
+                request_stats.log_summary(self.processed)
+                metrics.export()
+                browser.close()
+
+    def _run_job(self, page, job):
+        from delete_WL_from_youtube import delete_from_watchlist, ensure_logged_in, mark_removed
+        from youtube_save_handler import toggle_watch_later
+
+        try:
+            if job.action == "save":
+                return toggle_watch_later(page, job.url)
+
+            removed = delete_from_watchlist(job.url, page)
+            if not removed and session_check.looks_logged_out(page):
+                # セッションが切れていた場合は再ログインして1回だけやり直す
+                session_check.invalidate_session_cache()
+                if ensure_logged_in(page, self.user_data_dir):
+                    removed = delete_from_watchlist(job.url, page)
+            if not removed:
+                return "failed"
+            if job.page_id:
+                # Notionのページが分かっている場合はフラグも更新する
+                item = {"page_id": job.page_id, "video_id": job.video_id, "title": job.title or ""}
+                return mark_removed(item)
+            return "removed"
+        except Exception as e:
+            logger.error(f"Error while running job {job.action} {job.url}: {str(e)}")
+            return "failed"
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    browser_daemon = None  # BrowserDaemon._start_http_server() で設定する
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _authorize(self, require_json=False):
+        """
+        トークンとリクエストの出どころを確認する。
+        返り値: 受け付ける場合は True（拒否した場合はエラーの応答を送って False）
+        """
+        if self.headers.get("Origin") is not None:
+            # ブラウザで開いたページからのリクエスト
+            self._send(403, {"error": "cross-origin requests are not allowed"})
+            return False
+        expected = self.browser_daemon.token
+        token = self.headers.get(TOKEN_HEADER) or ""
+        if not expected or not hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8")):
+            self._send(401, {"error": f"missing or invalid {TOKEN_HEADER} header"})
+            return False
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if require_json and content_type != "application/json":
+            self._send(415, {"error": "Content-Type must be application/json"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorize():
+            return
+        if self.path == "/status":
+            self._send(200, self.browser_daemon.status())
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self._authorize(require_json=True):
+            return
+        if self.path == "/shutdown":
+            self.browser_daemon.stop()
+            self._send(200, {"stopping": True})
+            return
+        if self.path != "/jobs":
+            self._send(404, {"error": "not found"})
+            return
+
+        try:
+            body = self._read_json()
+            specs = body.get("jobs", [body] if "action" in body else [])
+            jobs = [Job(spec["action"], spec["url"], spec.get("page_id"), spec.get("title")) for spec in specs]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._send(400, {"error": f"invalid request: {str(e)}"})
+            return
+        invalid = [job.action for job in jobs if job.action not in JOB_ACTIONS]
+        if not jobs or invalid:
+            self._send(400, {"error": f"jobs must have action in {JOB_ACTIONS}"})
+            return
+
+        # 結果を待つ期限（キューの先のジョブの分も含めて、1件あたり DAEMON_JOB_TIMEOUT まで）
+        # このリクエストのジョブを積む前のキューの件数で決める
+        deadline = time.monotonic() + DAEMON_JOB_TIMEOUT * (len(jobs) + self.browser_daemon.jobs.qsize())
+        try:
+            for job in jobs:
+                self.browser_daemon.submit(job)
+        except queue.Full:
+            # 積めた分も取り消して、リクエスト全体を失敗として返す
+            for job in jobs:
+                job.cancel()
+            self._send(503, {"error": "job queue is full"})
+            return
+
+        for job in jobs:
+            job.done.wait(max(0.0, deadline - time.monotonic()))
+            # 期限までに始まらなかったジョブは取り消す（応答の後で実行されて結果が分からなくなるのを防ぐ）
+            job.cancel()
+        self._send(200, {"results": [job.to_dict() for job in jobs]})
+
+
+def submit_jobs(jobs, host=DAEMON_HOST, port=DAEMON_PORT, token_file=DAEMON_TOKEN_FILE):
+    """
+    起動中のデーモンにジョブを送り、結果を返す。
+    jobs: [{"action": "save" | "remove", "url": str}, ...]
+    """
+    import requests
+
+    timeout = DAEMON_JOB_TIMEOUT * max(1, len(jobs)) + 10
+    headers = {TOKEN_HEADER: read_token_file(token_file)}
+    response = requests.post(f"http://{host}:{port}/jobs", json={"jobs": jobs}, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ブラウザを起動したまま保存・削除のジョブを受け付けるデーモン")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="デーモンを起動する")
+    serve.add_argument("--lean", action="store_true", default=LEAN_BROWSING,
+                       help="動画・画像・広告などのリクエストを中断する")
+    for action in JOB_ACTIONS:
+        sub = subparsers.add_parser(action, help=f"起動中のデーモンに {action} のジョブを送る")
+        sub.add_argument("urls", nargs="+", help="動画のURLまたは動画ID")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        BrowserDaemon(port=args.port, lean=args.lean).serve_forever()
+        return
+
+    results = submit_jobs([{"action": args.command, "url": url} for url in args.urls], port=args.port)
+    for result in results:
+        print(f"{result['status']}\t{result['url']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Notion Watchlist Manager のコマンドラインの入口
+
+    python cli.py ingest [CSV / .zip] [--from-playlist]
+    python cli.py delete [--resume] [--reconcile] [--lean]
+    python cli.py save URL|ID|FILE|- ... [--tabs N]
+    python cli.py status [--offline]
+    python cli.py daemon [--port PORT] [--lean]
+    python cli.py watch [--resume] [--lean]
+    python cli.py shards ingest|delete [--config shards.json] [--workers N]
+
+各サブコマンドが必要とするモジュール（Googleのクライアントライブラリ、Playwright、AgentQL）は、
+そのサブコマンドを実行するときにだけ読み込む。status はローカルミラーだけを使うため、すぐに起動できる。
+"""
+import argparse
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# 環境変数の読み込み
+load_dotenv()
+
+# ログの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def run_ingest(args):
+    import get_WL_from_youtube
+
+    get_WL_from_youtube.ingest(args.source or get_WL_from_youtube.CSV_FILE, from_playlist=args.from_playlist)
+
+
+def run_delete(args):
+    import delete_WL_from_youtube
+
+    results = delete_WL_from_youtube.process_videos(
+        resume=args.resume, reconcile=args.reconcile, watch_later_source=args.watch_later_source,
+        lean=args.lean or delete_WL_from_youtube.LEAN_BROWSING
+    )
+    # 削除対象を読めなかった場合などは失敗として終了する
+    return 1 if results is None else 0
+
+
+def run_save(args):
+    import youtube_save_handler
+
+    try:
+        urls = list(youtube_save_handler.read_video_urls(args.inputs))
+    except (ValueError, OSError) as e:
+        logger.error(str(e))
+        return 1
+    if len(urls) == 1:
+        youtube_save_handler.handle_youtube_save(urls[0])
+    elif urls:
+        youtube_save_handler.handle_youtube_save_batch(urls, tabs=args.tabs or youtube_save_handler.SAVE_TABS)
+
+
+def run_daemon(args):
+    import browser_daemon
+
+    browser_daemon.BrowserDaemon(port=args.port, lean=args.lean or browser_daemon.LEAN_BROWSING).serve_forever()
+
+
+def run_watch(args):
+    import watch_deletions
+
+    watch_deletions.watch(resume=args.resume, lean=args.lean or watch_deletions.LEAN_BROWSING)
+
+
+def run_shards(args):
+    import shards
+
+    return shards.run_from_args(args)
+
+
+def run_status(args):
+    from notion_mirror import NotionMirror
+
+    with NotionMirror() as mirror:
+        if not args.offline:
+            # 前回の同期以降に更新されたページだけを取り込む
+            from notion_api import get_notion_client
+
+            try:
+                mirror.sync(get_notion_client(), os.getenv("NOTION_DATABASE_ID"))
+            except Exception as e:
+                logger.warning(f"Failed to sync Notion mirror, using local copy: {str(e)}")
+        counts = mirror.flag_counts()
+
+    print(f"登録済み: {counts['total']}")
+    print(f"削除待ち（delete）: {counts['flagged']}")
+    print(f"削除済み（deleted）: {counts['deleted']}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="YouTubeの後で見るリストをNotionで管理する")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="後で見るリストの動画をNotionに登録する")
+    ingest.add_argument("source", nargs="?",
+                        help="後で見るリストのCSV、またはGoogle Takeoutの.zip（デフォルト: CSV_FILE）")
+    ingest.add_argument("--from-playlist", action="store_true",
+                        help="CSVの代わりに、ログイン済みのブラウザで後で見るプレイリストのページから読む")
+    ingest.set_defaults(func=run_ingest)
+
+    delete = subparsers.add_parser("delete", help="Notionで delete にチェックした動画を後で見るリストから削除する")
+    delete.add_argument("--resume", action="store_true", help="前回のジャーナルを再生し、中断したところから再開する")
+    delete.add_argument("--reconcile", action="store_true",
+                        help="現在の後で見るリストと突き合わせ、既に無い動画はブラウザを開かずにNotionだけ更新する")
+    delete.add_argument("--watch-later-source",
+                        help="突き合わせに使う後で見るリストのCSV、またはGoogle Takeoutの.zip（--reconcile を含む）。"
+                             "削除対象のページの最終編集より古い場合は実行しない")
+    delete.add_argument("--lean", action="store_true",
+                        help="動画・画像・広告などのリクエストを中断し、ログイン済みならヘッドレスで実行する")
+    delete.set_defaults(func=run_delete)
+
+    save = subparsers.add_parser("save", help="動画を後で見るリストに保存する（保存済みの場合は削除する）")
+    save.add_argument("inputs", nargs="+", help="動画のURL・動画ID・それらを1行ずつ書いたファイル・-（標準入力）")
+    save.add_argument("--tabs", type=int, help="同時に使うタブ数（デフォルト: SAVE_TABS）")
+    save.set_defaults(func=run_save)
+
+    status = subparsers.add_parser("status", help="登録済み・削除待ち・削除済みの件数を表示する")
+    status.add_argument("--offline", action="store_true", help="Notionと同期せず、ローカルミラーの件数を表示する")
+    status.set_defaults(func=run_status)
+
+    daemon = subparsers.add_parser("daemon", help="ブラウザを起動したまま保存・削除のジョブを受け付ける")
+    daemon.add_argument("--port", type=int, default=int(os.getenv("DAEMON_PORT", "8765")))
+    daemon.add_argument("--lean", action="store_true", help="動画・画像・広告などのリクエストを中断する")
+    daemon.set_defaults(func=run_daemon)
+
+    watch = subparsers.add_parser("watch", help="Notionを監視し、delete が付いた動画をすぐに削除する")
+    watch.add_argument("--resume", action="store_true", help="前回のジャーナルを再生し、中断したところから再開する")
+    watch.add_argument("--lean", action="store_true",
+                       help="動画・画像・広告などのリクエストを中断し、ログイン済みならヘッドレスで実行する")
+    watch.set_defaults(func=run_watch)
+
+    from shards import add_shard_arguments
+
+    shards = subparsers.add_parser("shards", help="複数のアカウント（シャード）の取り込み・削除を並行して実行する")
+    add_shard_arguments(shards)
+    shards.set_defaults(func=run_shards)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
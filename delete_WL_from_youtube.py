@@ -1,11 +1,23 @@
 #!/usr/bin/env python3
 import os
+import argparse
+import re
 import logging
-import agentql
-from agentql.ext.playwright.sync_api import Page
-from playwright.sync_api import sync_playwright
+import time
+from collections import deque
 from dotenv import load_dotenv
-import requests
+
+import page_waits
+from lean_browsing import LEAN_BROWSING, watch_requests
+from metrics import metrics
+import session_check
+from notion_writer import NotionWriteBehind
+from deletion_journal import (
+    DeletionJournal, QUEUED, REMOVED_ON_YOUTUBE, NOTION_UPDATED, FAILED, STEP_NOTION
+)
+from locator_cache import get_locator_cache
+from notion_api import extract_video_id, get_notion_client
+from reconcile import is_source_older_than, load_watch_later_ids, snapshot_playlist_ids
 
 # 環境変数の読み込み
 load_dotenv()
@@ -20,12 +32,36 @@ logger = logging.getLogger(__name__)
 # Notion設定
 NOTION_API_TOKEN = os.getenv("NOTION_API_TOKEN")
 NOTION_DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
-NOTION_VERSION = "2022-06-28"
 DELETE_PROPERTY_NAME = "delete"    # チェックボックス型プロパティ
 DELETED_PROPERTY_NAME = "deleted"  # チェックボックス型プロパティ（削除済みフラグ）
 VIDEOID_PROPERTY_NAME = "Link"     # 動画URLを格納しているプロパティ
 PROPERTY_TITLE = "Name"           # Title型（get_WL_from_youtubeと統一）
 
+# Notionのフラグ更新をバックグラウンドで行うワーカースレッド数（0の場合は削除のたびに同期的に更新）
+NOTION_WRITER_WORKERS = int(os.getenv("NOTION_WRITER_WORKERS", "2"))
+
+# ブラウザの永続プロファイル（ログイン状態を保持する）
+CHROME_PROFILE_DIR = os.getenv("CHROME_PROFILE_DIR", "./chrome_profile")
+
+# ログインが必要なときに手動ログインを待つか（0 の場合は入力を待たずにエラーにする。シャードのワーカーなど、端末が無い場合に使う）
+INTERACTIVE_LOGIN = os.getenv("INTERACTIVE_LOGIN", "1") == "1"
+
+# 削除処理に使うタブ数（同じログイン済みコンテキスト内で並列にページを読み込む）
+DELETE_TABS = int(os.getenv("DELETE_TABS", "3"))
+
+# 削除方法（"tabs": 動画ページごとに削除 / "playlist": 後で見るプレイリストのページでまとめて削除）
+DELETE_MODE = os.getenv("DELETE_MODE", "tabs")
+
+# 後で見るプレイリストのページ構造
+WATCH_LATER_URL = "https://www.youtube.com/playlist?list=WL"
+PLAYLIST_CONTAINER_SELECTOR = "#contents"
+PLAYLIST_ITEM_SELECTOR = "ytd-playlist-video-renderer"
+PLAYLIST_ITEM_LINK_SELECTOR = "a#video-title"
+PLAYLIST_ITEM_MENU_SELECTOR = "#menu button"
+PLAYLIST_MENU_ITEM_SELECTOR = "ytd-menu-service-item-renderer"
+PLAYLIST_REMOVE_TEXT = "「後で見る」から削除"  # 「後で見る」を含む別の項目と区別するため、項目の文言全体で一致させる
+PLAYLIST_LOAD_TIMEOUT = 5000       # 追加の項目が読み込まれるまで待つ時間（ミリ秒）
+
 # 保存メニュー項目を探すクエリ
 SAVE_MENU_QUERY = """
 {
@@ -39,8 +75,9 @@ def check_login_status(page):
     """ログイン状態を確認する"""
     try:
         # YouTubeのトップページに移動
-        page.goto("https://www.youtube.com")
-        page.wait_for_timeout(2000)
+        with metrics.span("page_goto", target="home"):
+            page.goto("https://www.youtube.com")
+        page_waits.wait_for_selector(page, "ytd-masthead", "page_loaded")
         
         # ログインボタンが存在するか確認
         login_query = """
@@ -49,7 +86,8 @@ def check_login_status(page):
         }
         """
         logger.info(f"Executing login button query: {login_query}")
-        response = page.query_elements(login_query)
+        with metrics.span("agentql_query"):
+            response = page.query_elements(login_query)
         logger.info(f"Login button query response: {response}")
         
         # レスポンスがnullの場合はログイン済み
@@ -66,17 +104,17 @@ def check_login_status(page):
         }
         """
         logger.info(f"Executing library button query: {library_query}")
-        library_response = page.query_elements(library_query)
-        logger.info(f"Library button query response: {library_response}")
-        if not hasattr(library_response, 'library_link') or library_response.library_link is None:
+        library_link = get_locator_cache().resolve(page, library_query, ("library_link",))
+        if library_link is None:
             logger.info("Not logged in: Library button not found")
             return False
             
         logger.info("Login check passed: Library button found")
             
         # 後で見るプレイリストへのアクセスを試行
-        page.goto("https://www.youtube.com/playlist?list=WL")
-        page.wait_for_timeout(2000)
+        with metrics.span("page_goto", target="playlist"):
+            page.goto(WATCH_LATER_URL)
+        page_waits.wait_for_selector(page, "ytd-browse", "page_loaded")
         
         # プレイリストのタイトルを確認
         playlist_query = """
@@ -85,9 +123,8 @@ def check_login_status(page):
         }
         """
         logger.info(f"Executing playlist title query: {playlist_query}")
-        playlist_response = page.query_elements(playlist_query)
-        logger.info(f"Playlist title query response: {playlist_response}")
-        if not hasattr(playlist_response, 'playlist_title') or playlist_response.playlist_title is None:
+        playlist_title = get_locator_cache().resolve(page, playlist_query, ("playlist_title",))
+        if playlist_title is None:
             logger.info("Not logged in: Watch Later playlist not accessible")
             return False
             
@@ -103,7 +140,8 @@ def manual_login(page):
     try:
         # ログインページにアクセス
         logger.info("Navigating to YouTube login page...")
-        page.goto("https://www.youtube.com")
+        with metrics.span("page_goto", target="home"):
+            page.goto("https://www.youtube.com")
         
         # ログインボタンをクリック
         login_button = page.get_by_role("link", name="ログイン")
@@ -116,7 +154,6 @@ def manual_login(page):
             
             # ログイン後のページ読み込みを待機
             page.wait_for_load_state("networkidle")
-            page.wait_for_timeout(2000)
             
             # ログイン状態を確認
             if check_login_status(page):
@@ -130,44 +167,368 @@ def manual_login(page):
         logger.error(f"Error during manual login: {str(e)}")
         return False
 
-def delete_from_watchlist(video_url, page):
-    """YouTubeの動画を後で見るリストから削除する"""
+def ensure_logged_in(page, user_data_dir=CHROME_PROFILE_DIR):
+    """
+    画面でログイン状態を確認し、必要なら手動ログインを行う。ログイン済みと確認できた結果はキャッシュする。
+    INTERACTIVE_LOGIN が無効でログインが必要な場合は RuntimeError を送出する
+    """
+    if check_login_status(page):
+        logger.info("Already logged in")
+    else:
+        logger.info("Login required...")
+        if not INTERACTIVE_LOGIN:
+            raise RuntimeError(
+                f"YouTube login required for browser profile {user_data_dir}, but interactive login is disabled. "
+                f"Log in once by running delete_WL_from_youtube.py with CHROME_PROFILE_DIR={user_data_dir}, then retry"
+            )
+        if not manual_login(page):
+            logger.error("Failed to login")
+            return False
+
+    session_check.mark_session_valid(user_data_dir)
+    return True
+
+def open_video_page(video_url, page):
+    """動画ページへの遷移を開始する（ページの読み込み完了は待たない）"""
+    logger.info(f"Accessing video page: {video_url}")
+    with metrics.span("page_goto", target="watch"):
+        page.goto(video_url, wait_until="commit")
+
+def remove_from_opened_page(page):
+    """open_video_page で遷移を開始したページで、動画を後で見るリストから削除する"""
     try:
-        # 動画ページにアクセス
-        logger.info(f"Accessing video page: {video_url}")
-        page.goto(video_url)
-        
         # ページが完全にロードされるまで待機
         logger.info("Waiting for page to load...")
-        page.wait_for_selector("ytd-watch-flexy")
-        page.wait_for_timeout(2000)
+        page_waits.wait_for_selector(page, "ytd-watch-flexy", "page_loaded", state="attached")
 
         try:
             # メニューボタンをクリック
             logger.info("Looking for menu button...")
             menu_button = page.get_by_role("button", name="その他の操作")
-            if menu_button:
+            if page_waits.wait_for_locator(menu_button, "menu_button"):
                 menu_button.click()
-                page.wait_for_timeout(1000)
+                page_waits.wait_for_menu(page)
                 
                 # 後で見るを削除
-                menu_response = page.query_elements(SAVE_MENU_QUERY)
-                if hasattr(menu_response.menu_items[0], 'watch_later'):
-                    menu_response.menu_items[0].watch_later.click()
-                    logger.info("Removed from Watch Later")
-                    return True
+                watch_later = get_locator_cache().resolve(page, SAVE_MENU_QUERY, ("menu_items", 0, "watch_later"))
+                if watch_later is not None:
+                    confirmation = page_waits.ConfirmationWait(page)
+                    watch_later.click()
+                    if confirmation.wait():
+                        logger.info("Removed from Watch Later")
+                        return True
+                    logger.error("Removal from Watch Later was not confirmed")
                     
         except Exception as e:
             logger.error(f"Error while removing from Watch Later: {str(e)}")
         
-        # 操作完了後の待機
-        page.wait_for_timeout(2000)
-        
     except Exception as e:
         logger.error(f"Error occurred: {str(e)}")
     
     return False
 
+def delete_from_watchlist(video_url, page):
+    """YouTubeの動画を後で見るリストから削除する"""
+    try:
+        open_video_page(video_url, page)
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}")
+        return False
+    return remove_from_opened_page(page)
+
+def record_state(journal, item, state, reason=None):
+    """ジャーナルが指定されていればアイテムの状態遷移を記録する"""
+    if journal is not None:
+        journal.record(item, state, reason)
+
+def mark_removed(item, journal=None, writer=None):
+    """
+    YouTubeでの削除が済んだアイテムのNotionフラグを更新する。
+    writer（NotionWriteBehind）を渡した場合は更新をキューに積むだけで、すぐに戻る。
+    返り値: "deleted" / "notion_failed" / "removed"（writer の書き込み待ち）
+    """
+    record_state(journal, item, REMOVED_ON_YOUTUBE)
+
+    if writer is not None:
+        writer.submit(item)
+        return "removed"
+
+    # 削除に成功した場合、deleteフラグをFalseに、deletedフラグをTrueに設定
+    if update_notion_delete_flag(item["page_id"], delete_flag=False, deleted_flag=True):
+        record_state(journal, item, NOTION_UPDATED)
+        return "deleted"
+
+    logger.error(f"Failed to update Notion flags for {item.get('title', 'Unknown')}")
+    record_state(journal, item, FAILED, "notion update failed")
+    return "notion_failed"
+
+def start_notion_writer(journal=None, workers=NOTION_WRITER_WORKERS):
+    """deleteフラグをFalseに、deletedフラグをTrueに設定する書き込みを、バックグラウンドで行うキューを開始する"""
+    def write(item):
+        return update_notion_delete_flag(item["page_id"], delete_flag=False, deleted_flag=True)
+
+    def done(item, ok):
+        if ok:
+            record_state(journal, item, NOTION_UPDATED)
+        else:
+            logger.error(f"Failed to update Notion flags for {item.get('title', 'Unknown')}")
+            record_state(journal, item, FAILED, "notion update failed")
+
+    return NotionWriteBehind(write, workers=workers, on_done=done)
+
+def apply_writer_results(results, writer_results):
+    """書き込み待ち（"removed"）のアイテムの結果を、バックグラウンドでの書き込み結果で置き換える"""
+    outcomes = {result["item"]["page_id"]: result["ok"] for result in writer_results}
+    for result in results:
+        if result["status"] == "removed" and result["page_id"] in outcomes:
+            result["status"] = "deleted" if outcomes[result["page_id"]] else "notion_failed"
+            logger.info(f"Result: {result.get('title', 'Unknown')} (ID: {result['video_id']}) -> {result['status']}")
+
+def skip_completed_items(items, journal, results, writer=None):
+    """
+    ジャーナルを参照して、ブラウザでの削除が必要なアイテムだけを yield する。
+    YouTubeで削除済みのアイテムはNotionの更新だけを行い、その結果を results に追加する。
+    （Notionの更新まで終わったアイテムは delete が外れているため、再び現れた場合は付け直されたものとして処理する）
+    """
+    for item in items:
+        step = journal.pending_step(item)
+        if step == STEP_NOTION:
+            logger.info(f"Already removed on YouTube, updating Notion only: {item.get('title', 'Unknown')}")
+            results.append(dict(item, status=mark_removed(item, journal, writer)))
+        else:
+            yield item
+
+def skip_items_gone_from_watch_later(items, watch_later_ids, journal, results, writer=None):
+    """
+    後で見るリストに残っている（集合に含まれる）アイテムだけを yield する。
+    手動や別の端末で既に削除されていたアイテムは、ブラウザを開かずにNotionの更新だけを行い、結果を results に追加する。
+    """
+    for item in items:
+        if item["video_id"] in watch_later_ids:
+            yield item
+            continue
+        logger.info(f"Already gone from Watch Later, updating Notion only: {item.get('title', 'Unknown')}")
+        metrics.inc("delete_items_reconciled_total")
+        results.append(dict(item, status=mark_removed(item, journal, writer)))
+
+def load_current_watch_later_ids(page, source=None):
+    """
+    突き合わせに使う後で見るリストの動画IDの集合を読む（source を指定した場合はTakeoutの書き出しから）。
+    読めなかった場合は None を返し、すべてのアイテムをブラウザで処理する。
+    """
+    try:
+        watch_later_ids = load_watch_later_ids(source) if source else snapshot_playlist_ids(page)
+    except Exception as e:
+        logger.warning(f"Failed to read the current Watch Later list, skipping reconciliation: {str(e)}")
+        return None
+    logger.info(f"Watch Later currently has {len(watch_later_ids)} videos")
+    return watch_later_ids
+
+def delete_items_in_tabs(browser, items, tabs=DELETE_TABS, first_page=None, journal=None, writer=None, wrap=None):
+    """
+    複数のタブを使って削除対象を順に処理する。
+
+    Playwrightの同期APIは1スレッドからしか操作できないため、各タブで次の動画への遷移を
+    先に開始しておき、読み込みが終わったタブから順にメニュー操作とNotion更新を行う。
+    これにより、あるタブでの操作中にほかのタブのページ読み込みが並行して進む。
+
+    Args:
+        browser: ログイン済みの永続コンテキスト
+        items: 削除対象 {"page_id", "video_id", "title"} のイテラブル（作業キューとして順に取り出す）
+        tabs (int): 使用するタブ数
+        first_page: 既に開いているAgentQLラップ済みのページ（あれば1つ目のタブとして使う）
+        journal (DeletionJournal): 状態遷移を記録するジャーナル
+        writer (NotionWriteBehind): Notionの更新をバックグラウンドで行うキュー
+        wrap: 新しく開いたタブのページをラップする関数（省略時は agentql.wrap）
+
+    Returns:
+        list: アイテムごとの結果
+            {"page_id", "video_id", "title",
+             "status": "deleted" | "remove_failed" | "notion_failed" | "removed"}
+    """
+    if wrap is None:
+        import agentql
+        wrap = agentql.wrap
+
+    work_queue = iter(items)
+    pages = [first_page] if first_page is not None else []
+    while len(pages) < max(1, tabs):
+        pages.append(wrap(browser.new_page()))
+
+    # 読み込み中のタブ（遷移を開始した順）
+    in_flight = deque()
+    results = []
+
+    def start_next(page):
+        for item in work_queue:
+            video_url = f"https://www.youtube.com/watch?v={item['video_id']}"
+            logger.info(f"Processing: {item['title']} (ID: {item['video_id']})")
+            record_state(journal, item, QUEUED)
+            started = time.monotonic()
+            try:
+                open_video_page(video_url, page)
+            except Exception as e:
+                logger.error(f"Failed to open {video_url}: {str(e)}")
+                record_state(journal, item, FAILED, f"failed to open video page: {str(e)}")
+                results.append(dict(item, status="remove_failed"))
+                continue
+            in_flight.append((page, item, started))
+            return
+
+    for page in pages:
+        start_next(page)
+
+    while in_flight:
+        page, item, started = in_flight.popleft()
+        title = item.get("title", "Unknown")
+
+        # 動画を「後で見る」リストから削除
+        removed = remove_from_opened_page(page)
+        if not removed and session_check.looks_logged_out(page):
+            # ログアウトしているようなら画面で確認・再ログインしてからやり直す
+            logger.warning("Session looks logged out, verifying login...")
+            session_check.invalidate_session_cache()
+            if ensure_logged_in(page):
+                removed = delete_from_watchlist(f"https://www.youtube.com/watch?v={item['video_id']}", page)
+
+        if removed:
+            status = mark_removed(item, journal, writer)
+        else:
+            logger.error(f"Failed to remove {title} from Watch Later")
+            record_state(journal, item, FAILED, "removal from Watch Later failed")
+            status = "remove_failed"
+
+        results.append(dict(item, status=status))
+        metrics.observe("delete_item_seconds", time.monotonic() - started, mode="tabs")
+        metrics.inc("delete_items_total", status=status)
+        logger.info(f"Result: {title} (ID: {item['video_id']}) -> {status}")
+
+        # このタブで次のアイテムの読み込みを開始
+        start_next(page)
+
+    # 追加で開いたタブを閉じる
+    for page in pages:
+        if page is not first_page:
+            page.close()
+
+    return results
+
+def index_playlist_items(page, video_ids=None):
+    """
+    後で見るプレイリストのページをスクロールして遅延読み込みされる項目をすべて読み込み、
+    動画IDから行要素（Locator）への索引を作る。
+
+    Args:
+        page: プレイリストのページを開いているページ
+        video_ids: 探したい動画IDの集合（すべて見つかった時点でスクロールを打ち切る）
+
+    Returns:
+        dict: {video_id: 行要素のLocator}（プレイリストが空の場合は空の辞書）
+    """
+    # 空のプレイリストでは行が描画されないため、リストの要素を待ってから行の描画を待つ
+    page.wait_for_selector(PLAYLIST_CONTAINER_SELECTOR, state="attached")
+    try:
+        page.wait_for_selector(PLAYLIST_ITEM_SELECTOR, state="attached", timeout=PLAYLIST_LOAD_TIMEOUT)
+    except Exception:
+        logger.info("Watch Later playlist is empty")
+        return {}
+    wanted = set(video_ids) if video_ids is not None else None
+
+    while True:
+        hrefs = page.locator(PLAYLIST_ITEM_SELECTOR).evaluate_all(
+            "(rows, link) => rows.map(row => { const a = row.querySelector(link); return a ? a.href : ''; })",
+            PLAYLIST_ITEM_LINK_SELECTOR
+        )
+        loaded_ids = {extract_video_id(href) for href in hrefs} - {""}
+        if wanted is not None and wanted <= loaded_ids:
+            break
+
+        # 末尾までスクロールし、項目が増えなければ読み込み完了とみなす
+        page.evaluate("window.scrollTo(0, document.documentElement.scrollHeight)")
+        try:
+            page.wait_for_function(
+                "([selector, count]) => document.querySelectorAll(selector).length > count",
+                arg=[PLAYLIST_ITEM_SELECTOR, len(hrefs)],
+                timeout=PLAYLIST_LOAD_TIMEOUT
+            )
+        except Exception:
+            break
+
+    logger.info(f"Indexed {len(loaded_ids)} videos in Watch Later playlist")
+
+    # 削除で行の位置がずれても同じ要素を指すよう、リンク先の動画IDで行を特定する
+    return {
+        video_id: page.locator(PLAYLIST_ITEM_SELECTOR).filter(
+            has=page.locator(f'{PLAYLIST_ITEM_LINK_SELECTOR}[href*="v={video_id}"]')
+        ).first
+        for video_id in loaded_ids
+    }
+
+def remove_playlist_item(page, row):
+    """プレイリストの行の操作メニューから「後で見る」から削除する"""
+    try:
+        row.scroll_into_view_if_needed()
+        row.locator(PLAYLIST_ITEM_MENU_SELECTOR).first.click()
+        page_waits.wait_for_menu(page)
+        remove_item = re.compile(rf"^\s*{re.escape(PLAYLIST_REMOVE_TEXT)}\s*$")
+        confirmation = page_waits.ConfirmationWait(page)
+        page.locator(PLAYLIST_MENU_ITEM_SELECTOR).filter(has_text=remove_item).first.click()
+        # 行が消えても削除のリクエストが終わっていない場合があるため、両方を待つ
+        removed = page_waits.wait_for_locator(row, "row_removed", state="detached")
+        return confirmation.wait() and removed
+    except Exception as e:
+        logger.error(f"Error while removing playlist item: {str(e)}")
+        return False
+
+def bulk_delete_from_playlist(page, items, journal=None, writer=None):
+    """
+    後で見るプレイリストのページを1回だけ読み込み、対象の動画をページ内の操作でまとめて削除する。
+
+    Args:
+        page: ログイン済みコンテキストのページ
+        items: 削除対象 {"page_id", "video_id", "title"} のイテラブル
+        journal (DeletionJournal): 状態遷移を記録するジャーナル
+        writer (NotionWriteBehind): Notionの更新をバックグラウンドで行うキュー
+
+    Returns:
+        list: アイテムごとの結果
+            {"page_id", "video_id", "title",
+             "status": "deleted" | "remove_failed" | "notion_failed" | "not_in_playlist" | "removed"}
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    logger.info(f"Opening Watch Later playlist: {WATCH_LATER_URL}")
+    with metrics.span("page_goto", target="playlist"):
+        page.goto(WATCH_LATER_URL)
+    index = index_playlist_items(page, {item["video_id"] for item in items})
+
+    results = []
+    for item in items:
+        title = item.get("title", "Unknown")
+        started = time.monotonic()
+        row = index.get(item["video_id"])
+        record_state(journal, item, QUEUED)
+        if row is None:
+            logger.warning(f"{title} (ID: {item['video_id']}) not found in Watch Later playlist")
+            record_state(journal, item, FAILED, "not in Watch Later playlist")
+            status = "not_in_playlist"
+        elif remove_playlist_item(page, row):
+            logger.info(f"Removed from Watch Later: {title}")
+            status = mark_removed(item, journal, writer)
+        else:
+            logger.error(f"Failed to remove {title} from Watch Later")
+            record_state(journal, item, FAILED, "removal from Watch Later failed")
+            status = "remove_failed"
+
+        results.append(dict(item, status=status))
+        metrics.observe("delete_item_seconds", time.monotonic() - started, mode="playlist")
+        metrics.inc("delete_items_total", status=status)
+        logger.info(f"Result: {title} (ID: {item['video_id']}) -> {status}")
+
+    return results
+
 def update_notion_delete_flag(page_id, delete_flag=False, deleted_flag=False):
     """
     Notionのページの delete フラグと deleted フラグを更新する
@@ -180,12 +541,6 @@ def update_notion_delete_flag(page_id, delete_flag=False, deleted_flag=False):
     Returns:
         bool: 更新に成功した場合はTrue、失敗した場合はFalse
     """
-    url = f"https://api.notion.com/v1/pages/{page_id}"
-    headers = {
-        "Authorization": f"Bearer {NOTION_API_TOKEN}",
-        "Content-Type": "application/json",
-        "Notion-Version": NOTION_VERSION
-    }
     data = {
         "properties": {
             DELETE_PROPERTY_NAME: {"checkbox": delete_flag},
@@ -194,7 +549,7 @@ def update_notion_delete_flag(page_id, delete_flag=False, deleted_flag=False):
     }
 
     try:
-        response = requests.patch(url, headers=headers, json=data)
+        response = get_notion_client().patch(f"pages/{page_id}", json=data)
         if response.status_code == 200:
             logger.info(f"Successfully updated delete flag to {delete_flag} and deleted flag to {deleted_flag} for page {page_id}")
             return True
@@ -208,14 +563,22 @@ def update_notion_delete_flag(page_id, delete_flag=False, deleted_flag=False):
 def query_notion_delete_items():
     """
     Notionデータベースをクエリして、「delete」チェックボックスがtrueのページを取得する。
-    返り値は [ {"page_id": str, "video_id": str, "title": str}, ... ] のリスト
+
+    削除の処理は同じ delete フラグを外していくため、ページネーションの途中で削除を始めると
+    結果の集合が縮んでカーソルの先のページを読み飛ばす。そのため、すべてのページを読み終えてからリストで返す。
+    途中で失敗した場合は一部だけのリストを返さず、例外（NotionAPIError / requests.RequestException）を送出する。
+
+    Returns:
+        list: {"page_id": str, "video_id": str, "title": str, "last_edited_time": str} のリスト
+    """
+    return list(iter_notion_delete_items())
+
+
+def iter_notion_delete_items():
+    """
+    query_notion_delete_items() の本体。ページネーションをたどり、レスポンスが届くたびに1件ずつ yield する。
+    返したページのフラグを変更しながら読み進めてはいけない。
     """
-    url = f"https://api.notion.com/v1/databases/{NOTION_DATABASE_ID}/query"
-    headers = {
-        "Authorization": f"Bearer {NOTION_API_TOKEN}",
-        "Content-Type": "application/json",
-        "Notion-Version": NOTION_VERSION
-    }
     data = {
         "filter": {
             "property": DELETE_PROPERTY_NAME,
@@ -224,92 +587,147 @@ def query_notion_delete_items():
             }
         }
     }
+    properties = [PROPERTY_TITLE, VIDEOID_PROPERTY_NAME, DELETE_PROPERTY_NAME, DELETED_PROPERTY_NAME]
 
-    try:
-        logger.info(f"Executing query: {data}")
-        response = requests.post(url, headers=headers, json=data)
-        logger.info(f"Query response: {response.text}")
-        if response.status_code != 200:
-            logger.error(f"Failed to query Notion DB: {response.status_code}, {response.text}")
-            return []
-
-        results = response.json().get("results", [])
-        delete_items = []
-
-        for page in results:
-            page_id = page["id"]
-            props = page["properties"]
-
-            # デバッグ用：利用可能なプロパティ名を出力
-            logger.info(f"Available properties for page {page_id}: {list(props.keys())}")
-
-            # タイトルプロパティを取得
-            title_prop = props.get(PROPERTY_TITLE, {})
-            title_value = ""
-            if title_prop["type"] == "title":
-                title_array = title_prop.get("title", [])
-                if title_array:
-                    title_value = title_array[0]["text"]["content"]
-
-            # VideoIDプロパティから動画IDを取得
-            video_id_value = ""
-            if VIDEOID_PROPERTY_NAME not in props:
-                logger.warning(f"Link property not found in page {page_id}")
-                continue
+    logger.info(f"Executing query: {data}")
+    pages = get_notion_client().query_database(NOTION_DATABASE_ID, data, filter_properties=properties)
 
-            prop_info = props[VIDEOID_PROPERTY_NAME]
-            if prop_info["type"] == "url":
-                url = prop_info.get("url", "")
-                if "youtube.com" in url or "youtu.be" in url:
-                    if "youtube.com/watch?v=" in url:
-                        video_id_value = url.split("watch?v=")[1].split("&")[0]
-                    elif "youtu.be/" in url:
-                        video_id_value = url.split("youtu.be/")[1].split("?")[0]
+    for page in pages:
+        page_id = page["id"]
+        props = page["properties"]
 
-            if video_id_value:
-                delete_items.append({
-                    "page_id": page_id,
-                    "video_id": video_id_value,
-                    "title": title_value
-                })
+        # デバッグ用：利用可能なプロパティ名を出力
+        logger.debug(f"Available properties for page {page_id}: {list(props.keys())}")
 
-        return delete_items
+        # タイトルプロパティを取得
+        title_prop = props.get(PROPERTY_TITLE, {})
+        title_value = ""
+        if title_prop.get("type") == "title":
+            title_array = title_prop.get("title", [])
+            if title_array:
+                title_value = title_array[0]["text"]["content"]
 
-    except Exception as e:
-        logger.error(f"Error querying Notion database: {str(e)}")
-        return []
+        # VideoIDプロパティから動画IDを取得
+        if VIDEOID_PROPERTY_NAME not in props:
+            logger.warning(f"Link property not found in page {page_id}")
+            continue
+
+        prop_info = props[VIDEOID_PROPERTY_NAME]
+        video_id_value = ""
+        if prop_info["type"] == "url":
+            video_id_value = extract_video_id(prop_info.get("url", ""))
+
+        if video_id_value:
+            yield {
+                "page_id": page_id,
+                "video_id": video_id_value,
+                "title": title_value,
+                "last_edited_time": page.get("last_edited_time")
+            }
+
+def launch_browser(p, lean=LEAN_BROWSING, user_data_dir=CHROME_PROFILE_DIR):
+    """
+    永続プロファイルでブラウザを起動し、ログインを確認する。
+
+    Args:
+        p: sync_playwright() のインスタンス
+        lean (bool): True の場合は不要なリクエストを中断し、ログイン済みならヘッドレスで実行する
+
+    Returns:
+        (browser, page, request_stats) / ログインできなかった場合は None
+    """
+    import agentql
+
+    # ユーザーデータディレクトリの設定
+    user_data_dir = os.path.abspath(user_data_dir)
+    os.makedirs(user_data_dir, exist_ok=True)
+    
+    # Cookieでログイン済みと分かる場合だけヘッドレスにできる（手動ログインには画面が必要）
+    session_valid = session_check.is_session_valid(user_data_dir)
+    headless = lean and session_valid
+
+    # ブラウザの設定
+    browser = p.chromium.launch_persistent_context(
+        user_data_dir=user_data_dir,
+        headless=headless,
+        args=[
+            '--disable-blink-features=AutomationControlled',
+            '--no-sandbox',
+            '--disable-web-security',
+            '--disable-features=IsolateOrigins,site-per-process'
+        ]
+    )
+    request_stats = watch_requests(browser, block=lean)
+    if lean:
+        logger.info(f"Lean browsing enabled (headless={headless})")
+    
+    # AgentQLでページをラップ
+    page = agentql.wrap(browser.new_page())
+    
+    # ログイン状態を確認（Cookieが有効に見える場合は画面での確認を省略する）
+    if session_valid:
+        logger.info("Already logged in (session cookies are valid)")
+    elif not ensure_logged_in(page, user_data_dir):
+        browser.close()
+        return None
+    return browser, page, request_stats
+
+def run_deletion_batch(browser, page, items, journal, watch_later_ids=None):
+    """
+    削除対象のアイテムを削除する（状態遷移はジャーナルに記録する）。
+    Notionのフラグ更新はバックグラウンドで行い、ブラウザはすぐ次の動画に進む。
+
+    Args:
+        items: 削除対象 {"page_id", "video_id", "title"} のイテラブル
+        journal (DeletionJournal): 状態遷移を記録するジャーナル
+        watch_later_ids (set): 現在の後で見るリストの動画ID（指定した場合は含まれないアイテムをNotionの更新だけにする）
+
+    Returns:
+        list: アイテムごとの結果（Notionの書き込みまで確定したもの）
+    """
+    writer = start_notion_writer(journal) if NOTION_WRITER_WORKERS > 0 else None
+    results = []
+    try:
+        items = skip_completed_items(items, journal, results, writer)
+        if watch_later_ids is not None:
+            items = skip_items_gone_from_watch_later(items, watch_later_ids, journal, results, writer)
+        if DELETE_MODE == "playlist":
+            # 後で見るプレイリストのページでまとめて削除
+            results.extend(bulk_delete_from_playlist(page, items, journal, writer))
+        else:
+            # ページ単位で届いた順に複数タブで処理する
+            results.extend(delete_items_in_tabs(
+                browser, items, DELETE_TABS, first_page=page, journal=journal, writer=writer
+            ))
+    finally:
+        # 残っている書き込みをすべて終わらせてから結果を確定する
+        if writer is not None:
+            apply_writer_results(results, writer.flush())
+    return results
+
+def process_videos(resume=False, reconcile=False, watch_later_source=None, lean=LEAN_BROWSING):
+    """
+    後で見るリストから動画を削除する処理を実行
+
+    Args:
+        resume (bool): True の場合は前回のジャーナルを再生し、完了済みの手順を飛ばす
+        reconcile (bool): True の場合は現在の後で見るリストと突き合わせ、既に無い動画はブラウザを開かずにNotionだけ更新する
+        watch_later_source (str): 突き合わせに使うTakeoutの書き出し（省略時はプレイリストのページから読む）
+        lean (bool): True の場合は不要なリクエストを中断し、ログイン済みならヘッドレスで実行する
+
+    Returns:
+        list: アイテムごとの結果（run_deletion_batch と同じ）。
+            ブラウザの起動やログインに失敗した場合や、削除対象を最後まで読めなかった場合は None
+    """
+    # ブラウザ関連のライブラリは読み込みが重いため、ブラウザを使う場合だけ読み込む
+    from playwright.sync_api import sync_playwright
 
-def process_videos():
-    """後で見るリストから動画を削除する処理を実行"""
     with sync_playwright() as p:
         try:
-            # ユーザーデータディレクトリの設定
-            user_data_dir = os.path.abspath('./chrome_profile')
-            os.makedirs(user_data_dir, exist_ok=True)
-            
-            # ブラウザの設定
-            browser = p.chromium.launch_persistent_context(
-                user_data_dir=user_data_dir,
-                headless=False,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--no-sandbox',
-                    '--disable-web-security',
-                    '--disable-features=IsolateOrigins,site-per-process'
-                ]
-            )
-            
-            # AgentQLでページをラップ
-            page = agentql.wrap(browser.new_page())
-            
-            # ログイン状態を確認
-            if not check_login_status(page):
-                logger.info("Login required...")
-                if not manual_login(page):
-                    logger.error("Failed to login")
-                    return
-            else:
-                logger.info("Already logged in")
+            launched = launch_browser(p, lean)
+            if launched is None:
+                return
+            browser, page, request_stats = launched
             
             # 環境変数のチェック
             notion_token = os.getenv("NOTION_API_TOKEN")
@@ -317,44 +735,62 @@ def process_videos():
                 logger.error("NOTION_API_TOKEN is not set")
                 return
 
-            # 削除対象のアイテムを取得
-            delete_items = query_notion_delete_items()
-            if not delete_items:
-                logger.info("No items to delete")
+            # 削除対象のアイテム（一部しか読めなかった場合は、残りを処理したように見えないよう何もしない）
+            try:
+                items = query_notion_delete_items()
+            except Exception as e:
+                logger.error(f"Failed to read all pages flagged for deletion, nothing was deleted: {str(e)}")
                 return
 
-            success_count = 0
-            total_count = len(delete_items)
+            # 突き合わせに使う現在の後で見るリスト
+            watch_later_ids = None
+            if watch_later_source and is_source_older_than(watch_later_source, items):
+                # 書き出しの後に後で見るリストへ戻した動画を、削除済みとしてNotionに記録してしまうため実行しない
+                logger.error(
+                    f"{watch_later_source} is older than the last edit of the pages to delete. "
+                    "Export the Watch Later list again, or run without --watch-later-source."
+                )
+                return
+            if reconcile or watch_later_source:
+                watch_later_ids = load_current_watch_later_ids(page, watch_later_source)
 
-            # 各アイテムを処理
-            for item in delete_items:
-                page_id = item["page_id"]
-                video_id = item.get("video_id", "")
-                title = item.get("title", "Unknown")
-                
-                logger.info(f"Processing: {title} (ID: {video_id})")
-                
-                # 動画を「後で見る」リストから削除
-                video_url = f"https://www.youtube.com/watch?v={video_id}"
-                if delete_from_watchlist(video_url, page):
-                    # 削除に成功した場合、deleteフラグをFalseに、deletedフラグをTrueに設定
-                    if update_notion_delete_flag(page_id, delete_flag=False, deleted_flag=True):
-                        success_count += 1
-                    else:
-                        logger.error(f"Failed to update Notion flags for {title}")
-                else:
-                    logger.error(f"Failed to remove {title} from Watch Later")
+            # 削除対象のアイテムを削除する
+            with DeletionJournal(resume=resume) as journal:
+                results = run_deletion_batch(browser, page, items, journal, watch_later_ids)
+            if not results:
+                logger.info("No items to delete")
+                return results
 
+            success_count = sum(1 for result in results if result["status"] == "deleted")
+            total_count = len(results)
             logger.info(f"Deletion complete. Successfully deleted {success_count} out of {total_count} videos.")
+            page_waits.recorder.log_summary()
+            logger.info(f"Locator cache stats: {get_locator_cache().stats()}")
+            request_stats.log_summary(total_count)
+            return results
 
         except Exception as e:
             logger.error(f"Error in process_videos: {str(e)}")
+        finally:
+            metrics.export()
 
 def main():
     """メイン処理"""
+    parser = argparse.ArgumentParser(description="Notionで delete にチェックした動画を後で見るリストから削除する")
+    parser.add_argument("--resume", action="store_true", help="前回のジャーナルを再生し、中断したところから再開する")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="現在の後で見るリストと突き合わせ、既に無い動画はブラウザを開かずにNotionだけ更新する")
+    parser.add_argument("--watch-later-source",
+                        help="突き合わせに使う後で見るリストのCSV、またはGoogle Takeoutの.zip（--reconcile を含む）。"
+                             "削除対象のページの最終編集より古い場合は実行しない")
+    parser.add_argument("--lean", action="store_true", default=LEAN_BROWSING,
+                        help="動画・画像・広告などのリクエストを中断し、ログイン済みならヘッドレスで実行する（LEAN_BROWSING=1 と同じ）")
+    args = parser.parse_args()
+
     try:
         logger.info("Starting video processing")
-        process_videos()
+        process_videos(resume=args.resume, reconcile=args.reconcile, watch_later_source=args.watch_later_source,
+                       lean=args.lean)
         logger.info("Completed video processing")
         
     except Exception as e:
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+削除処理の追記型ジャーナル
+
+アイテムごとの状態遷移（queued → removed_on_youtube → notion_updated、または failed）を
+JSON Lines 形式で1行ずつ追記し、書き込みのたびにディスクへ同期する。
+処理が途中で止まっても、ジャーナルを再生すれば各アイテムの次に必要な手順が分かる。
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DELETION_JOURNAL_FILE = os.getenv("DELETION_JOURNAL_FILE", "deletion_journal.jsonl")
+
+# 状態
+QUEUED = "queued"
+REMOVED_ON_YOUTUBE = "removed_on_youtube"
+NOTION_UPDATED = "notion_updated"
+FAILED = "failed"
+
+# 次に必要な手順
+STEP_REMOVE = "remove"   # YouTubeからの削除から
+STEP_NOTION = "notion"   # Notionの更新だけ
+
+
+class DeletionJournal:
+    """削除処理の状態遷移を記録する追記型ジャーナル"""
+
+    def __init__(self, path=DELETION_JOURNAL_FILE, resume=False):
+        """
+        Args:
+            path (str): ジャーナルファイル
+            resume (bool): True の場合は既存のジャーナルを再生して続きから処理する。
+                False の場合は新しいジャーナルを開始する
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._states = {}
+
+        if resume:
+            self._replay()
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            logger.info(f"No journal to resume at {self.path}")
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 書き込み途中で止まった最後の行は無視する
+                    continue
+                self._apply(record)
+        logger.info(f"Replayed journal {self.path}: {len(self._states)} items")
+
+    def _apply(self, record):
+        state = record["state"]
+        previous = self._states.get(record["page_id"], {}).get("state")
+        # YouTubeで削除済みの記録は、その後のNotion更新の失敗で上書きしない
+        if state == FAILED and previous == REMOVED_ON_YOUTUBE:
+            record = dict(record, state=REMOVED_ON_YOUTUBE)
+        self._states[record["page_id"]] = record
+
+    def record(self, item, state, reason=None):
+        """アイテムの状態遷移を1行追記し、ディスクへ同期する"""
+        record = {
+            "time": time.time(),
+            "page_id": item["page_id"],
+            "video_id": item.get("video_id", ""),
+            "title": item.get("title", ""),
+            "state": state
+        }
+        if item.get("last_edited_time"):
+            record["last_edited_time"] = item["last_edited_time"]
+        if reason:
+            record["reason"] = reason
+
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(record)
+
+    def state(self, page_id):
+        with self._lock:
+            return self._states.get(page_id, {}).get("state")
+
+    def pending_step(self, item):
+        """
+        delete が付いているアイテムに次に必要な手順を返す。
+
+        Notionの更新まで終わった（delete フラグを外した）ページに再び delete が付いている場合は、
+        後で見るリストに追加し直して付け直したものとみなし、記録を使わずに最初から処理する。
+        YouTubeで削除済みの記録も、その後にNotionでページが編集されている（last_edited_time が変わった）場合は使わない。
+
+        Args:
+            item (dict): {"page_id", "last_edited_time"(任意)}
+
+        返り値: STEP_REMOVE / STEP_NOTION
+        """
+        with self._lock:
+            record = self._states.get(item["page_id"], {})
+        if record.get("state") != REMOVED_ON_YOUTUBE:
+            return STEP_REMOVE
+        edited, recorded = item.get("last_edited_time"), record.get("last_edited_time")
+        if edited and recorded and edited != recorded:
+            return STEP_REMOVE
+        return STEP_NOTION
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
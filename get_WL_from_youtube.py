@@ -1,13 +1,19 @@
+import argparse
 import csv
+import io
 import logging
 import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-import requests
+from metrics import metrics
+from notion_api import get_notion_client
+from notion_mirror import NotionMirror
+from playlist_extractor import read_playlist_rows
+from title_cache import TitleCache
 
 # Load environment variables
 load_dotenv()
@@ -16,12 +22,21 @@ load_dotenv()
 # 1. OAuthクライアントIDのJSONファイル
 CLIENT_SECRET_FILE = os.getenv("CLIENT_SECRET_FILE", "client_secret.json")
 
+# 1-1. 認証済みのOAuthトークンを保存するファイル（アカウントごとに分ける場合に指定する）
+YOUTUBE_TOKEN_FILE = os.getenv("YOUTUBE_TOKEN_FILE", "token.json")
+
 # 2. YouTube Data APIのスコープ
 SCOPES = ["https://www.googleapis.com/auth/youtube.readonly"]
 
-# 3. CSVファイル
+# トークンが無いときにブラウザでの認証を待つか（0 の場合は待たずにエラーにする。シャードのワーカーなど、端末が無い場合に使う）
+INTERACTIVE_LOGIN = os.getenv("INTERACTIVE_LOGIN", "1") == "1"
+
+# 3. CSVファイル（Google Takeoutの.zipをそのまま指定することもできる）
 CSV_FILE = os.getenv("CSV_FILE", "Watchlater.csv")
 
+# 3-1. Takeoutの.zip内で後で見るリストのCSVを探すときのファイル名の先頭（小文字で比較）
+TAKEOUT_CSV_PREFIXES = ("watch later", "後で見る")
+
 # 4. NotionのAPIトークンとデータベースID
 NOTION_API_TOKEN = os.getenv("NOTION_API_TOKEN")
 NOTION_DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
@@ -29,6 +44,19 @@ NOTION_DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
 # 5. Notionデータベースのプロパティ名
 PROPERTY_TITLE = "Name"  # Title型
 PROPERTY_LINK = "Link"   # URL型
+
+# 6. videos.list で一度に問い合わせる動画IDの最大数（APIの上限は50）
+YOUTUBE_BATCH_SIZE = 50
+
+# 7. Notionへのページ作成の同時実行数（レート制限は notion_api 側で守られる）
+NOTION_CONCURRENCY = int(os.getenv("NOTION_CONCURRENCY", "4"))
+
+# 8. Notionへの書き込み待ちとして保持する最大件数（これを超えると読み込みを待たせる）
+NOTION_MAX_PENDING = NOTION_CONCURRENCY * 4
+
+# 9. YouTube Data APIのディスカバリドキュメントのキャッシュと有効期間（秒）
+YOUTUBE_DISCOVERY_CACHE = os.getenv("YOUTUBE_DISCOVERY_CACHE", "youtube_discovery.json")
+YOUTUBE_DISCOVERY_TTL = float(os.getenv("YOUTUBE_DISCOVERY_TTL", str(7 * 24 * 3600)))
 # ---------------------------------------------
 
 # ログの設定
@@ -39,47 +67,115 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def fetch_discovery_document():
+    """
+    YouTube Data API v3 のディスカバリドキュメント（JSON文字列）を返す。
+    ライブラリに同梱されたものを使い、無い場合はディスカバリサービスから1回だけ取得する。
+    """
+    import requests
+    from googleapiclient.discovery import DISCOVERY_URI
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = get_static_doc("youtube", "v3")
+    if document is None:
+        response = requests.get(DISCOVERY_URI.format(api="youtube", apiVersion="v3"), timeout=30)
+        response.raise_for_status()
+        document = response.text
+    return document
+
+
+def build_youtube_client(creds, cache_file=YOUTUBE_DISCOVERY_CACHE, ttl=YOUTUBE_DISCOVERY_TTL):
+    """
+    YouTubeクライアントを作成する。
+    ディスカバリドキュメントはローカルのファイルにキャッシュし、有効期間内はそこから作成する。
+    """
+    import requests
+    from googleapiclient.discovery import build, build_from_document
+
+    if cache_file and os.path.exists(cache_file) and time.time() - os.path.getmtime(cache_file) < ttl:
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                return build_from_document(f.read(), credentials=creds)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load cached discovery document, rebuilding: {str(e)}")
+
+    try:
+        document = fetch_discovery_document()
+    except requests.RequestException as e:
+        logger.warning(f"Failed to fetch discovery document, building without cache: {str(e)}")
+        return build("youtube", "v3", credentials=creds)
+
+    if cache_file:
+        try:
+            tmp_path = f"{cache_file}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(document)
+            os.replace(tmp_path, cache_file)
+        except OSError as e:
+            logger.warning(f"Failed to cache discovery document: {str(e)}")
+    return build_from_document(document, credentials=creds)
+
+
 def authenticate_youtube():
     """
     OAuth 2.0でYouTube Data APIにアクセスするための認証を行い、
     認証済みのYouTubeクライアントインスタンスを返す。
     """
+    # Googleのクライアントライブラリは読み込みが重いため、APIを使う場合だけ読み込む
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+
     logger.info("Starting OAuth 2.0 authentication for YouTube...")
 
     creds = None
-    if os.path.exists("token.json"):
-        logger.info("Found existing token.json, loading credentials...")
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
+    if os.path.exists(YOUTUBE_TOKEN_FILE):
+        logger.info(f"Found existing {YOUTUBE_TOKEN_FILE}, loading credentials...")
+        creds = Credentials.from_authorized_user_file(YOUTUBE_TOKEN_FILE, SCOPES)
 
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             logger.info("Refreshing expired credentials...")
             creds.refresh(Request())
+        elif not INTERACTIVE_LOGIN:
+            raise RuntimeError(
+                f"No valid YouTube credentials in {YOUTUBE_TOKEN_FILE}, but interactive login is disabled. "
+                f"Authorize once by running get_WL_from_youtube.py with YOUTUBE_TOKEN_FILE={YOUTUBE_TOKEN_FILE}, then retry"
+            )
         else:
             logger.info("No valid credentials. Running local server flow...")
             flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRET_FILE, SCOPES)
-            creds = flow.run_local_server(port=8080)
+            # 空いているポートを使う（シャードを並行して実行したときに認証の待ち受けが衝突しないように）
+            creds = flow.run_local_server(port=0)
 
-        with open("token.json", "w") as token_file:
+        with open(YOUTUBE_TOKEN_FILE, "w") as token_file:
             token_file.write(creds.to_json())
-            logger.info("Saved new credentials to token.json.")
+            logger.info(f"Saved new credentials to {YOUTUBE_TOKEN_FILE}.")
 
-    youtube = build("youtube", "v3", credentials=creds)
+    youtube = build_youtube_client(creds)
     logger.info("Successfully built YouTube client.")
     return youtube
 
 
-def get_video_title(video_id: str, youtube):
+def get_video_title(video_id: str, youtube, cache=None, check_cache=True):
     """
     YouTubeクライアントと動画IDを使ってタイトルを取得する。
+    cache（TitleCache）を渡した場合、キャッシュにあればAPIを呼ばずに返し、取得したタイトルはキャッシュに保存する。
+    check_cache=False の場合は、呼び出し元でミスと分かっているためキャッシュを引かない（ミスを二重に数えないため）。
     返り値: 文字列（タイトル） / 失敗時は None
     """
+    if cache is not None and check_cache:
+        title = cache.get(video_id)
+        if title is not None:
+            return title
+
     logger.info(f"Fetching snippet for video_id='{video_id}'")
     try:
-        response = youtube.videos().list(
-            part="snippet",
-            id=video_id
-        ).execute()
+        with metrics.span("youtube_request", endpoint="videos.list"):
+            response = youtube.videos().list(
+                part="snippet",
+                id=video_id
+            ).execute()
 
         items = response.get("items", [])
         if not items:
@@ -89,24 +185,65 @@ def get_video_title(video_id: str, youtube):
         snippet = items[0].get("snippet", {})
         title = snippet.get("title", "")
         logger.info(f"Success: title retrieved for video_id='{video_id}'")
+        if cache is not None:
+            cache.put(video_id, title)
         return title
     except Exception as e:
         logger.exception(f"Exception while fetching title: {str(e)}")
         return None
 
 
+def get_video_titles(video_ids, youtube, cache=None):
+    """
+    複数の動画IDのタイトルを videos.list でまとめて取得する。
+    最大 YOUTUBE_BATCH_SIZE 件ずつ問い合わせ、必要なフィールドだけを返させる。
+    cache（TitleCache）を渡した場合、キャッシュにあるIDはAPIに問い合わせない。
+    返り値: {video_id: タイトル or None} の辞書
+    （削除済み・非公開などで取得できなかったIDは None）
+    """
+    titles = cache.get_many(video_ids) if cache is not None else {}
+    unique_ids = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in titles]
+    if cache is not None:
+        logger.info(f"Title cache: {len(titles)} hits, {len(unique_ids)} misses")
+
+    for start in range(0, len(unique_ids), YOUTUBE_BATCH_SIZE):
+        chunk = unique_ids[start:start + YOUTUBE_BATCH_SIZE]
+        logger.info(f"Fetching titles for {len(chunk)} videos ({start + 1}-{start + len(chunk)})")
+        try:
+            with metrics.span("youtube_request", endpoint="videos.list"):
+                response = youtube.videos().list(
+                    part="snippet",
+                    id=",".join(chunk),
+                    fields="items(id,snippet/title)"
+                ).execute()
+        except Exception as e:
+            # チャンク全体が失敗した場合は1件ずつ問い合わせて問題のIDを切り分ける
+            logger.warning(f"Batch request failed, falling back to single lookups: {str(e)}")
+            for video_id in chunk:
+                titles[video_id] = get_video_title(video_id, youtube, cache, check_cache=False)
+            continue
+
+        fetched = {item["id"]: item.get("snippet", {}).get("title", "") for item in response.get("items", [])}
+        titles.update(fetched)
+        if cache is not None:
+            cache.put_many(fetched)
+
+        # レスポンスに含まれなかったIDは1件ずつ報告する
+        for video_id in chunk:
+            if video_id not in titles:
+                logger.warning(f"No snippet found for video_id='{video_id}' (missing or private)")
+                titles[video_id] = None
+
+    return titles
+
+
 def create_notion_page(title: str, link: str):
     """
     Notionのデータベースに「タイトル・リンク」のページを作成する。
     ※ descriptionは扱わない。
+    返り値: 作成したページのID / 失敗時は None
     """
     logger.info(f"Creating a new page in Notion for title='{title}'")
-    url = "https://api.notion.com/v1/pages"
-    headers = {
-        "Authorization": f"Bearer {NOTION_API_TOKEN}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
 
     # Notion DBのプロパティをセット
     data = {
@@ -124,67 +261,266 @@ def create_notion_page(title: str, link: str):
     }
 
     try:
-        resp = requests.post(url, headers=headers, json=data)
+        resp = get_notion_client().post("pages", json=data)
         if resp.status_code in (200, 201):
             logger.info(f"Notion page created successfully: title='{title}'")
-        else:
-            logger.error(
-                f"Failed to create page in Notion. Status: {resp.status_code}, "
-                f"Response: {resp.text}"
-            )
+            return resp.json().get("id")
+        logger.error(
+            f"Failed to create page in Notion. Status: {resp.status_code}, "
+            f"Response: {resp.text}"
+        )
     except Exception as e:
         logger.exception(f"Exception while creating Notion page: {str(e)}")
+    return None
 
 
-def main():
-    logger.info("Starting application...")
+def create_notion_pages(entries, concurrency=NOTION_CONCURRENCY, max_pending=None):
+    """
+    複数のNotionページをスレッドプールで並列に作成する。
+    書き込み待ちは max_pending 件までに抑え、entries は必要になった分だけ読み進める。
+    entries: {"row": int, "video_id": str, "title": str, "link": str} のイテラブル
+    返り値: 作成が終わった順に行ごとの結果を yield するジェネレーター
+        {"row": int, "video_id": str, "title": str, "status": "created" | "failed", "page_id": str | None}
+    """
+    def create(entry):
+        with metrics.span("ingest_item"):
+            page_id = create_notion_page(entry["title"], entry["link"])
+        return {
+            "row": entry["row"],
+            "video_id": entry["video_id"],
+            "title": entry["title"],
+            "status": "created" if page_id else "failed",
+            "page_id": page_id
+        }
 
-    # 1. YouTube OAuth認証 → YouTubeクライアント取得
-    youtube = authenticate_youtube()
+    concurrency = max(1, concurrency)
+    max_pending = max_pending or concurrency * 4
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+        for entry in entries:
+            pending.add(executor.submit(create, entry))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+@contextmanager
+def open_watch_later_csv(path):
+    """
+    後で見るリストのCSVをテキストストリームとして開く。
+    Google Takeoutの.zipを指定した場合は、展開せずにアーカイブ内のCSVを直接読む。
+    """
+    if not zipfile.is_zipfile(path):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield f
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        csv_names = [name for name in archive.namelist() if name.lower().endswith(".csv")]
+        matches = [
+            name for name in csv_names
+            if os.path.basename(name).lower().startswith(TAKEOUT_CSV_PREFIXES)
+        ]
+        if not matches and len(csv_names) == 1:
+            matches = csv_names
+        if not matches:
+            raise FileNotFoundError(f"Watch Later CSV not found in '{path}'")
+
+        logger.info(f"Reading '{matches[0]}' from '{path}'")
+        with archive.open(matches[0]) as member:
+            yield io.TextIOWrapper(member, encoding="utf-8-sig", newline="")
+
+
+def read_watch_later_rows(path):
+    """
+    CSVを1行ずつ読み、{"row": 行番号, "video_id": str, "timestamp": str} を yield する。
+    """
+    with open_watch_later_csv(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)  # ヘッダを読み飛ばす
 
-    # 2. CSVファイルを読み込み、動画IDごとにタイトル・リンクを取得 → Notionにアップロード
-    try:
-        with open(CSV_FILE, "r", encoding="utf-8", newline="") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)  # ヘッダを読み飛ばす
+        for index, row in enumerate(reader, start=1):
+            if len(row) < 1 or not row[0].strip():
+                logger.warning(f"Row {index} is empty or invalid: {row}")
+                continue
+            yield {"row": index, "video_id": row[0].strip(), "timestamp": row[1] if len(row) > 1 else ""}
+
+
+def skip_known_rows(rows, known_ids, summary, deleted_ids=()):
+    """
+    登録済み（または入力内で重複）の動画をネットワークアクセスなしで読み飛ばす。
+    known_ids には新しく見つかった動画IDを追加していく。
+    deleted_ids（deleted のページしかない動画）は、後で見るリストに追加し直したものとして登録し直す。
+    """
+    for row in rows:
+        if row["video_id"] in known_ids:
+            summary.add({"row": row["row"], "video_id": row["video_id"], "status": "skipped"})
+            continue
+        if row["video_id"] in deleted_ids:
+            logger.info(f"Registering again a video deleted before: video_id='{row['video_id']}'")
+            summary.reregistered += 1
+            metrics.inc("ingest_reregistered_total")
+        known_ids.add(row["video_id"])
+        yield row
+
+
+def batched(items, size):
+    """イテラブルを size 件ずつのリストに区切る"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fetch_titles(batches, youtube, cache, summary):
+    """
+    行のバッチごとにタイトルをまとめて取得し、Notionに登録する内容を yield する。
+    既にタイトルを持つ行はAPIに問い合わせない。タイトルを取得できなかった行はスキップとして記録する。
+    """
+    for batch in batches:
+        missing = [row["video_id"] for row in batch if not row.get("title")]
+        titles = get_video_titles(missing, youtube, cache) if missing and youtube is not None else {}
 
-            index = 1
-            for row in reader:
-                if len(row) < 1:
-                    logger.warning(f"Row {index} is empty or invalid: {row}")
-                    continue
+        for row in batch:
+            index = row["row"]
+            video_id = row["video_id"]
+            logger.info(f"Processing row {index} - video_id='{video_id}'")
 
-                video_id = row[0]
-                timestamp = row[1] if len(row) > 1 else ""
+            title = row.get("title") or titles.get(video_id)
+            if not title:
+                logger.warning(f"Failed to get title for video_id='{video_id}'")
+                summary.add({"row": index, "video_id": video_id, "status": "skipped"})
+                continue
 
-                logger.info(f"Processing row {index} - video_id='{video_id}'")
+            # リンクを組み立て
+            link = f"https://www.youtube.com/watch?v={video_id}"
 
-                # タイトルを取得
-                title = get_video_title(video_id, youtube)
-                if title:
-                    # リンクを組み立て
-                    link = f"https://www.youtube.com/watch?v={video_id}"
+            # コンソール出力
+            print(f"{index}. タイトル: {title}")
+            print(f"   リンク: {link}")
+            print(f"   (追加日時: {row.get('timestamp', '')})")
+            print()
 
-                    # コンソール出力
-                    print(f"{index}. タイトル: {title}")
-                    print(f"   リンク: {link}")
-                    print(f"   (追加日時: {timestamp})")
-                    print()
+            yield {"row": index, "video_id": video_id, "title": title, "link": link}
+
+
+class IngestSummary:
+    """取り込み結果の件数と失敗した行を集計する（全行の結果は保持しない）"""
+
+    def __init__(self):
+        self.counts = {"created": 0, "failed": 0, "skipped": 0}
+        self.reregistered = 0  # deleted のページしかなかったため登録し直した件数（created / failed に含む）
+        self.failed_rows = []
+
+    def add(self, result):
+        self.counts[result["status"]] += 1
+        metrics.inc("ingest_items_total", status=result["status"])
+        if result["status"] == "failed":
+            self.failed_rows.append(result)
+
+    def log(self):
+        for status, count in self.counts.items():
+            logger.info(f"{status}: {count}")
+        if self.reregistered:
+            logger.info(f"registered again after deletion: {self.reregistered}")
+        for result in self.failed_rows:
+            logger.error(f"Row {result['row']} failed: video_id='{result['video_id']}'")
+
+
+def run_ingest(rows, youtube, mirror, cache, concurrency=NOTION_CONCURRENCY):
+    """
+    行の読み込み → 登録済みの除外 → IDのバッチ化 → タイトル取得 → Notionへの書き込み を
+    ジェネレーターの段として連結して実行する。各段は必要な分だけ読み進めるため、
+    入力の大きさにかかわらずメモリ使用量はバッチと書き込み待ちの件数で抑えられる。
+
+    Args:
+        rows: {"row", "video_id", "timestamp"(任意), "title"(任意)} のイテラブル
+        youtube: YouTubeクライアント（タイトルを持たない行がある場合に使う。None の場合はその行をスキップする）
+        mirror (NotionMirror): 登録済みの動画IDの判定と、作成したページの反映に使う
+            （deleted のページしかない動画は、後で見るリストに追加し直したものとして登録し直す）
+        cache (TitleCache): タイトルのキャッシュ
+        concurrency (int): Notionへのページ作成の同時実行数
+
+    Returns:
+        IngestSummary: 取り込み結果の集計
+    """
+    summary = IngestSummary()
+    known_ids = mirror.active_video_ids()
 
-                    # Notionへアップロード（descriptionは無し）
-                    create_notion_page(title, link)
-                else:
-                    logger.warning(f"Failed to get title for video_id='{video_id}'")
+    new_rows = skip_known_rows(rows, known_ids, summary, mirror.deleted_video_ids())
+    entries = fetch_titles(batched(new_rows, YOUTUBE_BATCH_SIZE), youtube, cache, summary)
 
-                index += 1
+    # Notionへアップロードし、作成したページをミラーに反映（descriptionは無し）
+    for result in create_notion_pages(entries, concurrency, NOTION_MAX_PENDING):
+        if result["status"] == "created":
+            mirror.upsert(result["video_id"], result["page_id"], title=result["title"])
+        summary.add(result)
+    mirror.commit()
 
+    return summary
+
+
+def ingest(source=CSV_FILE, from_playlist=False):
+    """
+    後で見るリストの動画をNotionに登録する
+
+    Args:
+        source (str): 後で見るリストのCSV、またはGoogle Takeoutの.zip
+        from_playlist (bool): True の場合はCSVの代わりにプレイリストのページから読む
+
+    Returns:
+        dict: 状態ごとの件数 {"created", "failed", "skipped"}（読み込みに失敗した場合は None）
+    """
+    logger.info("Starting application...")
+
+    # 1. YouTube OAuth認証 → YouTubeクライアント取得（プレイリストから読む場合はタイトルも取れるため不要）
+    youtube = None if from_playlist else authenticate_youtube()
+
+    # 2. ローカルミラーをNotionと同期し、登録済みの動画IDを取得
+    mirror = NotionMirror()
+    try:
+        mirror.sync(get_notion_client(), NOTION_DATABASE_ID)
+    except Exception as e:
+        logger.warning(f"Failed to sync Notion mirror, using local copy: {str(e)}")
+
+    # 3. CSV（またはプレイリストのページ）を1行ずつ読み、タイトル・リンクを取得 → Notionにアップロード
+    rows = read_playlist_rows() if from_playlist else read_watch_later_rows(source)
+    summary = None
+    try:
+        with TitleCache() as cache:
+            summary = run_ingest(rows, youtube, mirror, cache)
+            logger.info(f"Title cache stats: {cache.stats()}")
+
+        summary.log()
         logger.info("Finished processing CSV file.")
-    except FileNotFoundError:
-        logger.error(f"CSV file not found: '{CSV_FILE}'")
+    except FileNotFoundError as e:
+        logger.error(f"CSV file not found: {str(e)}")
     except Exception as e:
         logger.exception(f"An error occurred while reading the CSV file: {str(e)}")
+    finally:
+        mirror.close()
+        metrics.export()
 
     logger.info("Application completed successfully.")
+    return summary.counts if summary is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="後で見るリストの動画をNotionに登録する")
+    parser.add_argument("source", nargs="?", default=CSV_FILE,
+                        help="後で見るリストのCSV、またはGoogle Takeoutの.zip（デフォルト: CSV_FILE）")
+    parser.add_argument("--from-playlist", action="store_true",
+                        help="CSVの代わりに、ログイン済みのブラウザで後で見るプレイリストのページから動画とタイトルを読む")
+    args = parser.parse_args()
+
+    ingest(args.source, from_playlist=args.from_playlist)
 
 
 if __name__ == "__main__":
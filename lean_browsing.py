@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+ブラウザの通信を減らす軽量モード
+
+メニュー操作に不要な動画・画像・フォントと、広告・計測のリクエストをPlaywrightのルーティングで中断する。
+中断したリクエストの件数と、読み込んだリクエストの件数・バイト数を記録する。
+中断したリクエストはレスポンスを受け取らないため、削減できたバイト数そのものは分からない。
+軽量モードの有無で、読み込んだバイト数（動画1件あたり）を比べて効果を確認する。
+"""
+import logging
+import os
+import re
+
+from dotenv import load_dotenv
+
+from metrics import metrics
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 軽量モード（"1" でリクエストの中断と、可能な場合のヘッドレス実行を有効にする）
+LEAN_BROWSING = os.getenv("LEAN_BROWSING", "0") == "1"
+
+# 中断するリソースの種類
+BLOCKED_RESOURCE_TYPES = {"media", "image", "font"}
+
+# 中断するURL（動画のストリーム・広告・計測）
+BLOCKED_URL_PATTERN = re.compile(
+    r"googlevideo\.com/videoplayback"
+    r"|doubleclick\.net"
+    r"|googlesyndication\.com"
+    r"|googleadservices\.com"
+    r"|google-analytics\.com"
+    r"|googletagmanager\.com"
+    r"|youtube\.com/(pagead|ptracking|api/stats|generate_204)"
+    r"|youtube\.com/youtubei/v1/log_event"
+)
+
+
+def should_block(resource_type, url):
+    """リクエストを中断するかどうか"""
+    return resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_URL_PATTERN.search(url) is not None
+
+
+class RequestStats:
+    """中断したリクエストと読み込んだリクエストの集計"""
+
+    def __init__(self):
+        self.blocked = {}
+        self.loaded_requests = 0
+        self.loaded_bytes = 0
+
+    def record_blocked(self, resource_type):
+        self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+        metrics.inc("blocked_requests_total", resource_type=resource_type)
+
+    def record_loaded(self, response):
+        # Content-Length が無いレスポンス（chunked など）はバイト数に含めない
+        self.loaded_requests += 1
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.loaded_bytes += int(length)
+            metrics.inc("loaded_bytes_total", int(length))
+        metrics.inc("loaded_requests_total")
+
+    def summary(self, items=None):
+        result = {
+            "blocked_requests": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "loaded_requests": self.loaded_requests,
+            "loaded_bytes": self.loaded_bytes,
+        }
+        if items:
+            result["loaded_bytes_per_item"] = self.loaded_bytes // items
+        return result
+
+    def log_summary(self, items=None):
+        logger.info(f"Request stats: {self.summary(items)}")
+
+
+def watch_requests(context, block=LEAN_BROWSING):
+    """
+    ブラウザのコンテキストのリクエストを記録する。block=True の場合は不要なリクエストを中断する。
+    返り値: RequestStats
+    """
+    stats = RequestStats()
+
+    if block:
+        def route(route):
+            request = route.request
+            if should_block(request.resource_type, request.url):
+                stats.record_blocked(request.resource_type)
+                route.abort()
+            else:
+                route.continue_()
+
+        context.route("**/*", route)
+
+    context.on("response", stats.record_loaded)
+    return stats
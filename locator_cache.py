@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+AgentQLクエリの解決結果をローカルのセレクタとしてキャッシュする
+
+初回はAgentQL（リモート推論）で要素を特定し、その要素を指す安定したセレクタ
+（一意なid・aria-label・テキストの完全一致）をJSONファイルに保存する。
+2回目以降はキャッシュしたセレクタを先に試し、一致しなくなった場合や一意でなくなった場合だけAgentQLに戻る。
+"""
+import json
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from metrics import metrics
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LOCATOR_CACHE_FILE = os.getenv("LOCATOR_CACHE_FILE", "locator_cache.json")
+
+# キャッシュしたセレクタが表示されるまで待つ時間（ミリ秒）
+CACHED_LOCATOR_TIMEOUT = 2000
+
+# 要素から安定したセレクタを組み立てるスクリプト
+SELECTOR_SCRIPT = """
+el => {
+    const quote = s => s.replace(/\\\\/g, '\\\\\\\\').replace(/"/g, '\\\\"');
+    const tag = el.tagName.toLowerCase();
+    if (el.id && document.querySelectorAll('#' + CSS.escape(el.id)).length === 1) {
+        return '#' + CSS.escape(el.id);
+    }
+    const label = el.getAttribute('aria-label');
+    if (label) {
+        return `${tag}[aria-label="${quote(label)}"]`;
+    }
+    // :text-is() は（空白を詰めた）テキスト全体の完全一致。部分一致の :has-text() では似た項目にも一致してしまう
+    const text = (el.innerText || '').replace(/\\s+/g, ' ').trim();
+    if (text && text.length <= 80) {
+        return `${tag}:text-is("${quote(text)}")`;
+    }
+    return null;
+}
+"""
+
+
+class LocatorCache:
+    """AgentQLクエリの結果をセレクタとして保存・再利用するキャッシュ"""
+
+    def __init__(self, path=LOCATOR_CACHE_FILE):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._selectors = {}
+
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._selectors = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable locator cache '{path}': {str(e)}")
+            # 以前の形式の部分一致のセレクタは使わない（次に解決したときに完全一致のセレクタで保存し直す）
+            self._selectors = {key: selector for key, selector in self._selectors.items()
+                               if ":has-text(" not in selector}
+
+    @staticmethod
+    def make_key(query, path):
+        normalized = " ".join(query.split())
+        return f"{normalized}|{'.'.join(str(part) for part in path)}"
+
+    def resolve(self, page, query, path):
+        """
+        AgentQLクエリの結果から path で指定した要素を取り出す。
+
+        Args:
+            page: AgentQLでラップしたページ
+            query (str): AgentQLクエリ
+            path (tuple): 応答から要素をたどる属性名・インデックス（例: ("menu_items", 0, "watch_later")）
+
+        Returns:
+            Locator: 見つかった要素 / 見つからない場合は None
+        """
+        key = self.make_key(query, path)
+        selector = self._selectors.get(key)
+
+        if selector:
+            locator = page.locator(selector)
+            try:
+                locator.first.wait_for(state="visible", timeout=CACHED_LOCATOR_TIMEOUT)
+                # 保存したときは一意でも、このページでは複数の要素に一致する場合がある
+                count = locator.count()
+                if count != 1:
+                    raise ValueError(f"selector matches {count} elements")
+                self.hits += 1
+                metrics.inc("locator_cache_total", result="hit")
+                logger.debug(f"Locator cache hit: {selector}")
+                return locator
+            except Exception:
+                logger.info(f"Cached locator no longer matches, falling back to AgentQL: {selector}")
+                self.invalidations += 1
+                metrics.inc("locator_cache_total", result="invalidated")
+                self._forget(key)
+
+        self.misses += 1
+        metrics.inc("locator_cache_total", result="miss")
+        with metrics.span("agentql_query"):
+            element = page.query_elements(query)
+        try:
+            for part in path:
+                if element is None:
+                    break
+                element = element[part] if isinstance(part, int) else getattr(element, part, None)
+        except (IndexError, KeyError, TypeError):
+            element = None
+        if element is None:
+            return None
+
+        self._remember(page, key, element)
+        return element
+
+    def _remember(self, page, key, element):
+        try:
+            selector = element.evaluate(SELECTOR_SCRIPT)
+            # 一意に特定できるセレクタだけを保存する
+            if not selector or page.locator(selector).count() != 1:
+                return
+        except Exception as e:
+            logger.debug(f"Could not derive selector for '{key}': {str(e)}")
+            return
+
+        with self._lock:
+            self._selectors[key] = selector
+            self._save()
+        logger.info(f"Cached locator: {selector}")
+
+    def _forget(self, key):
+        with self._lock:
+            self._selectors.pop(key, None)
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._selectors, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        """ヒット・ミス・無効化の件数を返す"""
+        return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_locator_cache():
+    """LOCATOR_CACHE_FILE を使う共有キャッシュを返す"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LocatorCache()
+        return _cache
+
+
+def set_locator_cache(cache):
+    """共有キャッシュを差し替える（ベンチマークなどで別のファイルを使う場合）"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
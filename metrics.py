@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+処理ごとの計測（カウンターとレイテンシのヒストグラム）
+
+span() で囲んだ処理の所要時間をラベル別のヒストグラムに集計し、回数とエラー数をカウンターに記録する。
+実行の最後に export() でJSONのサマリーと、Prometheus の textfile collector 形式のファイルを書き出す。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+METRICS_JSON_FILE = os.getenv("METRICS_JSON_FILE", "metrics.json")
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE", "watchlist_manager.prom")
+
+# メトリクス名の接頭辞
+METRIC_PREFIX = "watchlist"
+
+# ヒストグラムのバケット（秒）
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metrics:
+    """カウンターとヒストグラムを保持するスレッドセーフな集計器"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        """カウンターを増やす"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """ヒストグラムに所要時間（秒）を記録する"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0, "max": 0.0}
+                self._histograms[key] = histogram
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            histogram["max"] = max(histogram["max"], seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """
+        処理の所要時間を計測する。
+        <name>_seconds のヒストグラムと <name>_total のカウンターに記録し、例外が出た場合は <name>_errors_total も増やす。
+        """
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self.inc(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(f"{name}_seconds", time.monotonic() - start, **labels)
+            self.inc(f"{name}_total", **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def to_dict(self):
+        """JSONに書き出せる形のサマリーを返す"""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(key), "value": value}
+                for (name, key), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(key),
+                    "count": histogram["count"],
+                    "sum": histogram["sum"],
+                    "mean": histogram["sum"] / histogram["count"] if histogram["count"] else 0.0,
+                    "max": histogram["max"],
+                    "buckets": dict(zip((str(bound) for bound in self.buckets), histogram["buckets"])),
+                }
+                for (name, key), histogram in sorted(self._histograms.items())
+            ]
+        return {"generated_at": time.time(), "counters": counters, "histograms": histograms}
+
+    def to_prometheus(self):
+        """Prometheus のテキスト形式で返す"""
+        lines = []
+        with self._lock:
+            declared = set()
+            for (name, key), value in sorted(self._counters.items()):
+                metric = f"{METRIC_PREFIX}_{name}"
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} counter")
+                    declared.add(metric)
+                lines.append(f"{metric}{_format_labels(key)} {value}")
+
+            for (name, key), histogram in sorted(self._histograms.items()):
+                metric = f"{METRIC_PREFIX}_{name}"
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} histogram")
+                    declared.add(metric)
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    lines.append(f"{metric}_bucket{_format_labels(key, [('le', str(bound))])} {count}")
+                lines.append(f"{metric}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram['count']}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {histogram['sum']}")
+                lines.append(f"{metric}_count{_format_labels(key)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path=METRICS_JSON_FILE, prom_path=METRICS_PROM_FILE):
+        """
+        JSONのサマリーとPrometheusのファイルを書き出す。
+        textfile collector が書き込み途中のファイルを読まないよう、一時ファイルから置き換える。
+        """
+        for path, content in (
+            (json_path, json.dumps(self.to_dict(), ensure_ascii=False, indent=2)),
+            (prom_path, self.to_prometheus()),
+        ):
+            if not path:
+                continue
+            try:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"Failed to write metrics to {path}: {str(e)}")
+        logger.info(f"Metrics written to {json_path} and {prom_path}")
+
+
+# スクリプト全体で共有する集計器
+metrics = Metrics()
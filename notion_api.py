@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Notion APIクライアント
+
+get_WL_from_youtube.py / delete_WL_from_youtube.py の両方から使う共通クライアント。
+- requests.Session を使い回して接続（keep-alive）を再利用する
+- トークンバケットでリクエストレートを Notion の上限（平均3リクエスト/秒）以下に抑える
+- 429 / 5xx はRetry-Afterを尊重しつつ指数バックオフで再試行する
+"""
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from dotenv import load_dotenv
+
+from metrics import metrics
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+NOTION_API_BASE_URL = os.getenv("NOTION_API_BASE_URL", "https://api.notion.com/v1")
+NOTION_VERSION = "2022-06-28"
+
+# レート制限（リクエスト/秒）とバースト許容量
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))
+NOTION_RATE_BURST = int(os.getenv("NOTION_RATE_BURST", "3"))
+
+# 再試行の設定
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "5"))
+NOTION_BACKOFF_BASE = 1.0   # 秒
+NOTION_BACKOFF_MAX = 30.0   # 秒
+NOTION_TIMEOUT = 30         # 秒
+
+# 再試行の対象とするステータスコード
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 冪等でないリクエストを再試行するステータスコード（429はリクエストが処理されていないことが保証される）
+NON_IDEMPOTENT_RETRY_STATUS_CODES = (429,)
+
+# 同じリクエストを繰り返しても結果が変わらないメソッド
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE")
+
+
+class NotionAPIError(Exception):
+    """Notion APIがエラーレスポンスを返した場合の例外"""
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.text = response.text
+        super().__init__(f"{response.status_code}, {response.text}")
+
+
+class TokenBucket:
+    """スレッドセーフなトークンバケット方式のレートリミッター"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取得する。空の場合は補充されるまで待機する"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket:
+    """
+    複数のプロセスで共有するトークンバケット方式のレートリミッター。
+    状態とロックは multiprocessing.Manager に置き（create_state() で作る）、プロセスプールのワーカーに渡して
+    同じNotionトークンを使うプロセスの間でレート制限の枠を分け合う。
+    """
+
+    def __init__(self, state, lock, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._state = state
+        self._lock = lock
+
+    @staticmethod
+    def create_state(manager, capacity):
+        """Managerに共有の状態とロックを作る。返り値: (state, lock)"""
+        # プロセス間で比較できるように、経過時間は time.time() で計る
+        return manager.dict(tokens=float(capacity), updated=time.time()), manager.Lock()
+
+    def acquire(self):
+        """トークンを1つ取得する。空の場合は補充されるまで待機する"""
+        while True:
+            with self._lock:
+                state = self._state.copy()
+                now = time.time()
+                tokens = min(self.capacity, state["tokens"] + max(0.0, now - state["updated"]) * self.rate)
+                if tokens >= 1:
+                    self._state.update(tokens=tokens - 1, updated=now)
+                    return
+                self._state.update(tokens=tokens, updated=now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+class NotionClient:
+    """接続を使い回し、レート制限と再試行を行うNotion APIクライアント"""
+
+    def __init__(self, token, base_url=NOTION_API_BASE_URL, rate_limiter=None,
+                 max_retries=NOTION_MAX_RETRIES, timeout=NOTION_TIMEOUT, pool_size=10):
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = rate_limiter or TokenBucket(NOTION_RATE_LIMIT, NOTION_RATE_BURST)
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self._property_ids = {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Notion-Version": NOTION_VERSION
+        })
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Notion APIへリクエストを送信する。
+
+        429 / 5xx と接続エラーは最大 max_retries 回まで再試行する。
+        Retry-Afterヘッダがあればその秒数、なければ指数バックオフで待機する。
+        冪等でないリクエスト（POST /pages など）は、既に処理されている可能性がある 5xx や送信後の接続エラーでは
+        再試行せず（重複して作成しないため）、429 と接続を確立できなかった場合だけ再試行する。
+
+        Args:
+            idempotent (bool): 再試行してよいリクエストかどうか（省略時はメソッドで判断する。POST は冪等でないとみなす）
+
+        Returns:
+            requests.Response: 最後に受け取ったレスポンス
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        with metrics.span("notion_request", method=method, endpoint=endpoint_label(path)):
+            return self._request_with_retry(method, path, idempotent, **kwargs)
+
+    def _request_with_retry(self, method, path, idempotent, **kwargs):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        retry_status_codes = RETRY_STATUS_CODES if idempotent else NON_IDEMPOTENT_RETRY_STATUS_CODES
+
+        attempt = 0
+        while True:
+            with metrics.span("notion_rate_limit_wait"):
+                self.rate_limiter.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.ConnectionError as e:
+                if attempt >= self.max_retries or not (idempotent or is_connect_error(e)):
+                    raise
+                wait = self._backoff(attempt)
+                logger.warning(f"Connection error on {method} {path}: {str(e)}. Retrying in {wait:.1f}s")
+            else:
+                if response.status_code not in retry_status_codes or attempt >= self.max_retries:
+                    return response
+                wait = self._retry_after(response) or self._backoff(attempt)
+                logger.warning(f"{method} {path} returned {response.status_code}. Retrying in {wait:.1f}s")
+
+            metrics.inc("notion_retries_total", method=method, endpoint=endpoint_label(path))
+            time.sleep(wait)
+            attempt += 1
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, idempotent=None, **kwargs):
+        return self.request("POST", path, idempotent=idempotent, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+    def get_property_ids(self, database_id, names):
+        """
+        データベースのスキーマを取得し、プロパティ名に対応するプロパティIDを返す。
+        スキーマはデータベースごとに一度だけ取得してキャッシュする。
+        """
+        if database_id not in self._property_ids:
+            response = self.get(f"databases/{database_id}")
+            if response.status_code != 200:
+                raise NotionAPIError(response)
+            properties = response.json().get("properties", {})
+            self._property_ids[database_id] = {name: prop["id"] for name, prop in properties.items()}
+
+        ids = self._property_ids[database_id]
+        return [ids[name] for name in names if name in ids]
+
+    def query_database(self, database_id, body=None, filter_properties=None, page_size=100):
+        """
+        データベースをクエリし、has_more / next_cursor をたどって全ページを取得する。
+        結果はレスポンスが届くたびに1件ずつ yield するため、全件をメモリに保持しない。
+
+        Args:
+            database_id (str): クエリ対象のデータベースID
+            body (dict): filter / sorts などのクエリ本文
+            filter_properties (list): 返させるプロパティ名（指定しなければ全プロパティ）
+            page_size (int): 1リクエストあたりの取得件数（最大100）
+
+        Yields:
+            dict: Notionのページオブジェクト
+        """
+        path = f"databases/{database_id}/query"
+        if filter_properties:
+            # プロパティIDは既にURLエンコードされた形（例: %3AUPp）で返されるため、params= で二重にエンコードせずにそのまま付ける
+            ids = self.get_property_ids(database_id, filter_properties)
+            path += "?" + "&".join(f"filter_properties={property_id}" for property_id in ids)
+
+        data = dict(body or {}, page_size=page_size)
+        while True:
+            # データベースのクエリは読み取りだけのため、POST でも再試行してよい
+            response = self.post(path, idempotent=True, json=data)
+            if response.status_code != 200:
+                raise NotionAPIError(response)
+
+            payload = response.json()
+            results = payload.get("results", [])
+            logger.debug(f"Fetched {len(results)} pages from database {database_id}")
+            yield from results
+
+            if not payload.get("has_more") or not payload.get("next_cursor"):
+                return
+            data["start_cursor"] = payload["next_cursor"]
+
+    @staticmethod
+    def _backoff(attempt):
+        return min(NOTION_BACKOFF_MAX, NOTION_BACKOFF_BASE * (2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return min(NOTION_BACKOFF_MAX, float(value))
+        except ValueError:
+            return None
+
+
+def is_connect_error(error):
+    """接続を確立できなかった（リクエストを1バイトも送っていない）エラーかどうか"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def endpoint_label(path):
+    """メトリクスのラベルに使うため、パスからIDとクエリ文字列を除いたエンドポイント名を返す（例: databases/query）"""
+    parts = [part for part in path.split("?")[0].split("/") if part]
+    if not parts:
+        return ""
+    return "/".join(parts[:1] + parts[2:])
+
+
+def extract_video_id(url):
+    """YouTubeのURLから動画IDを取り出す。YouTubeのURLでなければ空文字を返す"""
+    if not url:
+        return ""
+    if "youtube.com/watch?v=" in url:
+        return url.split("watch?v=")[1].split("&")[0]
+    if "youtu.be/" in url:
+        return url.split("youtu.be/")[1].split("?")[0]
+    return ""
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_notion_client():
+    """環境変数 NOTION_API_TOKEN から作成した共有クライアントを返す"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = NotionClient(os.getenv("NOTION_API_TOKEN"))
+        return _client
+
+
+def set_notion_client(client):
+    """get_notion_client() が返す共有クライアントを差し替える（別のトークンや接続先を使う場合）"""
+    global _client
+    with _client_lock:
+        _client = client
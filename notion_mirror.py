@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+NotionデータベースのローカルSQLiteミラー
+
+ページIDをキーに、動画ID・タイトル・delete / deleted フラグを保持する
+（同じ動画のページが複数あっても、それぞれのページのフラグを保持する）。
+last_edited_time を高水位点として保存し、前回の同期以降に更新されたページだけを取得する。
+"""
+import logging
+import os
+import sqlite3
+
+from dotenv import load_dotenv
+
+from notion_api import extract_video_id
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+NOTION_MIRROR_DB = os.getenv("NOTION_MIRROR_DB", "notion_mirror.db")
+
+# Notionデータベースのプロパティ名
+PROPERTY_TITLE = "Name"            # Title型
+PROPERTY_LINK = "Link"             # URL型
+DELETE_PROPERTY_NAME = "delete"    # チェックボックス型
+DELETED_PROPERTY_NAME = "deleted"  # チェックボックス型
+
+# 何件ごとにコミットするか（同期が途中で止まっても進捗を残すため）
+COMMIT_INTERVAL = 100
+
+# スキーマの版（PRAGMA user_version）。古い版のミラーは作り直して全件を同期し直す
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page_id TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    title TEXT,
+    delete_flag INTEGER NOT NULL DEFAULT 0,
+    deleted_flag INTEGER NOT NULL DEFAULT 0,
+    last_edited_time TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_video_id ON pages (video_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    database_id TEXT PRIMARY KEY,
+    high_water_mark TEXT
+);
+"""
+
+
+def parse_watchlist_page(page):
+    """
+    Notionのページオブジェクトからミラーに保存する値を取り出す。
+    返り値: dict / Linkが YouTube のURLでない場合は None
+    """
+    props = page.get("properties", {})
+
+    link = props.get(PROPERTY_LINK, {})
+    video_id = extract_video_id(link.get("url") or "") if link.get("type") == "url" else ""
+    if not video_id:
+        return None
+
+    title = ""
+    title_array = props.get(PROPERTY_TITLE, {}).get("title", [])
+    if title_array:
+        title = title_array[0].get("plain_text") or title_array[0].get("text", {}).get("content", "")
+
+    return {
+        "video_id": video_id,
+        "page_id": page["id"],
+        "title": title,
+        "delete_flag": bool(props.get(DELETE_PROPERTY_NAME, {}).get("checkbox")),
+        "deleted_flag": bool(props.get(DELETED_PROPERTY_NAME, {}).get("checkbox")),
+        "last_edited_time": page.get("last_edited_time")
+    }
+
+
+class NotionMirror:
+    """NotionデータベースのローカルSQLiteミラー"""
+
+    def __init__(self, path=NOTION_MIRROR_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+
+    def _migrate(self):
+        """動画IDをキーにしていた版のミラーを捨てる（次の同期で全件を取得し直す）"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        if self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'pages'").fetchone():
+            logger.info(f"Rebuilding Notion mirror {self.path} keyed by page ID (full sync on next run)")
+            self.conn.execute("DROP TABLE pages")
+            self.conn.execute("DROP TABLE IF EXISTS sync_state")
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_high_water_mark(self, database_id):
+        row = self.conn.execute(
+            "SELECT high_water_mark FROM sync_state WHERE database_id = ?", (database_id,)
+        ).fetchone()
+        return row["high_water_mark"] if row else None
+
+    def set_high_water_mark(self, database_id, value):
+        self.conn.execute(
+            "INSERT INTO sync_state (database_id, high_water_mark) VALUES (?, ?) "
+            "ON CONFLICT(database_id) DO UPDATE SET high_water_mark = excluded.high_water_mark",
+            (database_id, value)
+        )
+
+    def upsert(self, video_id, page_id, title="", delete_flag=False, deleted_flag=False,
+               last_edited_time=None):
+        """1件のページをミラーに書き込む（同じページIDの行は置き換える）"""
+        self.conn.execute(
+            "INSERT INTO pages (video_id, page_id, title, delete_flag, deleted_flag, last_edited_time) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(page_id) DO UPDATE SET video_id = excluded.video_id, title = excluded.title, "
+            "delete_flag = excluded.delete_flag, deleted_flag = excluded.deleted_flag, "
+            "last_edited_time = excluded.last_edited_time",
+            (video_id, page_id, title, int(delete_flag), int(deleted_flag), last_edited_time)
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def get(self, page_id):
+        row = self.conn.execute("SELECT * FROM pages WHERE page_id = ?", (page_id,)).fetchone()
+        return dict(row) if row else None
+
+    def known_video_ids(self):
+        """ミラーに登録済み（deleted のページも含む）の動画IDの集合を返す（存在確認をO(1)で行うため）"""
+        return {row[0] for row in self.conn.execute("SELECT DISTINCT video_id FROM pages")}
+
+    def deleted_video_ids(self):
+        """deleted のページしかない（後で見るリストから削除済みの）動画IDの集合を返す"""
+        rows = self.conn.execute(
+            "SELECT video_id FROM pages GROUP BY video_id HAVING MIN(deleted_flag) = 1"
+        )
+        return {row[0] for row in rows}
+
+    def flag_counts(self):
+        """登録件数と、delete / deleted フラグが付いた件数を返す"""
+        row = self.conn.execute(
+            "SELECT COUNT(*), "
+            "COALESCE(SUM(delete_flag = 1 AND deleted_flag = 0), 0), "
+            "COALESCE(SUM(deleted_flag), 0) FROM pages"
+        ).fetchone()
+        return {"total": row[0], "flagged": row[1], "deleted": row[2]}
+
+    def flagged_items(self):
+        """delete フラグが付いていて、まだ deleted になっていないページを返す"""
+        rows = self.conn.execute(
+            "SELECT page_id, video_id, title, last_edited_time FROM pages "
+            "WHERE delete_flag = 1 AND deleted_flag = 0 ORDER BY last_edited_time"
+        )
+        return [dict(row) for row in rows]
+
+    def set_flags(self, page_id, delete_flag, deleted_flag):
+        """Notionに書き込んだフラグをミラーにも反映する（次の同期を待たずに済むように）"""
+        self.conn.execute(
+            "UPDATE pages SET delete_flag = ?, deleted_flag = ? WHERE page_id = ?",
+            (int(delete_flag), int(deleted_flag), page_id)
+        )
+
+    def active_video_ids(self):
+        """deleted フラグが付いていない（後で見るリストに残っているはずの）ページの動画IDの集合を返す"""
+        return {row[0] for row in self.conn.execute("SELECT DISTINCT video_id FROM pages WHERE deleted_flag = 0")}
+
+    def sync(self, client, database_id, full=False):
+        """
+        Notionデータベースの変更をミラーに取り込む。
+
+        前回の高水位点（last_edited_time）以降に更新されたページだけを取得する。
+        full=True の場合は高水位点を無視して全件を取得し直す。
+        Notion側でアーカイブされたページは検出できないため、必要に応じて full=True で再同期する。
+
+        Returns:
+            list: 更新されたページ（parse_watchlist_page の返り値）のリスト
+        """
+        high_water_mark = None if full else self.get_high_water_mark(database_id)
+        body = {"sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}]}
+        if high_water_mark:
+            # last_edited_time は分単位に丸められるため on_or_after で取りこぼしを防ぐ
+            body["filter"] = {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": high_water_mark}
+            }
+
+        logger.info(f"Syncing Notion mirror for database {database_id} (since {high_water_mark or 'the beginning'})")
+        properties = [PROPERTY_TITLE, PROPERTY_LINK, DELETE_PROPERTY_NAME, DELETED_PROPERTY_NAME]
+        changed = []
+        latest = high_water_mark
+        for page in client.query_database(database_id, body, filter_properties=properties):
+            edited = page.get("last_edited_time")
+            if edited and (latest is None or edited > latest):
+                latest = edited
+
+            record = parse_watchlist_page(page)
+            if record is None:
+                continue
+            self.upsert(**record)
+            changed.append(record)
+
+            if len(changed) % COMMIT_INTERVAL == 0:
+                self.set_high_water_mark(database_id, latest)
+                self.commit()
+
+        if latest:
+            self.set_high_water_mark(database_id, latest)
+        self.commit()
+        logger.info(f"Notion mirror synced: {len(changed)} pages updated")
+        return changed
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Notionへの書き込みをバックグラウンドで行うライトビハインドキュー
+
+ブラウザ操作のループは submit() でキューに積むだけで次の動画に進み、
+ワーカースレッドがキューを取り出して書き込みを行う。
+429 / 5xx / 接続エラーの再試行は NotionClient が行うため、ワーカーでは既定で重ねて再試行しない。
+最後に flush() でキューを空にし、アイテムごとの結果を受け取る。
+"""
+import logging
+import queue
+import threading
+import time
+
+import requests
+
+from notion_api import RETRY_STATUS_CODES, NotionAPIError
+
+logger = logging.getLogger(__name__)
+
+NOTION_WRITER_WORKERS = 2
+NOTION_WRITER_QUEUE_SIZE = 100
+# 書き込み関数が一時的な失敗の例外を送出した場合の再試行回数
+# （NotionClient が再試行し尽くした後に重ねると、1件の失敗で数十回のリクエストになるため既定では行わない）
+NOTION_WRITER_MAX_RETRIES = 0
+NOTION_WRITER_BACKOFF = 2.0  # 秒
+
+# ワーカーに終了を伝える目印
+_STOP = object()
+
+
+def is_retryable(error):
+    """一時的な失敗（429 / 5xx / 接続エラー）の例外かどうか。400 / 403 / 404 などは再試行しても結果が変わらない"""
+    if isinstance(error, NotionAPIError):
+        return error.status_code in RETRY_STATUS_CODES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+class NotionWriteBehind:
+    """有界キューとワーカースレッドによるNotionの非同期書き込み"""
+
+    def __init__(self, write_func, workers=NOTION_WRITER_WORKERS, max_queue=NOTION_WRITER_QUEUE_SIZE,
+                 max_retries=NOTION_WRITER_MAX_RETRIES, backoff=NOTION_WRITER_BACKOFF, on_done=None):
+        """
+        Args:
+            write_func: アイテムを受け取って書き込みを行い、成功したら True、失敗したら False を返す関数
+                （False は再試行しない。一時的な失敗は NotionAPIError などの例外で知らせる）
+            workers (int): ワーカースレッド数
+            max_queue (int): キューの上限（満杯の場合 submit() は空きが出るまで待つ）
+            max_retries (int): 一時的な失敗（is_retryable）の例外の再試行回数
+            backoff (float): 最初の再試行までの秒数（再試行のたびに倍にする）
+            on_done: 各アイテムの書き込みが終わったときに (item, ok) で呼ばれる関数（ワーカースレッドから呼ばれる）
+        """
+        self.write_func = write_func
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_done = on_done
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._results = []
+        self._results_lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._run, name=f"notion-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, item):
+        """書き込むアイテムをキューに積む"""
+        self._queue.put(item)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._write(item)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, item):
+        attempts = 0
+        ok = False
+        while True:
+            attempts += 1
+            try:
+                ok = bool(self.write_func(item))
+                break
+            except Exception as e:
+                logger.error(f"Error in background Notion write: {str(e)}")
+                ok = False
+                if not is_retryable(e) or attempts > self.max_retries:
+                    break
+            wait = self.backoff * (2 ** (attempts - 1))
+            logger.warning(f"Background Notion write failed, retrying in {wait:.1f}s (attempt {attempts})")
+            time.sleep(wait)
+
+        if self.on_done is not None:
+            try:
+                self.on_done(item, ok)
+            except Exception as e:
+                logger.error(f"Error in Notion write callback: {str(e)}")
+
+        with self._results_lock:
+            self._results.append({"item": item, "ok": ok, "attempts": attempts})
+
+    def flush(self):
+        """
+        キューに積んだ書き込みがすべて終わるまで待ち、ワーカーを停止する。
+        返り値: [{"item": アイテム, "ok": bool, "attempts": int}, ...]
+        """
+        self._queue.join()
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+
+        with self._results_lock:
+            return list(self._results)
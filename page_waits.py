@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+ページ上の条件を待つための待機処理
+
+固定時間の wait_for_timeout の代わりに、メニューの表示・要素の可視化・トーストの表示など
+具体的な条件を待つ。待機ごとにステップ名つきで所要時間を記録する。
+"""
+import logging
+import threading
+import time
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ステップごとのタイムアウト（ミリ秒）
+STEP_TIMEOUTS = {
+    "page_loaded": 30000,
+    "menu_button": 10000,
+    "menu_rendered": 5000,
+    "menu_item": 5000,
+    "dialog_rendered": 5000,
+    "removal_confirmed": 10000,
+    "row_removed": 5000,
+    "checkbox_state": 2000,
+}
+DEFAULT_TIMEOUT = 10000
+
+# YouTubeのポップアップメニュー・ダイアログ・トースト
+MENU_POPUP_SELECTOR = "ytd-menu-popup-renderer"
+ADD_TO_PLAYLIST_SELECTOR = "ytd-add-to-playlist-renderer"
+TOAST_SELECTOR = "tp-yt-paper-toast#toast, yt-notification-action-renderer"
+
+# 後で見るリストへの追加・削除でYouTubeが送るリクエスト
+EDIT_PLAYLIST_URL_PART = "/youtubei/v1/browse/edit_playlist"
+
+# 確認を待つ間の確認の間隔（ミリ秒）
+CONFIRMATION_POLL_INTERVAL = 50
+
+# トーストの変化を監視し始める（この時点で表示されているトーストは、変化するまで数えない）
+ARM_CONFIRMATION_SCRIPT = """toast => {
+    if (window.__wlToastObserver) window.__wlToastObserver.disconnect();
+    window.__wlToastChanged = false;
+    const inToast = node => {
+        const el = node && (node.nodeType === 1 ? node : node.parentElement);
+        return el && (el.matches(toast) || el.closest(toast) || el.querySelector(toast));
+    };
+    window.__wlToastObserver = new MutationObserver(records => {
+        if (records.some(r => inToast(r.target) || [...r.addedNodes].some(inToast))) {
+            window.__wlToastChanged = true;
+        }
+    });
+    window.__wlToastObserver.observe(document.body,
+        {subtree: true, childList: true, attributes: true, characterData: true});
+}"""
+
+# クリックする要素に対応するチェックボックスに印を付け、現在の aria-checked を返す
+MARK_CHECKBOX_SCRIPT = """el => {
+    const box = el.matches('[aria-checked]') ? el
+        : (el.closest('[aria-checked]') || el.querySelector('[aria-checked]'));
+    if (!box) return null;
+    box.setAttribute('data-wl-confirm-box', '');
+    return box.getAttribute('aria-checked');
+}"""
+
+CONFIRMATION_SIGNAL_SCRIPT = """([toast, checked]) => {
+    const visible = el => el && el.offsetParent !== null;
+    if (window.__wlToastChanged && [...document.querySelectorAll(toast)].some(visible)) return true;
+    const box = document.querySelector('[data-wl-confirm-box]');
+    return checked !== null && !!box && box.getAttribute('aria-checked') !== checked;
+}"""
+
+# 印を付けたチェックボックスの aria-checked が変わったか（チェックボックスが無くなった場合も待たない）
+CHECKBOX_CHANGED_SCRIPT = """checked => {
+    const box = document.querySelector('[data-wl-confirm-box]');
+    return !box || box.getAttribute('aria-checked') !== checked;
+}"""
+
+READ_CHECKBOX_SCRIPT = """() => {
+    const box = document.querySelector('[data-wl-confirm-box]');
+    return box ? box.getAttribute('aria-checked') : null;
+}"""
+
+DISARM_CONFIRMATION_SCRIPT = """() => {
+    if (window.__wlToastObserver) window.__wlToastObserver.disconnect();
+    window.__wlToastObserver = null;
+    document.querySelectorAll('[data-wl-confirm-box]').forEach(el => el.removeAttribute('data-wl-confirm-box'));
+}"""
+
+
+class WaitRecorder:
+    """待機ごとの所要時間をステップ名別に記録する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+
+    def record(self, step, seconds, satisfied):
+        with self._lock:
+            self.records.append({"step": step, "seconds": seconds, "satisfied": satisfied})
+
+    def summary(self):
+        """ステップごとの回数・タイムアウト回数・合計/平均/最大の待機時間（秒）を返す"""
+        with self._lock:
+            records = list(self.records)
+
+        summary = {}
+        for record in records:
+            step = summary.setdefault(record["step"], {"count": 0, "timeouts": 0, "total": 0.0, "max": 0.0})
+            step["count"] += 1
+            step["timeouts"] += 0 if record["satisfied"] else 1
+            step["total"] += record["seconds"]
+            step["max"] = max(step["max"], record["seconds"])
+        for step in summary.values():
+            step["mean"] = step["total"] / step["count"]
+        return summary
+
+    def log_summary(self, log=logger.info):
+        for name, step in sorted(self.summary().items()):
+            log(
+                f"Wait '{name}': count={step['count']}, timeouts={step['timeouts']}, "
+                f"mean={step['mean']:.3f}s, max={step['max']:.3f}s"
+            )
+
+
+# スクリプト全体で共有する記録
+recorder = WaitRecorder()
+
+
+def _wait(step, timeout, wait_func):
+    timeout = timeout if timeout is not None else STEP_TIMEOUTS.get(step, DEFAULT_TIMEOUT)
+    start = time.monotonic()
+    satisfied = True
+    try:
+        wait_func(timeout)
+    except Exception as e:
+        satisfied = False
+        logger.debug(f"Wait '{step}' timed out after {timeout}ms: {str(e)}")
+    elapsed = time.monotonic() - start
+    recorder.record(step, elapsed, satisfied)
+    metrics.observe("wait_seconds", elapsed, step=step)
+    metrics.inc("wait_total", step=step, outcome="satisfied" if satisfied else "timeout")
+    logger.debug(f"Wait '{step}' took {elapsed:.3f}s")
+    return satisfied
+
+
+def wait_for_selector(page, selector, step, state="visible", timeout=None):
+    """
+    セレクタに一致する要素が指定の状態になるまで待つ。
+    返り値: 条件を満たした場合は True、タイムアウトした場合は False
+    """
+    return _wait(step, timeout, lambda ms: page.wait_for_selector(selector, state=state, timeout=ms))
+
+
+def wait_for_locator(locator, step, state="visible", timeout=None):
+    """
+    Locatorが指定の状態になるまで待つ。
+    返り値: 条件を満たした場合は True、タイムアウトした場合は False
+    """
+    return _wait(step, timeout, lambda ms: locator.first.wait_for(state=state, timeout=ms))
+
+
+def wait_for_function(page, expression, step, arg=None, timeout=None):
+    """
+    JavaScriptの式が真になるまで待つ。
+    返り値: 条件を満たした場合は True、タイムアウトした場合は False
+    """
+    return _wait(step, timeout, lambda ms: page.wait_for_function(expression, arg=arg, timeout=ms))
+
+
+def wait_for_menu(page, step="menu_rendered", timeout=None):
+    """ポップアップメニューが表示されるまで待つ"""
+    return wait_for_selector(page, MENU_POPUP_SELECTOR, step, timeout=timeout)
+
+
+class ConfirmationWait:
+    """
+    後で見るリストを変更するクリックが反映されたことの確認を待つ。
+    クリックの前に作成し、クリックの後で wait() を呼ぶ。次のいずれかが起きると確認できたとみなす。
+    - トーストが新たに表示される（作成した時点で表示されていたトーストは数えない）
+    - target に渡したチェックボックス（「後で見る」）の aria-checked が変わる
+    - 後で見るリストを変更するリクエスト（edit_playlist）が成功する
+    いずれの場合も、送信中の edit_playlist のリクエストが終わるまで待つ
+    （次の動画への遷移やブラウザの終了でリクエストが失われないように）。
+    target のチェックボックスのクリック前後の aria-checked は checked_before / checked_after に記録し、
+    toggled() で実際に追加・削除のどちらになったかを返す。
+    """
+
+    def __init__(self, page, target=None):
+        self.page = page
+        self._pending = set()
+        self._succeeded = False
+        self._failed = False
+        self._listeners = {
+            "request": self._on_request,
+            "response": self._on_response,
+            "requestfinished": self._on_finished,
+            "requestfailed": self._on_failed,
+        }
+        for event, listener in self._listeners.items():
+            page.on(event, listener)
+
+        page.evaluate(ARM_CONFIRMATION_SCRIPT, TOAST_SELECTOR)
+        self._checked = target.evaluate(MARK_CHECKBOX_SCRIPT) if target is not None else None
+        self.checked_after = None
+
+    @property
+    def checked_before(self):
+        return self._checked
+
+    @staticmethod
+    def _is_edit(request):
+        return EDIT_PLAYLIST_URL_PART in request.url
+
+    def _on_request(self, request):
+        if self._is_edit(request):
+            self._pending.add(request)
+
+    def _on_response(self, response):
+        if self._is_edit(response.request):
+            if response.ok:
+                self._succeeded = True
+            else:
+                self._failed = True
+
+    def _on_finished(self, request):
+        self._pending.discard(request)
+
+    def _on_failed(self, request):
+        if self._is_edit(request):
+            self._failed = True
+        self._pending.discard(request)
+
+    def _signaled(self):
+        return self.page.evaluate(CONFIRMATION_SIGNAL_SCRIPT, [TOAST_SELECTOR, self._checked])
+
+    def _poll(self, timeout):
+        deadline = time.monotonic() + timeout / 1000
+        while True:
+            if self._failed and not self._succeeded:
+                raise RuntimeError("edit_playlist request failed")
+            if not self._pending and (self._succeeded or self._signaled()):
+                return
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"no confirmation within {timeout}ms")
+            self.page.wait_for_timeout(CONFIRMATION_POLL_INTERVAL)
+
+    def wait(self, step="removal_confirmed", timeout=None):
+        """
+        確認できるまで待つ。
+        返り値: 確認できた場合は True、タイムアウトした場合やリクエストが失敗した場合は False
+        """
+        try:
+            confirmed = _wait(step, timeout, self._poll)
+            if confirmed and self._checked is not None:
+                self.checked_after = self._read_final_checked()
+            return confirmed
+        finally:
+            self.close()
+
+    def _read_final_checked(self):
+        # トーストやリクエストで確認できた後に、チェックボックスの表示が遅れて変わる場合がある
+        wait_for_function(self.page, CHECKBOX_CHANGED_SCRIPT, "checkbox_state", arg=self._checked)
+        try:
+            return self.page.evaluate(READ_CHECKBOX_SCRIPT)
+        except Exception as e:
+            logger.debug(f"Failed to read the checkbox state: {str(e)}")
+            return None
+
+    def toggled(self):
+        """
+        target のチェックボックスの aria-checked の変化から結果を返す。
+        返り値: "added"（false → true）/ "removed"（true → false）/ 変化が確認できない場合は None
+        """
+        if self._checked == "false" and self.checked_after == "true":
+            return "added"
+        if self._checked == "true" and self.checked_after == "false":
+            return "removed"
+        return None
+
+    def close(self):
+        for event, listener in self._listeners.items():
+            self.page.remove_listener(event, listener)
+        try:
+            self.page.evaluate(DISARM_CONFIRMATION_SCRIPT)
+        except Exception as e:
+            logger.debug(f"Failed to clean up confirmation wait: {str(e)}")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+後で見るプレイリストのページから動画IDとタイトルを取り出す
+
+プレイリストのページに埋め込まれた ytInitialData（JSON）から最初の100件を読み、
+残りはページと同じ継続トークンで /youtubei/v1/browse に問い合わせて取得する。
+Google Takeoutの書き出しと、動画ごとのYouTube Data APIの呼び出しが不要になる。
+
+HTMLと継続レスポンスの解析（parse_*）はブラウザを使わないため、保存したページでも確認できる。
+"""
+import json
+import logging
+import os
+import re
+
+from dotenv import load_dotenv
+
+import session_check
+from lean_browsing import LEAN_BROWSING, watch_requests
+from metrics import metrics
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ブラウザの永続プロファイル（delete_WL_from_youtube と共通）
+CHROME_PROFILE_DIR = os.getenv("CHROME_PROFILE_DIR", "./chrome_profile")
+
+WATCH_LATER_URL = "https://www.youtube.com/playlist?list=WL"
+
+# 継続トークンを辿る回数の上限（1回あたり100件）
+PLAYLIST_MAX_CONTINUATIONS = int(os.getenv("PLAYLIST_MAX_CONTINUATIONS", "1000"))
+
+INITIAL_DATA_PATTERN = re.compile(r"ytInitialData\s*=\s*")
+YTCFG_PATTERN = re.compile(r"ytcfg\.set\(\s*")
+
+# ページ内で継続リクエストを送るスクリプト
+# ログイン済みのリクエストとして扱われるよう、ページと同じ SAPISIDHASH を付ける
+CONTINUATION_SCRIPT = """
+async ({token, apiKey, context}) => {
+    const headers = {"Content-Type": "application/json"};
+    const cookie = document.cookie.split("; ").map(c => c.split("="))
+        .find(([name]) => name === "SAPISID" || name === "__Secure-3PAPISID");
+    if (cookie) {
+        const ts = Math.floor(Date.now() / 1000);
+        const digest = await crypto.subtle.digest(
+            "SHA-1", new TextEncoder().encode(`${ts} ${cookie[1]} ${location.origin}`));
+        const hex = Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, "0")).join("");
+        headers["Authorization"] = `SAPISIDHASH ${ts}_${hex}`;
+        headers["X-Origin"] = location.origin;
+    }
+    const response = await fetch(`/youtubei/v1/browse?key=${apiKey}&prettyPrint=false`, {
+        method: "POST",
+        credentials: "include",
+        headers,
+        body: JSON.stringify({context, continuation: token})
+    });
+    if (!response.ok) {
+        throw new Error(`continuation request failed: HTTP ${response.status}`);
+    }
+    return await response.json();
+}
+"""
+
+
+class PlaylistExtractionError(Exception):
+    """ページからプレイリストを読み取れなかった場合の例外"""
+
+
+def _decode_json_after(html, pattern):
+    """pattern の直後から始まるJSONオブジェクトをすべて読み取る"""
+    decoder = json.JSONDecoder()
+    for match in pattern.finditer(html):
+        try:
+            value, _ = decoder.raw_decode(html, match.end())
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            yield value
+
+
+def parse_initial_data(html):
+    """ページのHTMLから ytInitialData を取り出す"""
+    for data in _decode_json_after(html, INITIAL_DATA_PATTERN):
+        return data
+    raise PlaylistExtractionError("ytInitialData not found in page")
+
+
+def parse_ytcfg(html):
+    """ページのHTMLから ytcfg.set(...) で設定される値をまとめて取り出す"""
+    config = {}
+    for data in _decode_json_after(html, YTCFG_PATTERN):
+        config.update(data)
+    return config
+
+
+def _walk(node):
+    """JSONの中のオブジェクトを深さ優先で辿る"""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield current
+            stack.extend(reversed(list(current.values())))
+        elif isinstance(current, list):
+            stack.extend(reversed(current))
+
+
+def _text(value):
+    if not value:
+        return ""
+    if "simpleText" in value:
+        return value["simpleText"]
+    return "".join(run.get("text", "") for run in value.get("runs", []))
+
+
+def parse_playlist_items(data):
+    """
+    ytInitialData または継続レスポンスから動画と次の継続トークンを取り出す。
+
+    返り値: (items, continuation_token)
+        items: [{"video_id": str, "title": str, "position": int | None, "playable": bool}, ...]
+        continuation_token: 続きがない場合は None
+    """
+    items = []
+    token = None
+    for node in _walk(data):
+        renderer = node.get("playlistVideoRenderer")
+        if renderer and renderer.get("videoId"):
+            position = _text(renderer.get("index"))
+            items.append({
+                "video_id": renderer["videoId"],
+                "title": _text(renderer.get("title")),
+                "position": int(position) if position.isdigit() else None,
+                "playable": renderer.get("isPlayable", True),
+            })
+            continue
+
+        continuation = node.get("continuationItemRenderer")
+        if continuation:
+            command = continuation.get("continuationEndpoint", {}).get("continuationCommand", {})
+            token = command.get("token") or token
+    return items, token
+
+
+def parse_playlist_html(html):
+    """プレイリストのページのHTMLから (items, continuation_token) を取り出す"""
+    data = parse_initial_data(html)
+    items, token = parse_playlist_items(data)
+    if not items and token is None and not any("playlistVideoListRenderer" in node for node in _walk(data)):
+        # ログアウト状態などでプレイリストが表示されていない
+        raise PlaylistExtractionError("Watch Later playlist not found in page")
+    return items, token
+
+
+def iter_playlist_items(page, max_continuations=PLAYLIST_MAX_CONTINUATIONS, include_unavailable=False,
+                        strict=False):
+    """
+    ログイン済みのページで後で見るプレイリストを開き、
+    {"video_id": str, "title": str, "position": int} をプレイリストの順に yield する。
+    継続トークンは必要な分だけ辿るため、読み進めた分だけリクエストが発生する。
+
+    Args:
+        include_unavailable (bool): 削除・非公開などで再生できない動画も含める
+        strict (bool): 継続の上限に達してリストを最後まで読めなかった場合に PlaylistExtractionError を送出する
+    """
+    with metrics.span("page_goto", target="playlist"):
+        page.goto(WATCH_LATER_URL, wait_until="domcontentloaded")
+    html = page.content()
+    items, token = parse_playlist_html(html)
+    config = parse_ytcfg(html)
+
+    position = 0
+    continuations = 0
+    while True:
+        for item in items:
+            position = item["position"] or position + 1
+            if not item["playable"] and not include_unavailable:
+                logger.warning(f"Skipping unavailable video at position {position}: video_id='{item['video_id']}'")
+                continue
+            yield {"video_id": item["video_id"], "title": item["title"], "position": position}
+
+        if token is None:
+            return
+        if continuations >= max_continuations:
+            if strict:
+                raise PlaylistExtractionError(f"Playlist has more than {continuations} continuations")
+            logger.warning(f"Stopped after {continuations} continuations (PLAYLIST_MAX_CONTINUATIONS)")
+            return
+
+        continuations += 1
+        logger.info(f"Fetching playlist continuation {continuations} (after position {position})")
+        with metrics.span("playlist_continuation"):
+            data = page.evaluate(CONTINUATION_SCRIPT, {
+                "token": token,
+                "apiKey": config.get("INNERTUBE_API_KEY", ""),
+                "context": config.get("INNERTUBE_CONTEXT", {}),
+            })
+        items, token = parse_playlist_items(data)
+
+
+def read_playlist_rows(user_data_dir=CHROME_PROFILE_DIR, **options):
+    """
+    ブラウザのログイン済みプロファイルで後で見るプレイリストを読み、
+    取り込み用の行 {"row": 位置, "video_id": str, "title": str, "timestamp": ""} を yield する。
+    options は iter_playlist_items() にそのまま渡す。
+    """
+    from playwright.sync_api import sync_playwright
+
+    user_data_dir = os.path.abspath(user_data_dir)
+    os.makedirs(user_data_dir, exist_ok=True)
+
+    # ページのHTMLと継続レスポンスしか使わないため、ログイン済みなら軽量モードでヘッドレスにできる
+    session_valid = session_check.is_session_valid(user_data_dir)
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch_persistent_context(
+            user_data_dir=user_data_dir,
+            headless=LEAN_BROWSING and session_valid,
+            args=[
+                '--disable-blink-features=AutomationControlled',
+                '--no-sandbox',
+            ]
+        )
+        request_stats = watch_requests(browser)
+        try:
+            page = browser.new_page()
+
+            # Cookieが有効に見えない場合だけ、画面でのログイン確認（AgentQL）を行う
+            if not session_valid:
+                import agentql
+                from delete_WL_from_youtube import ensure_logged_in
+
+                page = agentql.wrap(page)
+                if not ensure_logged_in(page, user_data_dir):
+                    raise PlaylistExtractionError("Login required to read the Watch Later playlist")
+
+            count = 0
+            for item in iter_playlist_items(page, **options):
+                count += 1
+                yield {"row": item["position"], "video_id": item["video_id"], "title": item["title"], "timestamp": ""}
+            logger.info(f"Read {count} videos from the Watch Later playlist")
+            request_stats.log_summary()
+        finally:
+            browser.close()
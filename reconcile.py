@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Notionデータベースと後で見るリストの突き合わせ
+
+動画IDの集合どうしの差分で、次の3つを求める。
+- 後で見るリストにもNotionにもある動画
+- Notionでは削除されていないが、後で見るリストにはもう無い動画（手動や別の端末で削除済み）
+- 後で見るリストにあるが、Notionに登録されていない動画
+
+後で見るリストの動画IDは、Takeoutの書き出し（CSV / .zip）か、プレイリストのページのスナップショットから読む。
+"""
+import argparse
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from notion_api import get_notion_client
+from notion_mirror import NotionMirror
+from playlist_extractor import iter_playlist_items, read_playlist_rows
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+NOTION_DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
+
+# Notionの last_edited_time は分単位に切り捨てられるため、実際の編集は最大でこれだけ後の可能性がある
+LAST_EDITED_RESOLUTION = timedelta(minutes=1)
+
+
+def load_watch_later_ids(source):
+    """Takeoutの書き出し（CSV / .zip）から後で見るリストの動画IDの集合を読む"""
+    from get_WL_from_youtube import read_watch_later_rows
+
+    return {row["video_id"] for row in read_watch_later_rows(source)}
+
+
+def parse_last_edited_time(value):
+    """Notionの last_edited_time（例: 2026-10-01T10:00:00.000Z）を datetime にする"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def is_source_older_than(source, items):
+    """
+    Takeoutの書き出し（source）が、items のいずれかのページの最終編集より前に作られたかどうかを返す。
+    古い書き出しには、その後に後で見るリストへ戻した動画が含まれないため、突き合わせに使うと
+    リストに残っている動画を削除済みとしてしまう。
+    """
+    edited = [parse_last_edited_time(item["last_edited_time"]) for item in items if item.get("last_edited_time")]
+    if not edited:
+        return False
+    exported = datetime.fromtimestamp(os.path.getmtime(source)).astimezone()
+    return exported < max(edited) + LAST_EDITED_RESOLUTION
+
+
+def snapshot_playlist_ids(page=None):
+    """
+    プレイリストのページから後で見るリストの動画IDの集合を読む。
+    突き合わせに使うため、再生できない動画も含め、最後まで読めなかった場合は例外にする。
+    page を省略した場合はブラウザを起動してログイン済みのプロファイルで読む。
+    """
+    options = {"include_unavailable": True, "strict": True}
+    if page is None:
+        rows = read_playlist_rows(**options)
+    else:
+        rows = iter_playlist_items(page, **options)
+    return {row["video_id"] for row in rows}
+
+
+def reconcile(notion_ids, watch_later_ids):
+    """
+    Notion側と後で見るリストの動画IDの集合を比較する。
+
+    Returns:
+        dict: {"in_both": set, "notion_only": set, "watch_later_only": set}
+    """
+    notion_ids = set(notion_ids)
+    watch_later_ids = set(watch_later_ids)
+    return {
+        "in_both": notion_ids & watch_later_ids,
+        "notion_only": notion_ids - watch_later_ids,
+        "watch_later_only": watch_later_ids - notion_ids,
+    }
+
+
+def build_report(mirror, watch_later_ids):
+    """
+    ミラーと後で見るリストの差分のレポートを作る。
+    「Notionにあって後で見るリストに無い」は deleted が付いていないページだけを対象にする。
+    """
+    active = reconcile(mirror.active_video_ids(), watch_later_ids)
+    registered = reconcile(mirror.known_video_ids(), watch_later_ids)
+    return {
+        "watch_later_count": len(watch_later_ids),
+        "in_both_count": len(active["in_both"]),
+        "notion_missing_from_watch_later": sorted(active["notion_only"]),
+        "watch_later_missing_from_notion": sorted(registered["watch_later_only"]),
+    }
+
+
+def main():
+    # ロギングの設定
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Notionデータベースと後で見るリストの差分を表示する")
+    parser.add_argument("source", nargs="?",
+                        help="後で見るリストのCSV、またはGoogle Takeoutの.zip（省略時はプレイリストのページから読む）")
+    parser.add_argument("--output", help="レポートのJSONを書き込むファイル（省略時は標準出力）")
+    args = parser.parse_args()
+
+    with NotionMirror() as mirror:
+        try:
+            mirror.sync(get_notion_client(), NOTION_DATABASE_ID)
+        except Exception as e:
+            logger.warning(f"Failed to sync Notion mirror, using local copy: {str(e)}")
+
+        watch_later_ids = load_watch_later_ids(args.source) if args.source else snapshot_playlist_ids()
+        report = build_report(mirror, watch_later_ids)
+
+    logger.info(
+        f"Watch Later: {report['watch_later_count']} videos, in both: {report['in_both_count']}, "
+        f"only in Notion: {len(report['notion_missing_from_watch_later'])}, "
+        f"only in Watch Later: {len(report['watch_later_missing_from_notion'])}"
+    )
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
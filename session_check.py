@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+ブラウザプロファイルのCookieによるログイン状態の簡易確認
+
+永続プロファイル（chrome_profile）のCookieデータベースを直接読み、YouTubeのセッションCookie
+（SID / SAPISID 系）が存在し期限切れでないかを確認する。ページ遷移やAgentQLのクエリは行わない。
+結果は一定時間キャッシュし、Cookieが無効に見える場合だけ画面を使った確認を行う。
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SESSION_CHECK_FILE = os.getenv("SESSION_CHECK_FILE", "session_check.json")
+SESSION_CHECK_TTL = float(os.getenv("SESSION_CHECK_TTL", "3600"))  # 秒
+
+# Chromiumのプロファイル内のCookieデータベース（バージョンにより場所が異なる）
+COOKIE_DB_PATHS = (
+    os.path.join("Default", "Network", "Cookies"),
+    os.path.join("Default", "Cookies"),
+)
+
+# いずれかの名前のCookieがそれぞれ必要
+REQUIRED_COOKIES = (
+    ("SID", "__Secure-1PSID", "__Secure-3PSID"),
+    ("SAPISID", "__Secure-1PAPISID", "__Secure-3PAPISID"),
+)
+COOKIE_HOSTS = (".youtube.com", "youtube.com")
+
+# Chromiumの expires_utc は 1601-01-01 からのマイクロ秒
+CHROME_EPOCH_OFFSET = 11644473600
+
+# ログアウト状態に見えるページの特徴
+LOGIN_URL_MARKERS = ("accounts.google.com", "ServiceLogin")
+SIGN_IN_SELECTOR = 'a[href*="ServiceLogin"]'
+
+
+def find_cookie_db(user_data_dir):
+    for relative in COOKIE_DB_PATHS:
+        path = os.path.join(user_data_dir, relative)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def has_valid_session_cookies(user_data_dir):
+    """
+    プロファイルのCookieデータベースにYouTubeの有効なセッションCookieがあるか確認する。
+    ブラウザが起動中でもロックを取らないよう読み取り専用（immutable）で開く。
+    """
+    path = find_cookie_db(user_data_dir)
+    if path is None:
+        logger.info(f"No cookie database found in {user_data_dir}")
+        return False
+
+    placeholders = ",".join("?" * len(COOKIE_HOSTS))
+    try:
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1", uri=True)
+        try:
+            rows = conn.execute(
+                f"SELECT name, expires_utc FROM cookies WHERE host_key IN ({placeholders})",
+                COOKIE_HOSTS
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to read cookie database {path}: {str(e)}")
+        return False
+
+    now = time.time()
+    valid_names = set()
+    for name, expires_utc in rows:
+        # expires_utc が 0 のものはセッションCookie（期限なし）
+        if not expires_utc or expires_utc / 1_000_000 - CHROME_EPOCH_OFFSET > now:
+            valid_names.add(name)
+
+    for alternatives in REQUIRED_COOKIES:
+        if not valid_names.intersection(alternatives):
+            logger.info(f"Session cookie missing or expired: {alternatives[0]}")
+            return False
+    return True
+
+
+def is_session_valid(user_data_dir, cache_file=SESSION_CHECK_FILE, ttl=SESSION_CHECK_TTL):
+    """
+    Cookieによるログイン確認を行う。有効と判定した結果は ttl 秒間キャッシュする。
+    返り値: セッションが有効に見える場合は True
+    """
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if (cached.get("user_data_dir") == os.path.abspath(user_data_dir)
+                and cached.get("valid") and time.time() - cached.get("checked_at", 0) < ttl):
+            logger.info("Session is valid (cached)")
+            return True
+    except (OSError, ValueError):
+        pass
+
+    valid = has_valid_session_cookies(user_data_dir)
+    if valid:
+        mark_session_valid(user_data_dir, cache_file)
+    return valid
+
+
+def mark_session_valid(user_data_dir, cache_file=SESSION_CHECK_FILE):
+    """画面での確認などでログイン済みと分かった場合に結果をキャッシュする"""
+    with open(cache_file, "w", encoding="utf-8") as f:
+        json.dump({"user_data_dir": os.path.abspath(user_data_dir), "valid": True, "checked_at": time.time()}, f)
+
+
+def invalidate_session_cache(cache_file=SESSION_CHECK_FILE):
+    """キャッシュした確認結果を破棄する"""
+    try:
+        os.remove(cache_file)
+    except FileNotFoundError:
+        pass
+
+
+def looks_logged_out(page):
+    """ログインページへのリダイレクトやログインリンクの表示など、ログアウト状態に見えるか確認する"""
+    try:
+        if any(marker in page.url for marker in LOGIN_URL_MARKERS):
+            return True
+        return page.locator(SIGN_IN_SELECTOR).first.is_visible()
+    except Exception:
+        return False
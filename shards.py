@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+複数のアカウント（シャード）の取り込み・削除をプロセスプールで並行して実行する
+
+シャードごとに、Notionデータベース・ブラウザのプロファイル・YouTubeのOAuthトークンを設定ファイルに書く。
+各シャードは別プロセスで実行し、ミラー・ジャーナル・キャッシュなどのファイルも SHARDS_STATE_DIR/<name>/ に分ける。
+同じNotionトークンを使うシャードどうしはレート制限の枠（NOTION_RATE_LIMIT）を共有する。
+終了後、シャードごとの結果をまとめたレポートを SHARDS_REPORT_FILE に書き出す。
+
+    python shards.py ingest [--from-playlist] [--config shards.json] [--workers N]
+    python shards.py delete [--resume] [--reconcile] [--lean] [--config shards.json] [--workers N]
+
+設定ファイル（JSON）:
+    {
+        "shards": [
+            {
+                "name": "main",
+                "notion_database_id": "xxxxxxxx",
+                "notion_token_env": "NOTION_API_TOKEN",        // トークンを読む環境変数（省略時は NOTION_API_TOKEN）
+                "chrome_profile_dir": "./profiles/main",       // 省略時は SHARDS_STATE_DIR/<name>/chrome_profile
+                "youtube_token_file": "./tokens/main.json",    // 省略時は SHARDS_STATE_DIR/<name>/token.json
+                "csv_file": "Watchlater_main.csv",             // 取り込むCSV / .zip（省略時は CSV_FILE）
+                "env": {"DELETE_TABS": "2"}                    // このシャードだけに設定する環境変数（任意）
+            }
+        ]
+    }
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+# 各スクリプトはファイルのパスなどの設定を読み込み時に環境変数から決めるため、
+# このモジュールではそれらを読み込まず、シャードの環境変数を設定してから run_shard() の中で読み込む
+
+# 環境変数の読み込み
+load_dotenv()
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SHARDS_CONFIG = os.getenv("SHARDS_CONFIG", "shards.json")
+SHARDS_STATE_DIR = os.getenv("SHARDS_STATE_DIR", "./shards")
+SHARDS_REPORT_FILE = os.getenv("SHARDS_REPORT_FILE", "shards_report.json")
+
+SHARD_COMMANDS = ("ingest", "delete")
+
+# ProcessPoolExecutor の max_tasks_per_child を使うため Python 3.11 以上が必要
+MIN_PYTHON = (3, 11)
+DEFAULT_TOKEN_ENV = "NOTION_API_TOKEN"
+
+# シャードごとに分けるファイル（環境変数名 → SHARDS_STATE_DIR/<name>/ の下のファイル名）
+SHARD_STATE_FILES = {
+    "NOTION_MIRROR_DB": "notion_mirror.db",
+    "TITLE_CACHE_DB": "title_cache.db",
+    "DELETION_JOURNAL_FILE": "deletion_journal.jsonl",
+    "SESSION_CHECK_FILE": "session_check.json",
+    "LOCATOR_CACHE_FILE": "locator_cache.json",
+    "YOUTUBE_DISCOVERY_CACHE": "youtube_discovery.json",
+    "METRICS_JSON_FILE": "metrics.json",
+    "METRICS_PROM_FILE": "watchlist_manager.prom",
+}
+
+
+def load_shards(path=SHARDS_CONFIG):
+    """
+    設定ファイルからシャードの一覧を読み、検証する。
+    名前・データベース・ブラウザのプロファイルが重複している場合や、トークンの環境変数が無い場合は ValueError を送出する。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        shards = json.load(f).get("shards", [])
+    if not shards:
+        raise ValueError(f"No shards defined in {path}")
+
+    seen = {"name": set(), "notion_database_id": set(), "chrome_profile_dir": set()}
+    for shard in shards:
+        for key in ("name", "notion_database_id"):
+            if not shard.get(key):
+                raise ValueError(f"Shard is missing '{key}': {shard}")
+        token_env = shard.get("notion_token_env", DEFAULT_TOKEN_ENV)
+        if not os.getenv(token_env):
+            raise ValueError(f"Shard '{shard['name']}': environment variable {token_env} is not set")
+
+        # 同じプロファイルを複数のブラウザで同時に開くことはできないため、プロファイルは必ず分ける
+        values = {
+            "name": shard["name"],
+            "notion_database_id": shard["notion_database_id"],
+            "chrome_profile_dir": os.path.abspath(shard_profile_dir(shard)),
+        }
+        for key, value in values.items():
+            if value in seen[key]:
+                raise ValueError(f"Duplicate {key} in shards: {value}")
+            seen[key].add(value)
+    return shards
+
+
+def shard_state_dir(shard, state_dir=SHARDS_STATE_DIR):
+    return os.path.join(state_dir, shard["name"])
+
+
+def shard_profile_dir(shard, state_dir=SHARDS_STATE_DIR):
+    return shard.get("chrome_profile_dir") or os.path.join(shard_state_dir(shard, state_dir), "chrome_profile")
+
+
+def shard_environment(shard, state_dir=SHARDS_STATE_DIR):
+    """シャードを実行するプロセスに設定する環境変数を返す"""
+    directory = shard_state_dir(shard, state_dir)
+    env = {name: os.path.join(directory, filename) for name, filename in SHARD_STATE_FILES.items()}
+    env.update({
+        # ワーカーには端末が無いため、手動ログインやOAuthの認証を待たずにエラーにする
+        "INTERACTIVE_LOGIN": "0",
+        "NOTION_DATABASE_ID": shard["notion_database_id"],
+        "NOTION_API_TOKEN": os.environ[shard.get("notion_token_env", DEFAULT_TOKEN_ENV)],
+        "CHROME_PROFILE_DIR": shard_profile_dir(shard, state_dir),
+        "YOUTUBE_TOKEN_FILE": shard.get("youtube_token_file") or os.path.join(directory, "token.json"),
+    })
+    if shard.get("csv_file"):
+        env["CSV_FILE"] = shard["csv_file"]
+    env.update({key: str(value) for key, value in shard.get("env", {}).items()})
+    return env
+
+
+def run_shard(shard, command, options, budget, state_dir=SHARDS_STATE_DIR):
+    """
+    1つのシャードを実行し、結果を返す（プロセスプールのワーカーで呼ばれる）
+
+    Args:
+        shard (dict): 設定ファイルのシャード
+        command (str): "ingest" / "delete"
+        options (dict): from_playlist / resume / reconcile / lean
+        budget (dict): 共有のレート制限の枠 {"state", "lock", "rate", "capacity"}（SharedTokenBucket に渡す）
+    """
+    os.makedirs(shard_state_dir(shard, state_dir), exist_ok=True)
+    os.environ.update(shard_environment(shard, state_dir))
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - [{shard["name"]}] - %(levelname)s - %(message)s',
+        force=True
+    )
+
+    from metrics import metrics
+    from notion_api import NotionClient, SharedTokenBucket, set_notion_client
+
+    rate_limiter = SharedTokenBucket(budget["state"], budget["lock"], budget["rate"], budget["capacity"])
+    set_notion_client(NotionClient(os.environ["NOTION_API_TOKEN"], rate_limiter=rate_limiter))
+
+    report = {
+        "name": shard["name"],
+        "command": command,
+        "notion_database_id": shard["notion_database_id"],
+        "status": "ok",
+        "counts": {},
+    }
+    started = time.monotonic()
+    try:
+        if command == "ingest":
+            import get_WL_from_youtube
+
+            counts = get_WL_from_youtube.ingest(get_WL_from_youtube.CSV_FILE, from_playlist=options["from_playlist"])
+            if counts is None:
+                report["status"] = "failed"
+            report["counts"] = counts or {}
+        else:
+            import delete_WL_from_youtube
+
+            results = delete_WL_from_youtube.process_videos(
+                resume=options["resume"], reconcile=options["reconcile"],
+                lean=options["lean"] or delete_WL_from_youtube.LEAN_BROWSING
+            )
+            if results is None:
+                report["status"] = "failed"
+            for result in results or []:
+                report["counts"][result["status"]] = report["counts"].get(result["status"], 0) + 1
+    except Exception as e:
+        logger.exception(f"Shard {shard['name']} failed: {str(e)}")
+        report["status"] = "failed"
+        report["error"] = str(e)
+
+    report["seconds"] = round(time.monotonic() - started, 2)
+    summary = metrics.to_dict()
+    report["notion_requests"] = sum(
+        histogram["count"] for histogram in summary["histograms"] if histogram["name"] == "notion_request_seconds"
+    )
+    report["notion_rate_limit_wait_seconds"] = round(sum(
+        histogram["sum"] for histogram in summary["histograms"] if histogram["name"] == "notion_rate_limit_wait_seconds"
+    ), 2)
+    return report
+
+
+def run_shards(shards, command, options, workers=None, state_dir=SHARDS_STATE_DIR, report_path=SHARDS_REPORT_FILE):
+    """
+    シャードをプロセスプールで並行して実行し、結果をまとめたレポートを返す。
+    全体の所要時間は、いちばん時間のかかるシャードでほぼ決まる。
+    """
+    if sys.version_info < MIN_PYTHON:
+        raise RuntimeError(f"Running shards requires Python {MIN_PYTHON[0]}.{MIN_PYTHON[1]} or later "
+                           f"(running {sys.version_info.major}.{sys.version_info.minor})")
+
+    from notion_api import NOTION_RATE_BURST, NOTION_RATE_LIMIT, SharedTokenBucket
+
+    # 各スクリプトの設定はモジュールの読み込み時に決まるため、シャードごとに新しいプロセスで実行する
+    context = multiprocessing.get_context("spawn")
+    started = time.monotonic()
+    reports = {}
+
+    with context.Manager() as manager:
+        # Notionのレート制限はトークンごとのため、同じトークンのシャードは1つの枠を共有する
+        budgets = {}
+        for shard in shards:
+            token = os.environ[shard.get("notion_token_env", DEFAULT_TOKEN_ENV)]
+            if token not in budgets:
+                state, lock = SharedTokenBucket.create_state(manager, NOTION_RATE_BURST)
+                budgets[token] = {"state": state, "lock": lock, "rate": NOTION_RATE_LIMIT,
+                                  "capacity": NOTION_RATE_BURST}
+        logger.info(f"Running {command} for {len(shards)} shards ({len(budgets)} Notion rate budgets)")
+
+        with ProcessPoolExecutor(max_workers=workers or len(shards), mp_context=context,
+                                 max_tasks_per_child=1) as pool:
+            futures = {
+                pool.submit(run_shard, shard, command, options,
+                            budgets[os.environ[shard.get("notion_token_env", DEFAULT_TOKEN_ENV)]], state_dir): shard
+                for shard in shards
+            }
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    report = future.result()
+                except Exception as e:
+                    logger.error(f"Shard {shard['name']} crashed: {str(e)}")
+                    report = {"name": shard["name"], "command": command,
+                              "notion_database_id": shard["notion_database_id"],
+                              "status": "failed", "counts": {}, "error": str(e)}
+                reports[shard["name"]] = report
+                logger.info(f"Shard {shard['name']} finished: {report['status']} {report['counts']}")
+
+    ordered = [reports[shard["name"]] for shard in shards]
+    combined = {
+        "command": command,
+        "seconds": round(time.monotonic() - started, 2),
+        "shard_seconds_total": round(sum(report.get("seconds", 0) for report in ordered), 2),
+        "failed": [report["name"] for report in ordered if report["status"] != "ok"],
+        "shards": ordered,
+    }
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(combined, f, ensure_ascii=False, indent=2)
+        logger.info(f"Wrote shard report to {report_path}")
+    logger.info(f"Finished {len(shards)} shards in {combined['seconds']}s "
+                f"(sum of shard times: {combined['shard_seconds_total']}s)")
+    return combined
+
+
+def add_shard_arguments(parser):
+    """シャードの実行に使う引数を追加する（cli.py の shards サブコマンドでも使う）"""
+    parser.add_argument("command", choices=SHARD_COMMANDS, help="各シャードで実行する処理")
+    parser.add_argument("--config", default=SHARDS_CONFIG, help="シャードの設定ファイル（デフォルト: SHARDS_CONFIG）")
+    parser.add_argument("--workers", type=int, help="同時に実行するシャード数（デフォルト: シャード数）")
+    parser.add_argument("--report", default=SHARDS_REPORT_FILE, help="結果のレポートを書き込むファイル")
+    parser.add_argument("--from-playlist", action="store_true",
+                        help="ingest: CSVの代わりに、各シャードのブラウザで後で見るプレイリストのページから読む")
+    parser.add_argument("--resume", action="store_true", help="delete: 前回のジャーナルを再生し、中断したところから再開する")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="delete: 現在の後で見るリストと突き合わせ、既に無い動画はNotionだけ更新する")
+    parser.add_argument("--lean", action="store_true",
+                        help="delete: 動画・画像・広告などのリクエストを中断し、ログイン済みならヘッドレスで実行する")
+
+
+def run_from_args(args):
+    options = {
+        "from_playlist": args.from_playlist,
+        "resume": args.resume,
+        "reconcile": args.reconcile,
+        "lean": args.lean,
+    }
+    try:
+        shards = load_shards(args.config)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to load shard config: {str(e)}")
+        return 1
+    try:
+        combined = run_shards(shards, args.command, options, workers=args.workers, report_path=args.report)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    return 1 if combined["failed"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数のアカウントの取り込み・削除をプロセスプールで並行して実行する")
+    add_shard_arguments(parser)
+    return run_from_args(parser.parse_args())
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,80 @@
+"""browser_daemon のHTTPエンドポイントが、トークンのないリクエストとブラウザからのリクエストを拒否することのテスト"""
+import json
+import os
+import stat
+import urllib.error
+import urllib.request
+
+import pytest
+
+from browser_daemon import TOKEN_HEADER, BrowserDaemon
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    daemon = BrowserDaemon(port=0, token_file=str(tmp_path / "daemon_token"))
+    server = daemon._start_http_server()
+    daemon.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield daemon
+    daemon._stop_http_server(server)
+
+
+def request(daemon, path, body=None, headers=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(daemon.url + path, data=data, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_token_file_is_private(daemon):
+    assert stat.S_IMODE(os.stat(daemon.token_file).st_mode) == 0o600
+    with open(daemon.token_file, encoding="utf-8") as f:
+        assert f.read() == daemon.token
+
+
+def test_requests_without_valid_token_are_rejected(daemon):
+    assert request(daemon, "/status") == 401
+    assert request(daemon, "/status", headers={TOKEN_HEADER: "wrong"}) == 401
+    assert request(daemon, "/status", headers={TOKEN_HEADER: daemon.token}) == 200
+
+
+def test_cross_origin_requests_are_rejected(daemon):
+    headers = {TOKEN_HEADER: daemon.token, "Origin": "https://example.com", "Content-Type": "application/json"}
+    assert request(daemon, "/shutdown", body={}, headers=headers) == 403
+    assert not daemon._stop.is_set()
+
+
+def test_post_requires_json_content_type(daemon):
+    headers = {TOKEN_HEADER: daemon.token, "Content-Type": "text/plain"}
+    assert request(daemon, "/shutdown", body={}, headers=headers) == 415
+
+    headers["Content-Type"] = "application/json"
+    assert request(daemon, "/shutdown", body={}, headers=headers) == 200
+    assert daemon._stop.is_set()
+
+
+def test_token_file_is_removed_on_stop(tmp_path):
+    daemon = BrowserDaemon(port=0, token_file=str(tmp_path / "daemon_token"))
+    daemon._stop_http_server(daemon._start_http_server())
+    assert not os.path.exists(daemon.token_file)
+
+
+def test_jobs_not_started_by_deadline_are_cancelled(daemon, monkeypatch):
+    import browser_daemon
+    monkeypatch.setattr(browser_daemon, "DAEMON_JOB_TIMEOUT", 0.1)
+    headers = {TOKEN_HEADER: daemon.token, "Content-Type": "application/json"}
+    body = {"jobs": [{"action": "save", "url": "aaaaaaaaaaa"}, {"action": "remove", "url": "bbbbbbbbbbb"}]}
+    req = urllib.request.Request(daemon.url + "/jobs", data=json.dumps(body).encode("utf-8"), headers=headers)
+    # ワーカーを動かしていないので、どのジョブも期限までに始まらない
+    with urllib.request.urlopen(req, timeout=5) as response:
+        results = json.load(response)["results"]
+    assert [result["status"] for result in results] == ["cancelled", "cancelled"]
+
+    # キューに残ったジョブは、ワーカーが取り出しても実行しない
+    job = daemon.jobs.get_nowait()
+    assert not job.start()
+    job.finish("added")
+    assert job.status == "cancelled"
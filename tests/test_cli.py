@@ -0,0 +1,21 @@
+"""cli.py の引数の定義のテスト"""
+import subprocess
+import sys
+
+from conftest import ROOT
+
+import cli
+
+
+def test_build_parser_does_not_import_subcommand_modules():
+    # ブラウザやGoogleのクライアントライブラリを使うモジュールは、実行するときにだけ読み込む
+    code = "import sys, cli; cli.build_parser(); print(sorted({'delete_WL_from_youtube', 'get_WL_from_youtube'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+def test_shards_subcommand_uses_shard_arguments():
+    args = cli.build_parser().parse_args(["shards", "delete", "--resume", "--workers", "2"])
+
+    assert (args.command, args.resume, args.workers) == ("delete", True, 2)
+    assert args.func is cli.run_shards
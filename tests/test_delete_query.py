@@ -0,0 +1,32 @@
+"""削除対象の問い合わせ（query_notion_delete_items）が途中の失敗を隠さないことのテスト"""
+import pytest
+
+import delete_WL_from_youtube
+from delete_WL_from_youtube import DELETE_PROPERTY_NAME, VIDEOID_PROPERTY_NAME, query_notion_delete_items
+
+
+def flagged_page(n):
+    return {
+        "id": f"page-{n}",
+        "last_edited_time": "2026-10-01T10:00:00.000Z",
+        "properties": {
+            VIDEOID_PROPERTY_NAME: {"type": "url", "url": f"https://www.youtube.com/watch?v=vid_aaaa00{n}"},
+            DELETE_PROPERTY_NAME: {"type": "checkbox", "checkbox": True},
+        },
+    }
+
+
+class PagedClient:
+    """1ページ目を返した後、2ページ目の取得で失敗するクライアント"""
+
+    def query_database(self, database_id, body=None, filter_properties=None):
+        yield flagged_page(1)
+        yield flagged_page(2)
+        raise ConnectionError("connection reset while fetching the next page")
+
+
+def test_error_during_pagination_is_raised(monkeypatch):
+    monkeypatch.setattr(delete_WL_from_youtube, "get_notion_client", lambda: PagedClient())
+
+    with pytest.raises(ConnectionError):
+        query_notion_delete_items()
@@ -0,0 +1,40 @@
+"""削除のジャーナル（deletion_journal）の再生と、次に必要な手順の判定のテスト"""
+from deletion_journal import (
+    DeletionJournal, FAILED, NOTION_UPDATED, QUEUED, REMOVED_ON_YOUTUBE, STEP_NOTION, STEP_REMOVE
+)
+
+ITEM = {"page_id": "page-1", "video_id": "vid_aaaa001", "title": "A", "last_edited_time": "2026-10-01T10:00:00.000Z"}
+
+
+def replay(tmp_path, *states, item=ITEM):
+    path = str(tmp_path / "journal.jsonl")
+    with DeletionJournal(path) as journal:
+        for state in states:
+            journal.record(item, state)
+    return DeletionJournal(path, resume=True)
+
+
+def test_removed_on_youtube_needs_notion_only(tmp_path):
+    with replay(tmp_path, QUEUED, REMOVED_ON_YOUTUBE) as journal:
+        assert journal.pending_step(ITEM) == STEP_NOTION
+
+
+def test_notion_failure_does_not_undo_youtube_removal(tmp_path):
+    with replay(tmp_path, QUEUED, REMOVED_ON_YOUTUBE, FAILED) as journal:
+        assert journal.pending_step(ITEM) == STEP_NOTION
+
+
+def test_page_edited_after_youtube_removal_starts_over(tmp_path):
+    with replay(tmp_path, QUEUED, REMOVED_ON_YOUTUBE) as journal:
+        edited = dict(ITEM, last_edited_time="2026-10-02T08:00:00.000Z")
+        assert journal.pending_step(edited) == STEP_REMOVE
+
+
+def test_completed_page_flagged_again_starts_over(tmp_path):
+    with replay(tmp_path, QUEUED, REMOVED_ON_YOUTUBE, NOTION_UPDATED) as journal:
+        assert journal.pending_step(ITEM) == STEP_REMOVE
+
+
+def test_unknown_page_starts_from_removal(tmp_path):
+    with replay(tmp_path) as journal:
+        assert journal.pending_step(ITEM) == STEP_REMOVE
@@ -0,0 +1,75 @@
+"""ロケーターキャッシュ（locator_cache）が似た項目を取り違えないことのテスト"""
+import json
+
+from locator_cache import LocatorCache
+
+QUERY = "{ menu_items[] { watch_later(後で見る) } }"
+PATH = ("menu_items", 0, "watch_later")
+
+MENU = """
+<div role="menu">
+    <div class="item">後で見る</div>
+    <div class="item">後で見るリストを管理</div>
+</div>
+"""
+
+
+class _Response:
+    def __init__(self, element):
+        self.menu_items = [type("Item", (), {"watch_later": element})()]
+
+
+class QueryPage:
+    """query_elements で指定の要素を返すページ（AgentQLの代わり）"""
+
+    def __init__(self, page, selector):
+        self._page = page
+        self._selector = selector
+        self.queries = 0
+
+    def __getattr__(self, name):
+        return getattr(self._page, name)
+
+    def query_elements(self, query):
+        self.queries += 1
+        return _Response(self._page.locator(self._selector).first)
+
+
+def test_remembered_selector_matches_exact_text_only(page, tmp_path):
+    page.set_content(MENU)
+    cache = LocatorCache(str(tmp_path / "cache.json"))
+    cache.resolve(QueryPage(page, "text=後で見る >> nth=0"), QUERY, PATH)
+
+    selector = json.loads((tmp_path / "cache.json").read_text(encoding="utf-8"))[LocatorCache.make_key(QUERY, PATH)]
+    assert ":text-is(" in selector
+
+    # 正しい項目が無いページでは、似た項目にキャッシュが一致しない
+    page.set_content('<div role="menu"><div class="item">後で見るリストを管理</div></div>')
+    assert page.locator(selector).count() == 0
+
+
+def test_cache_hit_that_is_not_unique_falls_back(page, tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({LocatorCache.make_key(QUERY, PATH): "div.item"}), encoding="utf-8")
+    page.set_content(MENU)
+    query_page = QueryPage(page, "div.item >> nth=0")
+    cache = LocatorCache(str(path))
+
+    locator = cache.resolve(query_page, QUERY, PATH)
+
+    assert query_page.queries == 1
+    assert cache.stats() == {"hits": 0, "misses": 1, "invalidations": 1}
+    assert locator.inner_text() == "後で見る"
+
+
+def test_substring_selectors_from_old_cache_are_ignored(page, tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({LocatorCache.make_key(QUERY, PATH): 'div:has-text("後で見る")'}), encoding="utf-8")
+    page.set_content(MENU)
+    query_page = QueryPage(page, "div.item >> nth=0")
+    cache = LocatorCache(str(path))
+
+    cache.resolve(query_page, QUERY, PATH)
+
+    assert query_page.queries == 1
+    assert cache.stats() == {"hits": 0, "misses": 1, "invalidations": 0}
@@ -0,0 +1,63 @@
+"""NotionMirror のページ単位の記録と、取り込み時の登録済みの判定のテスト"""
+import sqlite3
+
+import pytest
+
+from get_WL_from_youtube import IngestSummary, skip_known_rows
+from notion_mirror import NotionMirror
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    with NotionMirror(str(tmp_path / "mirror.db")) as mirror:
+        yield mirror
+
+
+def test_duplicate_pages_for_one_video_are_kept(mirror):
+    mirror.upsert("vid_aaaa001", "page-1", delete_flag=True)
+    mirror.upsert("vid_aaaa001", "page-2", delete_flag=True)
+    mirror.set_flags("page-1", delete_flag=False, deleted_flag=True)
+
+    assert [item["page_id"] for item in mirror.flagged_items()] == ["page-2"]
+    assert mirror.flag_counts() == {"total": 2, "flagged": 1, "deleted": 1}
+
+
+def test_deleted_video_ids_excludes_videos_with_active_pages(mirror):
+    mirror.upsert("vid_aaaa001", "page-1", deleted_flag=True)
+    mirror.upsert("vid_bbbb002", "page-2", deleted_flag=True)
+    mirror.upsert("vid_bbbb002", "page-3")
+
+    assert mirror.deleted_video_ids() == {"vid_aaaa001"}
+    assert mirror.active_video_ids() == {"vid_bbbb002"}
+
+
+def test_previously_deleted_video_is_registered_again(mirror):
+    mirror.upsert("vid_aaaa001", "page-1", deleted_flag=True)
+    mirror.upsert("vid_bbbb002", "page-2")
+    rows = [{"row": n, "video_id": video_id} for n, video_id in enumerate(["vid_aaaa001", "vid_bbbb002", "vid_aaaa001"])]
+    summary = IngestSummary()
+
+    new_rows = list(skip_known_rows(rows, mirror.active_video_ids(), summary, mirror.deleted_video_ids()))
+
+    assert [row["video_id"] for row in new_rows] == ["vid_aaaa001"]
+    assert summary.reregistered == 1
+    assert summary.counts["skipped"] == 2
+
+
+def test_mirror_keyed_by_video_id_is_rebuilt(tmp_path):
+    path = str(tmp_path / "mirror.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE pages (video_id TEXT PRIMARY KEY, page_id TEXT NOT NULL, title TEXT,
+            delete_flag INTEGER NOT NULL DEFAULT 0, deleted_flag INTEGER NOT NULL DEFAULT 0, last_edited_time TEXT);
+        CREATE TABLE sync_state (database_id TEXT PRIMARY KEY, high_water_mark TEXT);
+        INSERT INTO pages (video_id, page_id) VALUES ('vid_aaaa001', 'page-1');
+        INSERT INTO sync_state VALUES ('db', '2026-10-01T10:00:00.000Z');
+    """)
+    conn.close()
+
+    with NotionMirror(path) as mirror:
+        assert mirror.get_high_water_mark("db") is None
+        mirror.upsert("vid_aaaa001", "page-1")
+        mirror.upsert("vid_aaaa001", "page-2")
+        assert mirror.flag_counts()["total"] == 2
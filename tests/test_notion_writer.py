@@ -0,0 +1,43 @@
+"""NotionWriteBehind の再試行の判定のテスト"""
+import requests
+
+from notion_api import NotionAPIError
+from notion_writer import NotionWriteBehind
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ""
+
+
+def run(write_func, max_retries=2):
+    writer = NotionWriteBehind(write_func, workers=1, max_retries=max_retries, backoff=0)
+    writer.submit({"page_id": "page-1"})
+    return writer.flush()[0]
+
+
+def failing(error):
+    def write(item):
+        raise error
+    return write
+
+
+def test_false_result_is_not_retried():
+    assert run(lambda item: False) == {"item": {"page_id": "page-1"}, "ok": False, "attempts": 1}
+
+
+def test_permanent_api_errors_fail_fast():
+    for status in (400, 403, 404):
+        assert run(failing(NotionAPIError(FakeResponse(status))))["attempts"] == 1
+
+
+def test_transient_errors_are_retried_up_to_max_retries():
+    assert run(failing(NotionAPIError(FakeResponse(503))))["attempts"] == 3
+    assert run(failing(requests.ConnectionError("reset")))["attempts"] == 3
+
+
+def test_no_worker_retries_by_default():
+    writer = NotionWriteBehind(failing(NotionAPIError(FakeResponse(503))), workers=1)
+    writer.submit({"page_id": "page-1"})
+    assert writer.flush()[0]["attempts"] == 1
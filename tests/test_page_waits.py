@@ -0,0 +1,101 @@
+"""後で見るリストの変更の確認待ち（page_waits.ConfirmationWait）のテスト"""
+import pytest
+
+import page_waits
+
+PAGE_URL = "https://www.youtube.com/watch?v=vid_aaaa001"
+
+PAGE = """
+<!DOCTYPE html>
+<html><body>
+<tp-yt-paper-toast id="toast" style="display: block">前の操作のトースト</tp-yt-paper-toast>
+<ytd-add-to-playlist-renderer style="display: block">
+    <tp-yt-paper-checkbox id="checkbox" role="checkbox" aria-checked="false" style="display: block">
+        <span id="label">後で見る</span>
+    </tp-yt-paper-checkbox>
+</ytd-add-to-playlist-renderer>
+<button id="flip">flip</button>
+<button id="toast-button">toast</button>
+<button id="request">request</button>
+<button id="nothing">nothing</button>
+<script>
+document.querySelector("#flip").onclick = () => setTimeout(() =>
+    document.querySelector("#checkbox").setAttribute("aria-checked", "true"), 100);
+document.querySelector("#toast-button").onclick = () => setTimeout(() =>
+    document.querySelector("#toast").textContent = "「後で見る」から削除しました", 100);
+document.querySelector("#request").onclick = () =>
+    fetch("/youtubei/v1/browse/edit_playlist", {method: "POST"});
+</script>
+</body></html>
+"""
+
+
+@pytest.fixture
+def watch_page(page):
+    page.route(PAGE_URL, lambda route: route.fulfill(content_type="text/html; charset=utf-8", body=PAGE))
+    page.goto(PAGE_URL)
+    return page
+
+
+def test_checkbox_flip_confirms(watch_page):
+    confirmation = page_waits.ConfirmationWait(watch_page, watch_page.locator("#label"))
+    watch_page.click("#flip")
+
+    assert confirmation.wait(timeout=2000)
+
+
+def test_new_toast_confirms(watch_page):
+    confirmation = page_waits.ConfirmationWait(watch_page)
+    watch_page.click("#toast-button")
+
+    assert confirmation.wait(timeout=2000)
+
+
+def test_toast_already_shown_does_not_confirm(watch_page):
+    confirmation = page_waits.ConfirmationWait(watch_page, watch_page.locator("#label"))
+    watch_page.click("#nothing")
+
+    assert not confirmation.wait(timeout=500)
+
+
+def test_waits_for_edit_request_to_finish(watch_page):
+    responses = []
+
+    def respond(route):
+        # 遅れて成功するリクエスト
+        watch_page.wait_for_timeout(300)
+        responses.append(route.request.url)
+        route.fulfill(json={})
+
+    watch_page.route("**/youtubei/v1/browse/edit_playlist", respond)
+    confirmation = page_waits.ConfirmationWait(watch_page)
+    watch_page.click("#request")
+
+    assert confirmation.wait(timeout=3000)
+    assert len(responses) == 1
+
+
+def test_failed_edit_request_is_not_confirmed(watch_page):
+    watch_page.route("**/youtubei/v1/browse/edit_playlist", lambda route: route.fulfill(status=500, body=""))
+    confirmation = page_waits.ConfirmationWait(watch_page)
+    watch_page.click("#request")
+
+    assert not confirmation.wait(timeout=2000)
+
+
+def test_checkbox_flip_reports_added(watch_page):
+    confirmation = page_waits.ConfirmationWait(watch_page, watch_page.locator("#label"))
+    watch_page.click("#flip")
+
+    assert confirmation.wait(timeout=2000)
+    assert (confirmation.checked_before, confirmation.checked_after) == ("false", "true")
+    assert confirmation.toggled() == "added"
+
+
+def test_toast_without_checkbox_change_is_not_a_toggle(watch_page):
+    confirmation = page_waits.ConfirmationWait(watch_page, watch_page.locator("#label"))
+    watch_page.click("#toast-button")
+
+    assert confirmation.wait(timeout=2000)
+    assert confirmation.checked_after == "false"
+    assert confirmation.toggled() is None
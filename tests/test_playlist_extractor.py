@@ -0,0 +1,74 @@
+"""保存したプレイリストのページと継続レスポンスを使った playlist_extractor の解析のテスト"""
+import json
+
+import pytest
+
+from conftest import fixture_path
+from playlist_extractor import (
+    PlaylistExtractionError, parse_initial_data, parse_playlist_html, parse_playlist_items, parse_ytcfg
+)
+
+CONTINUATION_TOKEN = "4qmFsgIsEgRWTFdMGiRFZ2hCVVZRNlEwZEZRUQ%3D%3D"
+
+
+def read_fixture(name):
+    with open(fixture_path(name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def playlist_html():
+    return read_fixture("watch_later_initial_data.html")
+
+
+def test_parse_initial_data_reads_embedded_json(playlist_html):
+    data = parse_initial_data(playlist_html)
+    assert "twoColumnBrowseResultsRenderer" in data["contents"]
+
+
+def test_parse_initial_data_without_data_raises():
+    with pytest.raises(PlaylistExtractionError):
+        parse_initial_data("<html><body><script>var ytInitialData = ;</script></body></html>")
+
+
+def test_parse_ytcfg_merges_all_set_calls(playlist_html):
+    config = parse_ytcfg(playlist_html)
+    assert config["INNERTUBE_API_KEY"] == "AIzaSyFixtureKey000000000000000000000"
+    assert config["INNERTUBE_CONTEXT"]["client"]["clientName"] == "WEB"
+    assert config["LOGGED_IN"] is True
+
+
+def test_parse_ytcfg_without_config_returns_empty():
+    assert parse_ytcfg(read_fixture("logged_out_playlist.html")) == {}
+
+
+def test_parse_playlist_items_reads_items_and_continuation(playlist_html):
+    items, token = parse_playlist_items(parse_initial_data(playlist_html))
+
+    assert [item["video_id"] for item in items] == ["vid_aaaa001", "vid_bbbb002", "vid_cccc003", "vid_dddd004"]
+    assert items[0] == {"video_id": "vid_aaaa001", "title": '最初の動画 {ブレース} "引用"', "position": 1, "playable": True}
+    assert items[2]["playable"] is False
+    assert token == CONTINUATION_TOKEN
+
+
+def test_parse_playlist_items_tolerates_missing_fields(playlist_html):
+    items, _ = parse_playlist_items(parse_initial_data(playlist_html))
+
+    # index も isPlayable もない行は位置なし・再生可能として扱い、videoId のない行は読み飛ばす
+    assert items[3] == {"video_id": "vid_dddd004", "title": "番号なしの動画", "position": None, "playable": True}
+    assert parse_playlist_items({"playlistVideoRenderer": {"videoId": "vid_gggg001"}}) == (
+        [{"video_id": "vid_gggg001", "title": "", "position": None, "playable": True}], None
+    )
+
+
+def test_parse_playlist_items_reads_last_continuation_page():
+    data = json.loads(read_fixture("watch_later_continuation.json"))
+    items, token = parse_playlist_items(data)
+
+    assert [(item["video_id"], item["position"]) for item in items] == [("vid_eeee101", 101), ("vid_ffff102", 102)]
+    assert token is None
+
+
+def test_parse_playlist_html_without_playlist_raises():
+    with pytest.raises(PlaylistExtractionError):
+        parse_playlist_html(read_fixture("logged_out_playlist.html"))
@@ -0,0 +1,70 @@
+"""後で見るプレイリストのページでの一括削除（delete_WL_from_youtube）のテスト"""
+import pytest
+
+import delete_WL_from_youtube as deleter
+
+from conftest import fixture_path
+
+PLAYLIST_URL = "https://www.youtube.com/playlist?list=WL"
+
+
+@pytest.fixture
+def playlist_page(page):
+    with open(fixture_path("watch_later_playlist.html"), encoding="utf-8") as f:
+        html = f.read()
+    page.route(PLAYLIST_URL, lambda route: route.fulfill(content_type="text/html; charset=utf-8", body=html))
+    page.route("**/youtubei/v1/browse/edit_playlist**", lambda route: route.fulfill(json={}))
+    page.goto(PLAYLIST_URL)
+    return page
+
+
+def test_index_finds_rows_loaded_by_scrolling(playlist_page):
+    index = deleter.index_playlist_items(playlist_page, {"vid_aaaa001", "vid_eeee005"})
+
+    assert set(index) == {"vid_aaaa001", "vid_bbbb002", "vid_cccc003", "vid_dddd004", "vid_eeee005"}
+    assert "vid_eeee005" in index["vid_eeee005"].locator("a#video-title").inner_text()
+
+
+def test_index_stops_scrolling_when_all_wanted_rows_are_loaded(playlist_page):
+    index = deleter.index_playlist_items(playlist_page, {"vid_bbbb002"})
+
+    assert set(index) == {"vid_aaaa001", "vid_bbbb002", "vid_cccc003"}
+
+
+def test_remove_clicks_only_the_remove_item(playlist_page):
+    index = deleter.index_playlist_items(playlist_page, {"vid_bbbb002"})
+
+    assert deleter.remove_playlist_item(playlist_page, index["vid_bbbb002"])
+
+    assert playlist_page.evaluate("window.clicked") == ["remove:vid_bbbb002"]
+    assert playlist_page.locator('a#video-title[href*="v=vid_bbbb002"]').count() == 0
+    for video_id in ("vid_aaaa001", "vid_cccc003"):
+        assert playlist_page.locator(f'a#video-title[href*="v={video_id}"]').count() == 1
+
+
+def test_bulk_delete_reports_rows_missing_from_playlist(playlist_page, monkeypatch):
+    monkeypatch.setattr(deleter, "WATCH_LATER_URL", PLAYLIST_URL)
+    monkeypatch.setattr(deleter, "mark_removed", lambda item, journal=None, writer=None: "deleted")
+    items = [
+        {"page_id": "p1", "video_id": "vid_cccc003", "title": "C"},
+        {"page_id": "p2", "video_id": "vid_zzzz999", "title": "Z"},
+        {"page_id": "p3", "video_id": "vid_dddd004", "title": "D"},
+    ]
+
+    results = deleter.bulk_delete_from_playlist(playlist_page, items)
+
+    assert [result["status"] for result in results] == ["deleted", "not_in_playlist", "deleted"]
+    assert playlist_page.evaluate("window.clicked") == ["remove:vid_cccc003", "remove:vid_dddd004"]
+
+
+def test_bulk_delete_on_empty_playlist_marks_items_not_in_playlist(page, monkeypatch):
+    with open(fixture_path("empty_watch_later_playlist.html"), encoding="utf-8") as f:
+        html = f.read()
+    page.route(PLAYLIST_URL, lambda route: route.fulfill(content_type="text/html; charset=utf-8", body=html))
+    monkeypatch.setattr(deleter, "WATCH_LATER_URL", PLAYLIST_URL)
+    monkeypatch.setattr(deleter, "PLAYLIST_LOAD_TIMEOUT", 200)
+    items = [{"page_id": "p1", "video_id": "vid_aaaa001", "title": "A"}]
+
+    results = deleter.bulk_delete_from_playlist(page, items)
+
+    assert [result["status"] for result in results] == ["not_in_playlist"]
@@ -0,0 +1,26 @@
+"""youtube_save_handler.read_video_urls の入力の判定のテスト"""
+import pytest
+
+from youtube_save_handler import read_video_urls
+
+
+def test_video_id_is_not_read_as_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dQw4w9WgXcQ").write_text("vid_other01\n", encoding="utf-8")
+
+    assert list(read_video_urls(["dQw4w9WgXcQ"])) == ["https://www.youtube.com/watch?v=dQw4w9WgXcQ"]
+
+
+def test_file_lists_urls_and_ids(tmp_path):
+    path = tmp_path / "videos.txt"
+    path.write_text("# コメント\n\nhttps://youtu.be/dQw4w9WgXcQ\n  vid_aaaa001  \n", encoding="utf-8")
+
+    assert list(read_video_urls([str(path)])) == [
+        "https://youtu.be/dQw4w9WgXcQ",
+        "https://www.youtube.com/watch?v=vid_aaaa001",
+    ]
+
+
+def test_missing_file_is_an_error(tmp_path):
+    with pytest.raises(ValueError):
+        list(read_video_urls([str(tmp_path / "videos.txt")]))
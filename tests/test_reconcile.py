@@ -0,0 +1,34 @@
+"""Takeoutの書き出しを突き合わせに使えるかどうか（reconcile.is_source_older_than）のテスト"""
+import os
+from datetime import datetime, timezone
+
+from reconcile import is_source_older_than
+
+
+def write_source(tmp_path, exported_at):
+    path = tmp_path / "watch_later.csv"
+    path.write_text("Video ID,Playlist Video Creation Timestamp\n", encoding="utf-8")
+    timestamp = exported_at.timestamp()
+    os.utime(path, (timestamp, timestamp))
+    return str(path)
+
+
+def item(last_edited_time):
+    return {"page_id": "page-1", "video_id": "vid_aaaa001", "last_edited_time": last_edited_time}
+
+
+def test_source_exported_before_last_edit_is_stale(tmp_path):
+    source = write_source(tmp_path, datetime(2026, 10, 1, 9, 0, tzinfo=timezone.utc))
+    items = [item("2026-09-30T08:00:00.000Z"), item("2026-10-01T10:00:00.000Z")]
+    assert is_source_older_than(source, items)
+
+
+def test_source_exported_within_the_edit_minute_is_stale(tmp_path):
+    # last_edited_time は分単位に切り捨てられるため、同じ分の書き出しは編集より前の可能性がある
+    source = write_source(tmp_path, datetime(2026, 10, 1, 10, 0, 30, tzinfo=timezone.utc))
+    assert is_source_older_than(source, [item("2026-10-01T10:00:00.000Z")])
+
+
+def test_source_exported_after_last_edit_is_usable(tmp_path):
+    source = write_source(tmp_path, datetime(2026, 10, 1, 10, 5, tzinfo=timezone.utc))
+    assert not is_source_older_than(source, [item("2026-10-01T10:00:00.000Z"), {"page_id": "page-2"}])
@@ -0,0 +1,72 @@
+"""watch_deletions の再試行の判定（pending_items / apply_results / RetrySchedule）のテスト"""
+import pytest
+
+from notion_mirror import NotionMirror
+from watch_deletions import RetrySchedule, apply_results, pending_items
+
+EDITED = "2026-10-01T10:00:00.000Z"
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    with NotionMirror(str(tmp_path / "mirror.db")) as mirror:
+        for n, video_id in enumerate(["vid_aaaa001", "vid_bbbb002", "vid_cccc003", "vid_dddd004"]):
+            mirror.upsert(video_id, f"page-{n}", delete_flag=True, last_edited_time=EDITED)
+        mirror.commit()
+        yield mirror
+
+
+@pytest.fixture
+def schedule():
+    return RetrySchedule(interval=30, maximum=100, factor=2)
+
+
+def process(mirror, schedule, statuses, now):
+    items = pending_items(mirror, schedule, now)
+    results = [dict(item, status=statuses[item["video_id"]]) for item in items if item["video_id"] in statuses]
+    apply_results(mirror, items, results, schedule, now)
+    return items
+
+
+def video_ids(items):
+    return [item["video_id"] for item in items]
+
+
+def test_transient_failures_are_retried_after_backoff(mirror, schedule):
+    process(mirror, schedule, {
+        "vid_aaaa001": "deleted", "vid_bbbb002": "remove_failed",
+        "vid_cccc003": "not_in_playlist", "vid_dddd004": "notion_failed",
+    }, now=0)
+
+    assert mirror.get("page-0")["deleted_flag"] == 1
+    assert pending_items(mirror, schedule, now=29) == []
+    assert video_ids(pending_items(mirror, schedule, now=30)) == ["vid_bbbb002", "vid_dddd004"]
+
+
+def test_retry_interval_grows_until_maximum(mirror, schedule):
+    failed = {video_id: "notion_failed" for video_id in ["vid_aaaa001", "vid_bbbb002", "vid_cccc003", "vid_dddd004"]}
+    process(mirror, schedule, failed, now=0)
+    process(mirror, schedule, failed, now=30)
+    assert pending_items(mirror, schedule, now=89) == []
+    process(mirror, schedule, failed, now=90)
+    process(mirror, schedule, failed, now=210)
+    assert pending_items(mirror, schedule, now=309) == []
+    assert len(pending_items(mirror, schedule, now=310)) == 4
+
+
+def test_items_without_result_are_retried(mirror, schedule):
+    process(mirror, schedule, {}, now=0)
+    items = pending_items(mirror, schedule, now=30)
+    assert len(items) == 4
+    assert all(schedule.is_retry(item) for item in items)
+
+
+def test_page_not_in_playlist_waits_for_edit(mirror, schedule):
+    process(mirror, schedule, {video_id: "not_in_playlist" for video_id in
+                               ["vid_aaaa001", "vid_bbbb002", "vid_cccc003", "vid_dddd004"]}, now=0)
+    assert pending_items(mirror, schedule, now=10 ** 6) == []
+
+    mirror.upsert("vid_bbbb002", "page-1", delete_flag=True, last_edited_time="2026-10-02T08:00:00.000Z")
+    items = pending_items(mirror, schedule, now=10 ** 6)
+    assert video_ids(items) == ["vid_bbbb002"]
+    assert not schedule.is_retry(items[0])
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+動画タイトルのディスクキャッシュ
+
+動画IDをキーにタイトルと取得時刻をSQLiteに保存する。
+- TTLを過ぎたエントリはミスとして扱い、再取得させる
+- 件数の上限を超えた場合は最終アクセスが古いものから削除する（LRU）
+- ヒット・ミス・削除の件数を記録する
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TITLE_CACHE_DB = os.getenv("TITLE_CACHE_DB", "title_cache.db")
+TITLE_CACHE_TTL = float(os.getenv("TITLE_CACHE_TTL", str(30 * 24 * 60 * 60)))  # 秒（デフォルト30日）
+TITLE_CACHE_MAX_ENTRIES = int(os.getenv("TITLE_CACHE_MAX_ENTRIES", "100000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    video_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS titles_last_access ON titles (last_access);
+"""
+
+
+class TitleCache:
+    """TTLとLRU削除つきの動画タイトルキャッシュ"""
+
+    def __init__(self, path=TITLE_CACHE_DB, ttl=TITLE_CACHE_TTL, max_entries=TITLE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_many(self, video_ids):
+        """
+        キャッシュ済みのタイトルを返す。
+        返り値: {video_id: タイトル} の辞書（ミス・期限切れのIDは含まない）
+        """
+        video_ids = list(dict.fromkeys(video_ids))
+        if not video_ids:
+            return {}
+
+        now = time.time()
+        found = {}
+        with self._lock:
+            # SQLiteの変数上限を超えないよう分割して問い合わせる
+            for start in range(0, len(video_ids), 500):
+                chunk = video_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT video_id, title, fetched_at FROM titles WHERE video_id IN ({placeholders})",
+                    chunk
+                )
+                for video_id, title, fetched_at in rows:
+                    if now - fetched_at <= self.ttl:
+                        found[video_id] = title
+
+            self.conn.executemany(
+                "UPDATE titles SET last_access = ? WHERE video_id = ?",
+                [(now, video_id) for video_id in found]
+            )
+            self.conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(video_ids) - len(found)
+        return found
+
+    def get(self, video_id):
+        """キャッシュ済みのタイトルを返す。ミス・期限切れの場合は None"""
+        return self.get_many([video_id]).get(video_id)
+
+    def put_many(self, titles):
+        """{video_id: タイトル} をキャッシュに保存する（タイトルが None のものは保存しない）"""
+        now = time.time()
+        rows = [(video_id, title, now, now) for video_id, title in titles.items() if title is not None]
+        if not rows:
+            return
+
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO titles (video_id, title, fetched_at, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(video_id) DO UPDATE SET title = excluded.title, "
+                "fetched_at = excluded.fetched_at, last_access = excluded.last_access",
+                rows
+            )
+            self._evict()
+            self.conn.commit()
+
+    def put(self, video_id, title):
+        self.put_many({video_id: title})
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        self.conn.execute(
+            "DELETE FROM titles WHERE video_id IN "
+            "(SELECT video_id FROM titles ORDER BY last_access ASC LIMIT ?)",
+            (excess,)
+        )
+        self.evictions += excess
+        logger.info(f"Evicted {excess} entries from title cache")
+
+    def stats(self):
+        """ヒット・ミス・削除の件数を返す"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Notionデータベースを監視し、delete が付いた動画をすぐに削除する
+
+ローカルミラーの同期（last_edited_time の高水位点より後に更新されたページだけを取得）を一定間隔で行い、
+新しく delete が付いたページを、起動したままのブラウザで削除する。
+変更が無い間は問い合わせの間隔を延ばし、変更があれば最短の間隔に戻す。
+高水位点はミラーに保存されるため、再起動しても前回の続きから取得する。
+
+    python watch_deletions.py [--resume] [--lean]
+"""
+import argparse
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+import page_waits
+from delete_WL_from_youtube import launch_browser, run_deletion_batch
+from deletion_journal import DeletionJournal
+from lean_browsing import LEAN_BROWSING
+from locator_cache import get_locator_cache
+from metrics import metrics
+from notion_api import get_notion_client
+from notion_mirror import NotionMirror
+
+# 環境変数の読み込み
+load_dotenv()
+
+# ロギングの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+NOTION_DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
+
+# 問い合わせの間隔（秒）。変更が無いたびに WATCH_BACKOFF_FACTOR 倍し、WATCH_MAX_INTERVAL で頭打ちにする
+WATCH_MIN_INTERVAL = float(os.getenv("WATCH_MIN_INTERVAL", "5"))
+WATCH_MAX_INTERVAL = float(os.getenv("WATCH_MAX_INTERVAL", "300"))
+WATCH_BACKOFF_FACTOR = 2.0
+
+# 一時的に失敗したページを再試行するまでの間隔（秒）。失敗するたびに倍にし、WATCH_RETRY_MAX_INTERVAL で頭打ちにする
+WATCH_RETRY_INTERVAL = float(os.getenv("WATCH_RETRY_INTERVAL", "30"))
+WATCH_RETRY_MAX_INTERVAL = float(os.getenv("WATCH_RETRY_MAX_INTERVAL", "1800"))
+
+# 再試行しても結果が変わらない結果（Notionで再び更新されるまで処理しない）
+PERMANENT_STATUSES = ("not_in_playlist",)
+
+
+class AdaptiveInterval:
+    """変更が無い間は延び、変更があると最短に戻る問い合わせ間隔"""
+
+    def __init__(self, minimum=WATCH_MIN_INTERVAL, maximum=WATCH_MAX_INTERVAL, factor=WATCH_BACKOFF_FACTOR):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.current = minimum
+
+    def reset(self):
+        self.current = self.minimum
+
+    def backoff(self):
+        self.current = min(self.maximum, self.current * self.factor)
+
+
+class RetrySchedule:
+    """
+    処理したページの再試行の予定。
+    後で見るリストに無かったページは、Notionで再び更新されるまで再試行しない。
+    YouTubeやNotionでの一時的な失敗（remove_failed / notion_failed など）は、ページごとに間隔を延ばしながら再試行する
+    （notion_failed はジャーナルにYouTubeで削除済みと記録されているため、再試行はNotionの更新だけになる）。
+    """
+
+    def __init__(self, interval=WATCH_RETRY_INTERVAL, maximum=WATCH_RETRY_MAX_INTERVAL, factor=WATCH_BACKOFF_FACTOR):
+        self.interval = interval
+        self.maximum = maximum
+        self.factor = factor
+        self._pages = {}  # page_id -> {"last_edited_time", "failures", "retry_at"（None は再試行しない）}
+
+    def _entry(self, item):
+        """同じ last_edited_time のページの記録を返す（編集されたページは新しいページとして扱う）"""
+        entry = self._pages.get(item["page_id"])
+        if entry is None or entry["last_edited_time"] != item["last_edited_time"]:
+            return None
+        return entry
+
+    def is_retry(self, item):
+        return self._entry(item) is not None
+
+    def is_due(self, item, now):
+        entry = self._entry(item)
+        if entry is None:
+            return True
+        return entry["retry_at"] is not None and entry["retry_at"] <= now
+
+    def record(self, item, status, now):
+        """ページの処理結果を記録する（status が None の場合は結果が得られなかったものとして扱う）"""
+        if status == "deleted":
+            self._pages.pop(item["page_id"], None)
+            return
+        if status in PERMANENT_STATUSES:
+            retry_at = None
+            failures = 1
+        else:
+            entry = self._entry(item)
+            failures = (entry["failures"] if entry else 0) + 1
+            retry_at = now + min(self.maximum, self.interval * self.factor ** (failures - 1))
+        self._pages[item["page_id"]] = {
+            "last_edited_time": item["last_edited_time"], "failures": failures, "retry_at": retry_at
+        }
+
+
+def poll_changes(mirror, client, database_id):
+    """
+    ミラーを同期し、前回の高水位点より後の変更があったかどうかを返す。
+    on_or_after で問い合わせるため高水位点と同じ時刻のページは毎回返ってくるが、それは変更として数えない。
+    """
+    previous = mirror.get_high_water_mark(database_id)
+    with metrics.span("watch_poll"):
+        changed = mirror.sync(client, database_id)
+    return any(record["last_edited_time"] != previous for record in changed)
+
+
+def pending_items(mirror, schedule, now=None):
+    """削除待ちのページのうち、まだ処理していないものと再試行の時刻になったものを返す"""
+    now = time.monotonic() if now is None else now
+    return [item for item in mirror.flagged_items() if schedule.is_due(item, now)]
+
+
+def apply_results(mirror, items, results, schedule, now=None):
+    """
+    削除の結果をミラーと再試行の予定に反映する。
+    削除済みになったページはミラーのフラグも更新する（以降の flagged_items() に含まれなくなる）。
+    """
+    now = time.monotonic() if now is None else now
+    statuses = {result["page_id"]: result["status"] for result in results}
+    for item in items:
+        schedule.record(item, statuses.get(item["page_id"]), now)
+    for result in results:
+        if result["status"] == "deleted":
+            mirror.set_flags(result["page_id"], delete_flag=False, deleted_flag=True)
+    mirror.commit()
+
+
+def watch(resume=False, lean=LEAN_BROWSING, database_id=None):
+    """
+    停止されるまでNotionデータベースを監視し、delete が付いた動画を削除する
+
+    Args:
+        resume (bool): True の場合は前回のジャーナルを再生し、完了済みの手順を飛ばす
+        lean (bool): True の場合は不要なリクエストを中断し、ログイン済みならヘッドレスで実行する
+    """
+    from playwright.sync_api import sync_playwright
+
+    database_id = database_id or NOTION_DATABASE_ID
+    client = get_notion_client()
+    interval = AdaptiveInterval()
+    schedule = RetrySchedule()
+    processed = 0
+
+    with NotionMirror() as mirror, sync_playwright() as p:
+        launched = launch_browser(p, lean)
+        if launched is None:
+            return
+        browser, page, request_stats = launched
+
+        try:
+            with DeletionJournal(resume=resume) as journal:
+                logger.info(f"Watching Notion database {database_id} for videos to delete")
+                while True:
+                    try:
+                        changed = poll_changes(mirror, client, database_id)
+                    except Exception as e:
+                        logger.warning(f"Failed to poll Notion, retrying later: {str(e)}")
+                        changed = False
+
+                    items = pending_items(mirror, schedule)
+                    new_items = [item for item in items if not schedule.is_retry(item)]
+                    if items:
+                        logger.info(f"Found {len(items)} videos to delete ({len(items) - len(new_items)} retries)")
+                        results = run_deletion_batch(browser, page, items, journal)
+                        apply_results(mirror, items, results, schedule)
+                        processed += len(results)
+                        deleted = sum(1 for result in results if result["status"] == "deleted")
+                        logger.info(f"Deleted {deleted} out of {len(results)} videos")
+
+                    # 失敗したページの再試行だけでは問い合わせの間隔を戻さない（再試行はページごとの間隔で行う）
+                    if new_items or changed:
+                        interval.reset()
+                    else:
+                        interval.backoff()
+                    metrics.inc("watch_polls_total", active=bool(new_items or changed))
+                    logger.debug(f"Next poll in {interval.current:.0f}s")
+                    time.sleep(interval.current)
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
+        finally:
+            page_waits.recorder.log_summary()
+            logger.info(f"Locator cache stats: {get_locator_cache().stats()}")
+            request_stats.log_summary(processed)
+            metrics.export()
+            browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notionデータベースを監視し、delete が付いた動画をすぐに削除する")
+    parser.add_argument("--resume", action="store_true", help="前回のジャーナルを再生し、中断したところから再開する")
+    parser.add_argument("--lean", action="store_true", default=LEAN_BROWSING,
+                        help="動画・画像・広告などのリクエストを中断し、ログイン済みならヘッドレスで実行する")
+    args = parser.parse_args()
+
+    watch(resume=args.resume, lean=args.lean)
+
+
+if __name__ == "__main__":
+    main()
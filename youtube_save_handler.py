@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
 import os
-import agentql
-from agentql.ext.playwright.sync_api import Page
-from playwright.sync_api import sync_playwright
+import re
+import sys
+import time
+import argparse
+from collections import deque
 from dotenv import load_dotenv
 
+import page_waits
+from lean_browsing import watch_requests
+from metrics import metrics
+from locator_cache import get_locator_cache
+
 # 環境変数の読み込み
 load_dotenv()
 
-# AgentQLの設定
-agentql.configure(api_key=os.getenv("AGENTQL_API_KEY"))
+# AgentQLのAPIキー（ブラウザを起動するときに設定する）
+AGENTQL_API_KEY = os.getenv("AGENTQL_API_KEY")
 
 # 保存ボタンを探すクエリ
 SAVE_BUTTON_QUERY = """
@@ -28,66 +35,278 @@ SAVE_MENU_QUERY = """
 }
 """
 
+# バッチ処理で同時に使うタブ数
+SAVE_TABS = int(os.getenv("SAVE_TABS", "1"))
+
+# YouTubeの動画ID（11文字）
+VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+def to_video_url(value):
+    """URLまたは動画IDを動画ページのURLにする"""
+    value = value.strip()
+    if value.startswith(("http://", "https://")):
+        return value
+    return f"https://www.youtube.com/watch?v={value}"
+
+def is_video_reference(value):
+    """値が動画のURLまたは動画IDかどうかを返す"""
+    value = value.strip()
+    return value.startswith(("http://", "https://")) or bool(VIDEO_ID_PATTERN.match(value))
+
+def read_video_urls(sources):
+    """
+    URL・動画ID・それらを1行ずつ書いたファイル・"-"（標準入力）のリストから、動画のURLを順に yield する。
+    URLと動画IDは、同じ名前のファイルがあってもURL・動画IDとして扱う。
+    どれにも当たらない値（存在しないファイルなど）は ValueError を送出する。
+    空行と # で始まる行は読み飛ばす。
+    """
+    for source in sources:
+        if source == "-":
+            lines = sys.stdin
+        elif is_video_reference(source):
+            lines = [source]
+        elif os.path.isfile(source):
+            with open(source, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        else:
+            raise ValueError(f"Not a video URL, video ID or file: {source}")
+
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield to_video_url(line)
+
+def open_video_page(page, video_url, wait_until="load"):
+    """動画ページに遷移する（wait_until="commit" の場合は読み込みの完了を待たない）"""
+    print(f"Accessing video page: {video_url}")
+    with metrics.span("page_goto", target="watch"):
+        page.goto(video_url, wait_until=wait_until)
+
+def toggle_watch_later(page, video_url):
+    """
+    動画ページを開き、後で見るリストに保存/削除する。
+    保存ボタンが見つかる場合（すでに保存済み）は削除し、見つからない場合は「その他の操作」メニューから保存する。
+
+    Args:
+        page: AgentQLでラップしたページ
+        video_url (str): 動画のURL
+
+    Returns:
+        str: "added" / "removed" / "failed"
+    """
+    # 動画ページにアクセス
+    open_video_page(page, video_url)
+    return toggle_on_opened_page(page)
+
+def click_watch_later(page, watch_later):
+    """
+    保存ダイアログの「後で見る」のチェックボックスをクリックし、確認できたら aria-checked の変化から結果を返す。
+    返り値: "added" / "removed" / "failed"（確認できない場合や、チェックの状態が切り替わらなかった場合）
+    """
+    confirmation = page_waits.ConfirmationWait(page, watch_later)
+    watch_later.click()
+    if not confirmation.wait():
+        print("Watch Later change was not confirmed")
+        return "failed"
+    result = confirmation.toggled()
+    if result is None:
+        print(f"Watch Later checkbox did not toggle (aria-checked: "
+              f"{confirmation.checked_before} -> {confirmation.checked_after})")
+        return "failed"
+    print("Added to Watch Later" if result == "added" else "Removed from Watch Later")
+    return result
+
+def toggle_on_opened_page(page):
+    """open_video_page で遷移したページで、動画を後で見るリストに保存/削除する（toggle_watch_later を参照）"""
+    # ページが完全にロードされるまで待機
+    print("Waiting for page to load...")
+    page_waits.wait_for_selector(page, "ytd-watch-flexy", "page_loaded", state="attached")
+    page_waits.wait_for_locator(page.get_by_role("button", name="その他の操作"), "menu_button")
+
+    try:
+        # 保存ボタンを探す（すでに保存済みの場合）
+        locators = get_locator_cache()
+        save_button = locators.resolve(page, SAVE_BUTTON_QUERY, ("save_button",))
+        if save_button is None:
+            # 見つからない場合はメニューボタンの処理に切り替える
+            raise LookupError("save button not found")
+
+        print("Found save button (already saved)")
+        save_button.click()
+        page_waits.wait_for_selector(page, page_waits.ADD_TO_PLAYLIST_SELECTOR, "dialog_rendered")
+        
+        # 後で見るを削除（結果はチェックの状態の変化で判断する）
+        watch_later = locators.resolve(page, SAVE_MENU_QUERY, ("menu_items", 0, "watch_later"))
+        if watch_later is not None:
+            return click_watch_later(page, watch_later)
+        
+    except Exception as e:
+        # 保存ボタンが見つからない場合、メニューボタンをクリック
+        print("Save button not found, looking for menu button...")
+        # role属性とname属性を使用して要素を特定
+        menu_button = page.get_by_role("button", name="その他の操作")
+        if menu_button:
+            menu_button.click()
+            page_waits.wait_for_menu(page)
+            
+            # 保存オプションをクリック
+            locators = get_locator_cache()
+            save_option = locators.resolve(page, SAVE_MENU_QUERY, ("menu_items", 0, "save_option"))
+            if save_option is not None:
+                save_option.click()
+                page_waits.wait_for_selector(page, page_waits.ADD_TO_PLAYLIST_SELECTOR, "dialog_rendered")
+                
+                # 後で見るを選択（結果はチェックの状態の変化で判断する）
+                watch_later = locators.resolve(page, SAVE_MENU_QUERY, ("menu_items", 0, "watch_later"))
+                if watch_later is not None:
+                    return click_watch_later(page, watch_later)
+
+    return "failed"
+
 def handle_youtube_save(video_url):
-    """YouTubeの動画を後で見るリストに保存/削除する"""
+    """
+    YouTubeの動画を後で見るリストに保存/削除する
+
+    Returns:
+        str: "added" / "removed" / "failed"
+    """
+    # ブラウザ関連のライブラリは読み込みが重いため、実行するときに読み込んで設定する
+    import agentql
+    from playwright.sync_api import sync_playwright
+
+    agentql.configure(api_key=AGENTQL_API_KEY)
+
+    # 保存ボタンの検出がヘッドレスでは安定しないため、軽量モードでもリクエストの中断だけを行う
     with sync_playwright() as p, p.chromium.launch(headless=False) as browser:
         try:
+            context = browser.new_context()
+            request_stats = watch_requests(context)
+
             # AgentQLでページをラップ
-            page = agentql.wrap(browser.new_page())
+            page = agentql.wrap(context.new_page())
+            status = toggle_watch_later(page, video_url)
+            print(f"{status}: {video_url}")
             
-            # 動画ページにアクセス
-            print(f"Accessing video page: {video_url}")
-            page.goto(video_url)
+            page_waits.recorder.log_summary(print)
+            print(f"Locator cache stats: {get_locator_cache().stats()}")
+            print(f"Request stats: {request_stats.summary()}")
             
-            # ページが完全にロードされるまで待機
-            print("Waiting for page to load...")
-            page.wait_for_selector("ytd-watch-flexy")
-            page.wait_for_timeout(2000)
+        except Exception as e:
+            print(f"Error occurred: {str(e)}")
+            status = "failed"
+        finally:
+            metrics.export()
+    return status
 
+def save_videos_in_tabs(context, urls, tabs=SAVE_TABS, wrap=None):
+    """
+    複数のタブを使って動画を順に保存/削除する。
+    各タブで次の動画への遷移を先に開始しておき、読み込みが終わったタブから順にメニュー操作を行う
+    （Playwrightの同期APIは1スレッドからしか操作できないため、タブの操作は順番に行う）。
+    wrap は開いたタブのページをラップする関数（省略時は agentql.wrap）。
+
+    Returns:
+        list: [{"url": str, "status": "added" | "removed" | "failed"}, ...]（入力の順）
+    """
+    if wrap is None:
+        import agentql
+        wrap = agentql.wrap
+
+    work_queue = enumerate(urls)
+    pages = [wrap(context.new_page()) for _ in range(max(1, tabs))]
+    in_flight = deque()
+    results = {}
+
+    def start_next(page):
+        for index, url in work_queue:
+            started = time.monotonic()
             try:
-                # 保存ボタンを探す（すでに保存済みの場合）
-                response = page.query_elements(SAVE_BUTTON_QUERY)
-                if hasattr(response, 'save_button'):
-                    print("Found save button (already saved)")
-                    response.save_button.click()
-                    page.wait_for_timeout(1000)
-                    
-                    # 後で見るを削除
-                    menu_response = page.query_elements(SAVE_MENU_QUERY)
-                    if hasattr(menu_response.menu_items[0], 'watch_later'):
-                        menu_response.menu_items[0].watch_later.click()
-                        print("Removed from Watch Later")
-                
+                open_video_page(page, url, wait_until="commit" if tabs > 1 else "load")
             except Exception as e:
-                # 保存ボタンが見つからない場合、メニューボタンをクリック
-                print("Save button not found, looking for menu button...")
-                # role属性とname属性を使用して要素を特定
-                menu_button = page.get_by_role("button", name="その他の操作")
-                if menu_button:
-                    menu_button.click()
-                    page.wait_for_timeout(1000)
-                    
-                    # 保存オプションをクリック
-                    save_response = page.query_elements(SAVE_MENU_QUERY)
-                    if hasattr(save_response.menu_items[0], 'save_option'):
-                        save_response.menu_items[0].save_option.click()
-                        page.wait_for_timeout(1000)
-                        
-                        # 後で見るを選択
-                        watch_later_response = page.query_elements(SAVE_MENU_QUERY)
-                        if hasattr(watch_later_response.menu_items[0], 'watch_later'):
-                            watch_later_response.menu_items[0].watch_later.click()
-                            print("Added to Watch Later")
-            
-            # 操作完了後の待機
-            page.wait_for_timeout(2000)
-            
+                print(f"Error occurred: {str(e)}")
+                results[index] = {"url": url, "status": "failed"}
+                continue
+            in_flight.append((page, index, url, started))
+            return
+
+    for page in pages:
+        start_next(page)
+
+    while in_flight:
+        page, index, url, started = in_flight.popleft()
+        try:
+            status = toggle_on_opened_page(page)
         except Exception as e:
             print(f"Error occurred: {str(e)}")
+            status = "failed"
+        results[index] = {"url": url, "status": status}
+        metrics.observe("save_item_seconds", time.monotonic() - started)
+        metrics.inc("save_items_total", status=status)
+        print(f"{status}: {url}")
+        start_next(page)
+
+    return [results[index] for index in sorted(results)]
+
+def handle_youtube_save_batch(urls, tabs=SAVE_TABS):
+    """
+    複数の動画を1つのブラウザで後で見るリストに保存/削除する
+
+    Args:
+        urls: 動画のURLのイテラブル
+        tabs (int): 同時に使うタブ数
+
+    Returns:
+        list: [{"url": str, "status": "added" | "removed" | "failed"}, ...]
+    """
+    import agentql
+    from playwright.sync_api import sync_playwright
+
+    agentql.configure(api_key=AGENTQL_API_KEY)
+
+    results = []
+    with sync_playwright() as p, p.chromium.launch(headless=False) as browser:
+        try:
+            context = browser.new_context()
+            request_stats = watch_requests(context)
+            results = save_videos_in_tabs(context, urls, tabs)
+
+            counts = {}
+            for result in results:
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+            print(f"Results: {counts}")
+            page_waits.recorder.log_summary(print)
+            print(f"Locator cache stats: {get_locator_cache().stats()}")
+            print(f"Request stats: {request_stats.summary(len(results))}")
+
+        except Exception as e:
+            print(f"Error occurred: {str(e)}")
+        finally:
+            metrics.export()
+    return results
 
 def main():
-    video_url = "https://www.youtube.com/watch?v=rMHc-eZchG8"
-    handle_youtube_save(video_url)
+    parser = argparse.ArgumentParser(description="動画を後で見るリストに保存する（保存済みの場合は削除する）")
+    parser.add_argument("inputs", nargs="*",
+                        help="動画のURL・動画ID・それらを1行ずつ書いたファイル・-（標準入力）"
+                             "（省略時はパイプやリダイレクトされた標準入力）")
+    parser.add_argument("--tabs", type=int, default=SAVE_TABS, help="同時に使うタブ数")
+    args = parser.parse_args()
+
+    inputs = args.inputs
+    if not inputs:
+        # 端末の入力を待ち続けないよう、標準入力はパイプやリダイレクトの場合だけ読む
+        if sys.stdin.isatty():
+            parser.error("specify at least one video URL, video ID or file (or - to read from stdin)")
+        inputs = ["-"]
+
+    try:
+        urls = list(read_video_urls(inputs))
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    if len(urls) == 1:
+        handle_youtube_save(urls[0])
+    elif urls:
+        handle_youtube_save_batch(urls, tabs=args.tabs)
 
 if __name__ == "__main__":
     main()